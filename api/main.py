@@ -1,20 +1,38 @@
-import os, smtplib, base64, binascii
+import os, re, sys, random, asyncio, select, smtplib, base64, binascii, csv, io, json, zlib, gzip, hashlib, mimetypes, threading, time, functools, hmac, uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_HALF_UP, Decimal
 from datetime import date, timedelta, datetime, timezone
 from fastapi import FastAPI, Query, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from zoneinfo import ZoneInfo
 from typing import Mapping
 from apscheduler.schedulers.background import BackgroundScheduler
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from sqlalchemy import create_engine, text, bindparam
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import create_engine, text, bindparam, event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import DBAPIError, DisconnectionError, IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
 import httpx
+import orjson
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from opentelemetry import trace
+from opentelemetry.propagate import extract as extract_trace_context
 from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-from starlette.responses import FileResponse, JSONResponse
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+
+try:
+    import brotli
+except ImportError:  # brotli yoksa dinamik yanıtlar yalnızca gzip ile sıkıştırılır
+    brotli = None
 
 
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -50,8 +68,281 @@ DEFAULT_RESPONSIBLE_EMAIL = os.getenv("DEFAULT_RESPONSIBLE_EMAIL", "yusufege.ere
 DAMAGE_SEVERITIES_ALLOWED = {"hafif", "orta", "ağır"}
 DAMAGE_SEVERITY_DISPLAY = {"hafif": "Hafif", "orta": "Orta", "ağır": "Ağır"}
 ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(5 * 1024 * 1024)))
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "1000"))
+FUEL_BATCH_CHUNK_SIZE = int(os.getenv("FUEL_BATCH_CHUNK_SIZE", "500"))
+TCO_CACHE_TTL_SECONDS = int(os.getenv("TCO_CACHE_TTL_SECONDS", "300"))
+# Profil raporunda gözlenmiş gönderim yoksa tahmin için kullanılan varsayılan gönderim süresi
+NOTIFY_PROFILE_SEND_ESTIMATE_MS = float(os.getenv("NOTIFY_PROFILE_SEND_ESTIMATE_MS", "500"))
+
+_TRUTHY_ENV = {"1", "true", "yes", "on"}
+_FALSY_ENV = {"0", "false", "no", "off"}
+
+def _env_flag(name: str, default: str = "1") -> bool:
+    """
+    Converts environment variables into booleans.
+    Accepts common truthy/falsy strings instead of only "1".
+    """
+    raw = os.getenv(name, default)
+    if raw is None:
+        return False
+    value = raw.strip().lower()
+    if value in _TRUTHY_ENV:
+        return True
+    if value in _FALSY_ENV:
+        return False
+    return bool(value)
+
+# --- Bağlantı havuzu ---
+# İşlem başına toplam bağlantı: her motor için pool_size + max_overflow (bkz. /healthz "pool");
+# worker sayısıyla çarpılmış toplam Postgres max_connections değerinin altında kalmalı.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Her checkout'ta ping yerine yalnızca DB_POOL_VALIDATE_IDLE_SECONDS'dan uzun boşta kalan bağlantıları doğrula
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "1")
+DB_POOL_VALIDATE_IDLE_SECONDS = float(os.getenv("DB_POOL_VALIDATE_IDLE_SECONDS", "300"))
+# Okuma uçları için asyncpg motoru; istekler thread havuzunu işgal etmeden olay döngüsünde bekler
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "10"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+ASYNC_DB_POOL_TIMEOUT = float(os.getenv("ASYNC_DB_POOL_TIMEOUT", "30"))
+# Okumalar salt okunur bir işlem içinde çalışır; autocommit'te asyncpg işlem açmaz ve readonly bayrağı
+# hiç uygulanmaz, psycopg2 de yield_per için gereken sunucu tarafı imleci işlem dışında açamaz
+_READ_ONLY_OPTIONS = {"isolation_level": "READ COMMITTED", "postgresql_readonly": True}
+
+def _sync_pool_options() -> dict[str, object]:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+def _async_pool_options() -> dict[str, object]:
+    return {
+        "pool_size": ASYNC_DB_POOL_SIZE,
+        "max_overflow": ASYNC_DB_MAX_OVERFLOW,
+        "pool_timeout": ASYNC_DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+engine = create_engine(DATABASE_URL, future=True, **_sync_pool_options())
+
+def _async_database_url(url: str) -> URL:
+    async_url = make_url(url).set(drivername="postgresql+asyncpg")
+    query = dict(async_url.query)
+    # asyncpg libpq'nun sslmode parametresini "ssl" adıyla bekler
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")
+    return async_url.set(query=query)
+
+async_engine = create_async_engine(
+    os.getenv("ASYNC_DATABASE_URL") or _async_database_url(DATABASE_URL),
+    **_async_pool_options(),
+)
+
+# --- Okuma replikası (opsiyonel) ---
+# DATABASE_READ_URL tanımlıysa salt okunur uçlar replikaya gider. Replikaya bağlanılamazsa
+# READ_REPLICA_RETRY_SECONDS boyunca birincil kullanılır; yazma yapan istemci READ_YOUR_WRITES_SECONDS
+# boyunca (çerez) veya X-Read-Primary başlığıyla kendi yazdığını birincilden okur.
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "").strip()
+READ_REPLICA_RETRY_SECONDS = float(os.getenv("READ_REPLICA_RETRY_SECONDS", "30"))
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_PRIMARY_COOKIE = "hys_read_primary"
+
+read_engine = create_engine(DATABASE_READ_URL, future=True, **_sync_pool_options()) if DATABASE_READ_URL else None
+async_read_engine = (
+    create_async_engine(_async_database_url(DATABASE_READ_URL), **_async_pool_options())
+    if DATABASE_READ_URL
+    else None
+)
+_prefer_primary: ContextVar[bool] = ContextVar("prefer_primary", default=False)
+_replica_down_until = 0.0
+
+def _replica_usable() -> bool:
+    return read_engine is not None and not _prefer_primary.get() and time.monotonic() >= _replica_down_until
+
+def _mark_replica_down(exc: Exception):
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + READ_REPLICA_RETRY_SECONDS
+    print(f"[read-replica] bağlantı kurulamadı, {READ_REPLICA_RETRY_SECONDS:.0f} sn birincil kullanılacak: {exc}")
+
+@contextmanager
+def _read_connection(isolation_level: str = "READ COMMITTED"):
+    """Salt okunur işlem içindeki bağlantı; replika kullanılamıyorsa birincile düşer."""
+    con = None
+    if _replica_usable():
+        try:
+            con = read_engine.connect()
+        except (DBAPIError, OSError) as exc:
+            _mark_replica_down(exc)
+    if con is None:
+        con = engine.connect()
+    try:
+        con = con.execution_options(**{**_READ_ONLY_OPTIONS, "isolation_level": isolation_level})
+        with con.begin():
+            yield con
+    finally:
+        con.close()
+
+async def _connect_async_read():
+    """(motor, bağlantı) döner; replika kullanılamıyorsa birincil motor seçilir."""
+    if _replica_usable():
+        try:
+            return async_read_engine, await async_read_engine.connect()
+        except (DBAPIError, OSError) as exc:
+            _mark_replica_down(exc)
+    return async_engine, await async_engine.connect()
+
+def _read_query(fetch, build):
+    """İki aşamalı okuma: fetch(con, ...) yalnızca veritabanı turlarını yapıp ham satırları döner,
+    build(raw) satır başına Python işini (serileştirme, base64, gruplama) yapar.
+
+    Dönen fonksiyon sync çağıranlar için ikisini art arda uygular. Async yolda fetch olay döngüsünde
+    (run_sync greenlet'i) çalışır, build ise thread havuzuna gider; büyük bir liste döngüyü bekletmez.
+    """
+    def query(con, *args, **kwargs):
+        return build(fetch(con, *args, **kwargs))
+    query.fetch, query.build = fetch, build
+    return query
+
+async def _build_read(query_func, raw):
+    build = getattr(query_func, "build", None)
+    return await _run_in_worker(build, raw) if build else raw
+
+async def _run_read(query_func, *args, **kwargs):
+    """query_func(con, *args, **kwargs) fonksiyonunu async motorda salt okunur işlemle çalıştırır (run_sync, greenlet üzerinden)."""
+    _, con = await _connect_async_read()
+    try:
+        await con.execution_options(**_READ_ONLY_OPTIONS)
+        async with con.begin():
+            raw = await con.run_sync(getattr(query_func, "fetch", query_func), *args, **kwargs)
+    finally:
+        await con.close()
+    return await _build_read(query_func, raw)
+
+async def _run_read_snapshot(calls: dict[str, tuple], parallel: int) -> tuple[dict[str, object], int]:
+    """Sorguları en fazla `parallel` bağlantıda, dışa aktarılan tek bir snapshot üzerinden çalıştırır.
+
+    Lider bağlantı REPEATABLE READ işlemi açıp pg_export_snapshot() alır ve kendisi de sorgu çalıştırır;
+    ek bağlantılar SET TRANSACTION SNAPSHOT ile aynı görüntüye bağlanır. Her bağlantı sıradaki sorguyu
+    kuyruktan alır, böylece istek başına bağlantı sayısı `parallel` ile sınırlıdır.
+    calls: ad -> (query_func, args). (sonuçlar, snapshot xmin) döner.
+    """
+    snapshot_options = {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+    pending = list(calls.items())
+    raws: dict[str, object] = {}
+
+    async def drain(con):
+        while pending:
+            name, (query_func, args) = pending.pop(0)
+            raws[name] = await con.run_sync(getattr(query_func, "fetch", query_func), *args)
+
+    async def helper(target, snapshot_id: str):
+        worker = await target.connect()
+        try:
+            await worker.execution_options(**snapshot_options)
+            async with worker.begin():
+                # Snapshot kimliği sunucu tarafından üretilir; bu ifade bind parametresi kabul etmez
+                await worker.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+                await drain(worker)
+        finally:
+            await worker.close()
+
+    target, leader = await _connect_async_read()
+    try:
+        await leader.execution_options(**snapshot_options)
+        async with leader.begin():
+            snapshot = (
+                await leader.execute(
+                    text("SELECT pg_export_snapshot() AS snapshot_id, pg_snapshot_xmin(pg_current_snapshot())::text AS xmin")
+                )
+            ).mappings().one()
+            helpers = min(max(1, parallel), len(pending)) - 1
+            await asyncio.gather(drain(leader), *(helper(target, snapshot["snapshot_id"]) for _ in range(helpers)))
+    finally:
+        await leader.close()
+    results = await asyncio.gather(*(_build_read(calls[name][0], raws[name]) for name in calls))
+    return dict(zip(calls.keys(), results)), int(snapshot["xmin"])
+
+class ReadRoutingMiddleware:
+    """Başarılı yazmalardan sonra istemciyi kısa süre birincile yönlendiren çerezi yönetir."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request = Request(scope)
+        if READ_PRIMARY_COOKIE in request.cookies or request.headers.get("x-read-primary") == "1":
+            _prefer_primary.set(True)
+        is_write = scope["method"] not in ("GET", "HEAD", "OPTIONS")
+
+        async def send_wrapper(message):
+            if is_write and message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}=1; Max-Age={READ_YOUR_WRITES_SECONDS}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+# Gözlemlenen motorlar (metrik / yavaş sorgu / izleme kancaları hepsine kurulur)
+_OBSERVED_ENGINES = [("sync", engine), ("async", async_engine.sync_engine)]
+if read_engine is not None:
+    _OBSERVED_ENGINES += [("read", read_engine), ("async_read", async_read_engine.sync_engine)]
+
+def _install_idle_validation(target_engine, idle_seconds: float):
+    """pre-ping yerine: yalnızca uzun süre boşta kalmış bağlantıyı checkout sırasında ping ile doğrular."""
+    @event.listens_for(target_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(target_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+        try:
+            # Lehçenin ping'i psycopg2'de autocommit'e geçer; geride açık işlem kalmaz
+            target_engine.dialect.do_ping(dbapi_connection)
+        except Exception as exc:
+            # Havuz bağlantıyı atar ve yenisiyle tekrar dener
+            raise DisconnectionError(f"Boşta kalan bağlantı doğrulanamadı: {exc}") from exc
+
+if not DB_POOL_PRE_PING and DB_POOL_VALIDATE_IDLE_SECONDS > 0:
+    for _, observed in _OBSERVED_ENGINES:
+        _install_idle_validation(observed, DB_POOL_VALIDATE_IDLE_SECONDS)
+
+def _pool_status() -> dict[str, object]:
+    engines = {}
+    for engine_name, observed in _OBSERVED_ENGINES:
+        pool = observed.pool
+        engines[engine_name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "max_connections": (
+                ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW
+                if engine_name.startswith("async")
+                else DB_POOL_SIZE + DB_MAX_OVERFLOW
+            ),
+        }
+    return {
+        "pre_ping": DB_POOL_PRE_PING,
+        "validate_idle_seconds": None if DB_POOL_PRE_PING else DB_POOL_VALIDATE_IDLE_SECONDS,
+        "recycle_seconds": DB_POOL_RECYCLE,
+        "max_connections_per_process": sum(e["max_connections"] for e in engines.values()),
+        "engines": engines,
+    }
 
-engine = create_engine(DATABASE_URL, future=True, pool_pre_ping=True)
 app = FastAPI(title="HYS Fleet API", version="1.3.0")
 
 allow_origins = os.getenv("CORS_ALLOW_ORIGINS", "https://hys-arac-takip-1.onrender.com").split(",")
@@ -62,9 +353,103 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if read_engine is not None:
+    app.add_middleware(ReadRoutingMiddleware)
 
 # --- Static web (Next.js export) ---
 STATIC_DIR = os.getenv("STATIC_DIR", "/app/webout")
+# Ön sıkıştırılmış kardeş dosyalar (tools/precompress_static.py ile derlemede üretilir), tercih sırasıyla
+_STATIC_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+_STATIC_IMMUTABLE_PREFIX = "_next/static/"
+
+def _index_static_dir(root: str) -> dict[str, dict[str, object]]:
+    """Dışa aktarılmış SPA dizinini açılışta bir kez tarar; HTML dosyaları sıkıştırılmış halleriyle bellekte tutulur."""
+    index: dict[str, dict[str, object]] = {}
+    if not os.path.isdir(root):
+        return index
+    for dirpath, _, filenames in os.walk(root):
+        names = set(filenames)
+        for name in filenames:
+            if name.endswith((".br", ".gz")) and name[:-3] in names:
+                continue
+            full = os.path.join(dirpath, name)
+            rel = os.path.relpath(full, root).replace(os.sep, "/")
+            st = os.stat(full)
+            entry: dict[str, object] = {
+                "path": full,
+                "media_type": mimetypes.guess_type(name)[0] or "application/octet-stream",
+                "etag": f'"{st.st_size:x}-{int(st.st_mtime):x}"',
+                "variants": {enc: full + suffix for enc, suffix in _STATIC_ENCODINGS if name + suffix in names},
+            }
+            if name.endswith(".html"):
+                with open(full, "rb") as fh:
+                    body = fh.read()
+                bodies = {"identity": body}
+                for enc, variant_path in entry["variants"].items():
+                    with open(variant_path, "rb") as fh:
+                        bodies[enc] = fh.read()
+                bodies.setdefault("gzip", gzip.compress(body, compresslevel=9))
+                entry["bodies"] = bodies
+                entry["etag"] = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+                entry["media_type"] = "text/html; charset=utf-8"
+            index[rel] = entry
+    return index
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(token.lower())
+    return accepted
+
+def _static_response(rel: str, request: Request) -> Response:
+    entry = _STATIC_INDEX[rel]
+    if rel.startswith(_STATIC_IMMUTABLE_PREFIX):
+        cache_control = "public, max-age=31536000, immutable"
+    elif "bodies" in entry:
+        cache_control = "no-cache"
+    else:
+        cache_control = "public, max-age=3600"
+    headers = {"ETag": entry["etag"], "Cache-Control": cache_control}
+    if request.headers.get("if-none-match") == entry["etag"]:
+        return Response(status_code=304, headers=headers)
+
+    bodies = entry.get("bodies")
+    available = bodies.keys() if bodies else entry["variants"].keys()
+    accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+    encoding = next((enc for enc, _ in _STATIC_ENCODINGS if enc in available and enc in accepted), None)
+    if available - {"identity"}:
+        headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    if bodies:
+        return Response(bodies[encoding or "identity"], media_type=entry["media_type"], headers=headers)
+    path = entry["variants"][encoding] if encoding else entry["path"]
+    return FileResponse(path, media_type=entry["media_type"], headers=headers)
+
+def _resolve_static(path: str) -> str | None:
+    rel = path.strip("/")
+    candidates = (rel, f"{rel}/index.html", f"{rel}.html") if rel else ("index.html",)
+    return next((c for c in candidates if c in _STATIC_INDEX), None)
+
+class PrecompressedStaticFiles:
+    """StaticFiles yerine: açılıştaki dizine göre sunar, .br/.gz varyantlarını ve önbellek başlıklarını ekler."""
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        if request.method not in ("GET", "HEAD"):
+            raise StarletteHTTPException(status_code=405)
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        rel = _resolve_static(path)
+        if rel is None:
+            raise StarletteHTTPException(status_code=404)
+        await _static_response(rel, request)(scope, receive, send)
+
+_STATIC_INDEX = _index_static_dir(STATIC_DIR)
 
 def _ensure_tables():
     ddl = """
@@ -145,6 +530,63 @@ def _ensure_tables():
     ALTER TABLE assignments ADD COLUMN IF NOT EXISTS vehicle_make TEXT;
     ALTER TABLE assignments ADD COLUMN IF NOT EXISTS vehicle_model TEXT;
     ALTER TABLE assignments ADD COLUMN IF NOT EXISTS vehicle_km TEXT;
+    CREATE TABLE IF NOT EXISTS expense_monthly_rollup (
+      plate TEXT NOT NULL,
+      month DATE NOT NULL,
+      category TEXT NOT NULL,
+      total_amount NUMERIC(14,2) NOT NULL DEFAULT 0,
+      entry_count INT NOT NULL DEFAULT 0,
+      PRIMARY KEY (plate, month, category)
+    );
+    CREATE TABLE IF NOT EXISTS fuel_monthly_rollup (
+      plate TEXT NOT NULL,
+      month DATE NOT NULL,
+      total_liters NUMERIC(14,2) NOT NULL DEFAULT 0,
+      total_amount NUMERIC(14,2) NOT NULL DEFAULT 0,
+      entry_count INT NOT NULL DEFAULT 0,
+      PRIMARY KEY (plate, month)
+    );
+    CREATE INDEX IF NOT EXISTS idx_expense_monthly_rollup_month ON expense_monthly_rollup(month);
+    CREATE INDEX IF NOT EXISTS idx_fuel_monthly_rollup_month ON fuel_monthly_rollup(month);
+    ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+    ALTER TABLE documents ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+    ALTER TABLE damages ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+    ALTER TABLE expenses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+    ALTER TABLE fuel_entries ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+    ALTER TABLE assignments ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW();
+    CREATE INDEX IF NOT EXISTS idx_vehicles_updated_at ON vehicles(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_documents_updated_at ON documents(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_damages_updated_at ON damages(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_expenses_updated_at ON expenses(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_fuel_entries_updated_at ON fuel_entries(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_assignments_updated_at ON assignments(updated_at);
+    CREATE INDEX IF NOT EXISTS idx_documents_valid_to ON documents(valid_to);
+    CREATE INDEX IF NOT EXISTS idx_documents_vehicle_valid_to ON documents(vehicle_id, valid_to DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_damages_plate_occurred_at ON damages(plate, occurred_at DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_assignments_plate_date ON assignments(plate, assignment_date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_expenses_plate_date ON expenses(plate, expense_date DESC, id DESC);
+    CREATE INDEX IF NOT EXISTS idx_fuel_entries_plate_date ON fuel_entries(plate, refuel_date DESC, id DESC);
+    CREATE TABLE IF NOT EXISTS sync_tombstones (
+      id BIGSERIAL PRIMARY KEY,
+      table_name TEXT NOT NULL,
+      row_id INT NOT NULL,
+      deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+    );
+    CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted_at ON sync_tombstones(deleted_at);
+    ALTER TABLE vehicles ADD COLUMN IF NOT EXISTS updated_xid xid8;
+    ALTER TABLE documents ADD COLUMN IF NOT EXISTS updated_xid xid8;
+    ALTER TABLE damages ADD COLUMN IF NOT EXISTS updated_xid xid8;
+    ALTER TABLE expenses ADD COLUMN IF NOT EXISTS updated_xid xid8;
+    ALTER TABLE fuel_entries ADD COLUMN IF NOT EXISTS updated_xid xid8;
+    ALTER TABLE assignments ADD COLUMN IF NOT EXISTS updated_xid xid8;
+    CREATE INDEX IF NOT EXISTS idx_vehicles_updated_xid ON vehicles(updated_xid);
+    CREATE INDEX IF NOT EXISTS idx_documents_updated_xid ON documents(updated_xid);
+    CREATE INDEX IF NOT EXISTS idx_damages_updated_xid ON damages(updated_xid);
+    CREATE INDEX IF NOT EXISTS idx_expenses_updated_xid ON expenses(updated_xid);
+    CREATE INDEX IF NOT EXISTS idx_fuel_entries_updated_xid ON fuel_entries(updated_xid);
+    CREATE INDEX IF NOT EXISTS idx_assignments_updated_xid ON assignments(updated_xid);
+    ALTER TABLE sync_tombstones ADD COLUMN IF NOT EXISTS deleted_xid xid8 NOT NULL DEFAULT pg_current_xact_id();
+    CREATE INDEX IF NOT EXISTS idx_sync_tombstones_deleted_xid ON sync_tombstones(deleted_xid);
     """
     with engine.begin() as con:
         for statement in ddl.strip().split(";"):
@@ -162,13 +604,377 @@ with engine.begin() as _con:
         {"email": DEFAULT_RESPONSIBLE_EMAIL},
     )
 
+# --- Değişiklik akışı (LISTEN/NOTIFY + SSE) ---
+# Varlık tablolarındaki her satır değişikliği tetikleyiciyle kısa bir JSON olarak pg_notify edilir;
+# işlem başına tek bir dinleyici bağlantısı olayları /api/events SSE akışlarına dağıtır.
+CHANGE_FEED_ENABLED = _env_flag("CHANGE_FEED_ENABLED", "1")
+CHANGE_FEED_CHANNEL = "hys_changes"
+CHANGE_FEED_TABLES = ("vehicles", "documents", "damages", "expenses", "fuel_entries", "assignments")
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv("SSE_CLIENT_QUEUE_SIZE", "1000"))
+
+# plpgsql gövdesi ";" içerdiği için _ensure_tables'taki bölmeli DDL'den ayrı çalıştırılır
+_CHANGE_NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION hys_notify_change() RETURNS trigger AS $$
+DECLARE
+  data jsonb := to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END);
+BEGIN
+  PERFORM pg_notify('{CHANGE_FEED_CHANNEL}', jsonb_strip_nulls(jsonb_build_object(
+    'table', TG_TABLE_NAME,
+    'op', lower(TG_OP),
+    'id', data->'id',
+    'vehicle_id', data->'vehicle_id'
+  ))::text);
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+def _ensure_change_feed():
+    with engine.begin() as con:
+        # Birden çok worker aynı anda açıldığında tetikleyici oluşturma yarışmasın
+        con.execute(text("SELECT pg_advisory_xact_lock(hashtext('hys_change_feed'))"))
+        con.exec_driver_sql(_CHANGE_NOTIFY_FUNCTION_SQL)
+        existing = set(
+            con.execute(
+                text("SELECT tgrelid::regclass::text FROM pg_trigger WHERE tgname = 'hys_change_notify'")
+            ).scalars()
+        )
+        for table in CHANGE_FEED_TABLES:
+            if table not in existing:
+                con.exec_driver_sql(
+                    f"CREATE TRIGGER hys_change_notify AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                    "FOR EACH ROW EXECUTE FUNCTION hys_notify_change()"
+                )
+
+if CHANGE_FEED_ENABLED:
+    _ensure_change_feed()
+
+_CHANGE_SUBSCRIBERS: set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = set()
+_CHANGE_LOCK = threading.Lock()
+_change_listener: threading.Thread | None = None
+
+def _offer_change(queue: asyncio.Queue, event: dict):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Yavaş istemci: birikmiş olayları at, istemci listeyi bir kez yeniden çeksin
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync"})
+
+def _publish_change(event: dict):
+    with _CHANGE_LOCK:
+        subscribers = list(_CHANGE_SUBSCRIBERS)
+    for loop, queue in subscribers:
+        loop.call_soon_threadsafe(_offer_change, queue, event)
+
+def _change_listener_loop():
+    backoff = 1
+    connected_before = False
+    while True:
+        conn = None
+        try:
+            # Havuzdan ayrılmış kalıcı bağlantı; havuz kapasitesini işgal etmez
+            pooled = engine.raw_connection()
+            pooled.detach()
+            conn = pooled.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {CHANGE_FEED_CHANNEL}")
+            if connected_before:
+                # Kopukluk sırasında kaçan olaylar olabilir
+                _publish_change({"type": "resync"})
+            connected_before = True
+            backoff = 1
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notice = conn.notifies.pop(0)
+                    try:
+                        payload = json.loads(notice.payload)
+                    except ValueError:
+                        continue
+                    _publish_change({"type": "change", **payload})
+        except Exception as exc:
+            print(f"[change-feed] dinleyici hatası: {exc}; {backoff} sn sonra yeniden bağlanılacak")
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+def _ensure_change_listener():
+    global _change_listener
+    with _CHANGE_LOCK:
+        if _change_listener is None:
+            _change_listener = threading.Thread(target=_change_listener_loop, name="change-feed", daemon=True)
+            _change_listener.start()
+
+def change_events(request: Request, tables: str | None = None):
+    if not CHANGE_FEED_ENABLED:
+        raise HTTPException(status_code=404, detail="Değişiklik akışı kapalı")
+    wanted = {t.strip() for t in tables.split(",") if t.strip()} if tables else None
+    if wanted and not wanted <= set(CHANGE_FEED_TABLES):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Geçersiz tablo: {', '.join(sorted(wanted - set(CHANGE_FEED_TABLES)))}",
+        )
+    _ensure_change_listener()
+    subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SSE_CLIENT_QUEUE_SIZE))
+    with _CHANGE_LOCK:
+        _CHANGE_SUBSCRIBERS.add(subscriber)
+    queue = subscriber[1]
+
+    async def stream():
+        event_id = 0
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if wanted and event["type"] == "change" and event.get("table") not in wanted:
+                    continue
+                event_id += 1
+                data = json.dumps({k: v for k, v in event.items() if k != "type"}, ensure_ascii=False)
+                yield f"id: {event_id}\nevent: {event['type']}\ndata: {data}\n\n"
+        finally:
+            with _CHANGE_LOCK:
+                _CHANGE_SUBSCRIBERS.discard(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Delta senkronizasyon (updated_at + silme kayıtları) ---
+# Her varlık tablosunda updated_at ve yazan işlemin kimliği (updated_xid) tetikleyiciyle tutulur,
+# silmeler sync_tombstones'a düşer. Token, okuma anındaki snapshot'ın xmin değeridir: bundan küçük
+# kimlikli tüm işlemler o anda bitmiştir, geç commit edilen bir işlem ise her zaman >= xmin kimlik taşır.
+# Böylece saat farkı veya uzun süren işlemler (büyük yakıt aktarımı gibi) hiçbir değişikliği kaçırtmaz.
+SYNC_TABLES = CHANGE_FEED_TABLES
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+
+_SYNC_TRIGGER_FUNCTIONS_SQL = [
+    """
+    CREATE OR REPLACE FUNCTION hys_touch_updated_at() RETURNS trigger AS $$
+    BEGIN
+      NEW.updated_at := clock_timestamp();
+      NEW.updated_xid := pg_current_xact_id();
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    # Ek eklenip silindiğinde üst kayıt da değişmiş sayılır (ek üst verisi senkronizasyonla döner)
+    """
+    CREATE OR REPLACE FUNCTION hys_touch_parent() RETURNS trigger AS $$
+    DECLARE
+      owner_id INT;
+    BEGIN
+      owner_id := (to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END) ->> TG_ARGV[1])::int;
+      IF owner_id IS NOT NULL THEN
+        EXECUTE 'UPDATE ' || quote_ident(TG_ARGV[0]) || ' SET updated_at = clock_timestamp() WHERE id = $1'
+          USING owner_id;
+      END IF;
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION hys_sync_tombstone() RETURNS trigger AS $$
+    BEGIN
+      INSERT INTO sync_tombstones(table_name, row_id) VALUES (TG_TABLE_NAME, OLD.id);
+      RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+_SYNC_TRIGGERS = {
+    "hys_touch_updated_at": "BEFORE INSERT OR UPDATE ON {table} FOR EACH ROW EXECUTE FUNCTION hys_touch_updated_at()",
+    "hys_sync_tombstone": "AFTER DELETE ON {table} FOR EACH ROW EXECUTE FUNCTION hys_sync_tombstone()",
+}
+
+# Ekler yalnızca üst verisiyle döner (içerik yok); içerik gerektiğinde kaydın kendi ucundan alınır
+_SYNC_ATTACHMENTS = {
+    "damages": ("damage_attachments", "damage_id"),
+    "expenses": ("expense_attachments", "expense_id"),
+    "assignments": ("assignment_attachments", "assignment_id"),
+}
+_SYNC_ATTACHMENT_TRIGGER = (
+    "AFTER INSERT OR UPDATE OR DELETE ON {table} FOR EACH ROW EXECUTE FUNCTION hys_touch_parent('{parent}', '{owner_column}')"
+)
+
+def _ensure_sync_tracking():
+    with engine.begin() as con:
+        con.execute(text("SELECT pg_advisory_xact_lock(hashtext('hys_sync_tracking'))"))
+        for function_sql in _SYNC_TRIGGER_FUNCTIONS_SQL:
+            con.exec_driver_sql(function_sql)
+        existing = {
+            (row.tgname, row.table_name)
+            for row in con.execute(
+                text(
+                    "SELECT tgname, tgrelid::regclass::text AS table_name FROM pg_trigger "
+                    "WHERE tgname IN ('hys_touch_updated_at', 'hys_sync_tombstone', 'hys_touch_parent')"
+                )
+            )
+        }
+        for table in SYNC_TABLES:
+            for trigger_name, definition in _SYNC_TRIGGERS.items():
+                if (trigger_name, table) not in existing:
+                    con.exec_driver_sql(f"CREATE TRIGGER {trigger_name} {definition.format(table=table)}")
+        for parent, (table, owner_column) in _SYNC_ATTACHMENTS.items():
+            if ("hys_touch_parent", table) not in existing:
+                definition = _SYNC_ATTACHMENT_TRIGGER.format(table=table, parent=parent, owner_column=owner_column)
+                con.exec_driver_sql(f"CREATE TRIGGER hys_touch_parent {definition}")
+
+def prune_sync_tombstones() -> int:
+    with engine.begin() as con:
+        result = con.execute(
+            text("DELETE FROM sync_tombstones WHERE deleted_at < now() - make_interval(days => :days)"),
+            {"days": SYNC_TOMBSTONE_RETENTION_DAYS},
+        )
+    return result.rowcount
+
+_ensure_sync_tracking()
+prune_sync_tombstones()
+
+_SYNC_SELECTS = {
+    "vehicles": """
+        SELECT id, plate, make, model, year, responsible_email, responsible_person, created_at, updated_at
+        FROM vehicles
+    """,
+    "documents": """
+        SELECT id, vehicle_id, doc_type, valid_from, valid_to, note,
+               (valid_to - CURRENT_DATE) AS days_left, updated_at
+        FROM documents
+    """,
+    "damages": """
+        SELECT id, vehicle_id, plate, title, description, severity, occurred_at, created_at, updated_at
+        FROM damages
+    """,
+    "expenses": """
+        SELECT id, vehicle_id, plate, category, amount, description, expense_date, created_at, updated_at
+        FROM expenses
+    """,
+    "fuel_entries": """
+        SELECT id, vehicle_id, plate, liters, amount, refuel_date, odometer, note, created_at, updated_at
+        FROM fuel_entries
+    """,
+    "assignments": """
+        SELECT id, vehicle_id, plate, person_name, person_title, vehicle_make, vehicle_model, vehicle_km,
+               assignment_date, expected_return_date, description, created_at, updated_at
+        FROM assignments
+    """,
+}
+
+def _encode_sync_token(xmin: int, issued_at: datetime) -> str:
+    raw = f"{xmin}|{issued_at.isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_sync_token(token: str) -> tuple[int, datetime] | None:
+    """(xmin, verildiği an) döner; eski zaman damgası token'ları için None (tam senkronizasyon)."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        if "|" not in raw:
+            datetime.fromisoformat(raw)
+            return None
+        xmin, issued = raw.split("|", 1)
+        value = (int(xmin), datetime.fromisoformat(issued))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Geçersiz senkronizasyon token'ı")
+    if value[1].tzinfo is None:
+        raise HTTPException(status_code=400, detail="Geçersiz senkronizasyon token'ı")
+    return value
+
+def _serialize_sync_rows(table: str, rows, attachments) -> list[dict[str, object]]:
+    if table == "vehicles":
+        return [dict(row) for row in rows]
+    if table == "documents":
+        return [
+            {**_make_document_response(row), "vehicle_id": row["vehicle_id"], "updated_at": row["updated_at"]}
+            for row in rows
+        ]
+    if table == "fuel_entries":
+        return [{**_serialize_fuel_entry(row), "updated_at": row["updated_at"]} for row in rows]
+    serializer = {
+        "damages": _serialize_damage_row,
+        "expenses": _serialize_expense_row,
+        "assignments": _serialize_assignment_row,
+    }[table]
+    return [{**serializer(row, attachments.get(row["id"], [])), "updated_at": row["updated_at"]} for row in rows]
+
+def _sync_rows(con, since: tuple[int, datetime] | None):
+    # xmin sorgulardan önce alınır; sonraki okumalarda görünmeyen her işlemin kimliği >= xmin olur.
+    # Replikada snapshot yalnızca uygulanmış işlemleri kapsadığı için gecikme de kaçırmaya yol açmaz.
+    snapshot = con.execute(
+        text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS xmin, now() AS issued_at")
+    ).mappings().one()
+    token_xmin, token_at = int(snapshot["xmin"]), snapshot["issued_at"]
+    horizon = token_at - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    full = since is None or since[1] < horizon
+    changed_since = None if full else str(since[0])
+
+    changed: dict[str, tuple] = {}
+    for table in SYNC_TABLES:
+        sql = _SYNC_SELECTS[table]
+        params: dict[str, object] = {}
+        if changed_since is not None:
+            sql += " WHERE updated_xid >= CAST(CAST(:changed_since AS text) AS xid8)"
+            params["changed_since"] = changed_since
+        rows = con.execute(text(sql + " ORDER BY id"), params).mappings().all()
+        attachments = {}
+        if table in _SYNC_ATTACHMENTS:
+            attachment_table, owner_column = _SYNC_ATTACHMENTS[table]
+            attachments = _attachments_by_owner(
+                con, attachment_table, owner_column, [row["id"] for row in rows], with_content=False
+            )
+        changed[table] = (rows, attachments)
+
+    deleted: dict[str, list[int]] = {table: [] for table in SYNC_TABLES}
+    if changed_since is not None:
+        for row in con.execute(
+            text(
+                """
+                SELECT DISTINCT table_name, row_id FROM sync_tombstones
+                WHERE deleted_xid >= CAST(CAST(:changed_since AS text) AS xid8)
+                ORDER BY table_name, row_id
+                """
+            ),
+            {"changed_since": changed_since},
+        ):
+            if row.table_name in deleted:
+                deleted[row.table_name].append(row.row_id)
+    return token_xmin, token_at, since, full, changed, deleted
+
+def _build_sync(raw) -> dict[str, object]:
+    token_xmin, token_at, since, full, changed, deleted = raw
+    return {
+        "token": _encode_sync_token(token_xmin, token_at),
+        "since": since[1] if since else None,
+        # full=True: istemci yerel verisini tamamen bu yanıtla değiştirmeli
+        "full": full,
+        "changes": {table: _serialize_sync_rows(table, *changed[table]) for table in SYNC_TABLES},
+        "deleted": deleted,
+    }
+
+_query_sync = _read_query(_sync_rows, _build_sync)
+
 # SPA fallback: /api dışındaki 404'larda index.html döndür
 @app.exception_handler(StarletteHTTPException)
 async def spa_fallback(request: Request, exc: StarletteHTTPException):
     if exc.status_code == 404 and not request.url.path.startswith("/api"):
-        index_path = os.path.join(STATIC_DIR, "index.html")
-        if os.path.exists(index_path):
-            return FileResponse(index_path)
+        if "index.html" in _STATIC_INDEX:
+            return _static_response("index.html", request)
     return JSONResponse({"detail": exc.detail}, status_code=exc.status_code)
 
 
@@ -192,6 +998,20 @@ def days_left_for(d: date | None) -> int | None:
 
 EMAIL_TEMPLATE = None  # kept for backward-compatibility; use render_email instead
 
+# Tracer, sağlayıcı kurulmadan önce de alınabilir; OTEL_TRACING kapalıyken span açılmaz.
+_tracer = trace.get_tracer("hys-fleet-api")
+
+def _traced(span_name: str, **attributes):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACING_ENABLED:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(span_name, attributes=attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
 DOC_TURKISH_LABELS = {
     "inspection": "Muayene",
     "k_document": "K Belgesi",
@@ -240,6 +1060,7 @@ def tr_doc_label(code: str) -> str:
     return DOC_TURKISH_LABELS.get(str(code).lower().strip(), str(code))
 
 
+@_traced("email.render")
 def render_email(
     *,
     plate: str,
@@ -338,6 +1159,29 @@ def smtp_available() -> bool:
 def resend_available() -> bool:
     return bool(RESEND_API_KEY)
 
+# Son gönderim süreleri (sn); notify_job profil raporu gerçek gönderim yapmadan bunları kullanır
+_MAIL_LATENCY_SAMPLES: dict[str, deque] = {"smtp": deque(maxlen=200), "resend": deque(maxlen=200)}
+
+def _timed_mail(provider: str):
+    """Gönderim süresini ve hatalarını sağlayıcı bazında metriklere yazar."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                MAIL_SEND_FAILURES.labels(provider).inc()
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                MAIL_SEND_SECONDS.labels(provider).observe(elapsed)
+                _MAIL_LATENCY_SAMPLES[provider].append(elapsed)
+        return wrapper
+    return decorator
+
+@_traced("mail.transport", **{"mail.provider": "smtp"})
+@_timed_mail("smtp")
 def send_via_smtp(to_email: str, subject: str, html_body: str):
     if not smtp_available():
         raise RuntimeError("SMTP yapılandırılmadı")
@@ -354,6 +1198,8 @@ def send_via_smtp(to_email: str, subject: str, html_body: str):
         recipients = [addr.strip() for addr in str(target).split(",") if addr.strip()]
         s.sendmail(MAIL_FROM, recipients, msg.as_string())
 
+@_traced("mail.transport", **{"mail.provider": "resend"})
+@_timed_mail("resend")
 def send_via_resend(to_email: str, subject: str, html_body: str):
     if not resend_available():
         raise RuntimeError("RESEND_API_KEY tanımlı değil")
@@ -375,6 +1221,7 @@ def send_via_resend(to_email: str, subject: str, html_body: str):
         r.raise_for_status()
         return r.json()
 
+@_traced("mail.send")
 def send_mail(to_email: str, subject: str, html_body: str):
     # Standardize subject prefix for routing rules
     if not subject.startswith("[HYS Araç Uyarı]"):
@@ -572,6 +1419,20 @@ class FuelUpdateRequest(BaseModel):
     note: str | None = None
     admin_password: str
 
+class FuelBatchItem(BaseModel):
+    plate: str
+    liters: float
+    amount: float
+    refuel_date: date
+    odometer: int | None = None
+    note: str | None = None
+
+class FuelBatchRequest(BaseModel):
+    entries: list[FuelBatchItem] = []
+    # Alternatif: başlık satırı plate,liters,amount,refuel_date[,odometer,note] olan CSV metni
+    csv_content: str | None = None
+    admin_password: str
+
 class AssignmentAttachmentPayload(BaseModel):
     file_name: str
     mime_type: str | None = None
@@ -635,24 +1496,6 @@ class AssignmentUpdateRequest(BaseModel):
         return aliases.get(value, value)
 
 # --- Sağlık & Uptime (GET + HEAD + meta) ---
-_TRUTHY_ENV = {"1", "true", "yes", "on"}
-_FALSY_ENV = {"0", "false", "no", "off"}
-
-def _env_flag(name: str, default: str = "1") -> bool:
-    """
-    Converts environment variables into booleans.
-    Accepts common truthy/falsy strings instead of only "1".
-    """
-    raw = os.getenv(name, default)
-    if raw is None:
-        return False
-    value = raw.strip().lower()
-    if value in _TRUTHY_ENV:
-        return True
-    if value in _FALSY_ENV:
-        return False
-    return bool(value)
-
 def _scheduler_enabled() -> bool:
     return _env_flag("ENABLE_SCHEDULER", "1")
 
@@ -663,34 +1506,668 @@ def _health_payload() -> dict:
         "mail_provider": MAIL_PROVIDER,
         "version": "1.3.0",
         "scheduler_enabled": _scheduler_enabled(),
+        "pool": _pool_status(),
+        "read_replica": {
+            "configured": read_engine is not None,
+            "in_use": read_engine is not None and time.monotonic() >= _replica_down_until,
+        },
     }
 
 @app.get("/healthz")
-def health():
+async def health():
     return _health_payload()
 
 # Extra health aliases for uptime monitors (GET + HEAD)
 @app.get("/health")
-def health_root():
+async def health_root():
     """Alias of /healthz for providers expecting /health."""
     return _health_payload()
 
 @app.head("/health")
-def health_root_head():
+async def health_root_head():
     return Response(status_code=200)
 
 @app.get("/api/health")
-def api_health_alias():
+async def api_health_alias():
     """Alias of /api/healthz for convenience."""
     return _health_payload()
 
 @app.head("/api/health")
-def api_health_head():
+async def api_health_head():
     return Response(status_code=200)
 
+# --- Prometheus metrikleri ---
+METRICS_ENABLED = _env_flag("METRICS_ENABLED", "1")
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "hys_http_request_duration_seconds", "HTTP istek süresi", ["method", "route", "status"]
+)
+HTTP_IN_FLIGHT = Gauge("hys_http_requests_in_flight", "İşlenmekte olan HTTP istekleri")
+DB_STATEMENT_SECONDS = Histogram(
+    "hys_db_statement_duration_seconds", "SQL ifadesi çalışma süresi", ["operation"]
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "hys_db_pool_checkout_wait_seconds", "Havuzdan bağlantı alma bekleme süresi"
+)
+DB_POOL_CONNECTIONS = Gauge("hys_db_pool_connections", "Bağlantı havuzu durumu", ["engine", "state"])
+MAIL_SEND_SECONDS = Histogram("hys_mail_send_duration_seconds", "E-posta gönderim süresi", ["provider"])
+MAIL_SEND_FAILURES = Counter("hys_mail_send_failures_total", "Başarısız e-posta gönderimleri", ["provider"])
+NOTIFY_JOB_SECONDS = Histogram("hys_notify_job_duration_seconds", "notify_job çalışma süresi")
+NOTIFY_JOB_RESULTS = Counter("hys_notify_job_results_total", "notify_job sonuçları", ["result"])
+
+def _statement_operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+class MetricsMiddleware:
+    """Saf ASGI ara katmanı: rota şablonu bazında süre ve eşzamanlı istek sayısı."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # Statik dosya/404 yolları tek etikette toplanır ki etiket sayısı sınırlı kalsın
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+def _install_statement_timing(target_engine):
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        if METRICS_ENABLED:
+            DB_STATEMENT_SECONDS.labels(_statement_operation(statement)).observe(elapsed)
+        if SLOW_QUERY_ENABLED:
+            _record_query(statement, parameters, elapsed, executemany)
+
+    @event.listens_for(target_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+def _install_pool_metrics(target_engine, engine_name: str):
+    # Havuz, "checkout öncesi" olayı sunmadığı için bekleme süresi connect() sarmalanarak ölçülür
+    pool = target_engine.pool
+    pool_connect = pool.connect
+
+    def _timed_pool_connect():
+        started = time.perf_counter()
+        try:
+            return pool_connect()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started)
+
+    pool.connect = _timed_pool_connect
+    DB_POOL_CONNECTIONS.labels(engine_name, "size").set_function(pool.size)
+    DB_POOL_CONNECTIONS.labels(engine_name, "checked_out").set_function(pool.checkedout)
+    DB_POOL_CONNECTIONS.labels(engine_name, "checked_in").set_function(pool.checkedin)
+    DB_POOL_CONNECTIONS.labels(engine_name, "overflow").set_function(pool.overflow)
+
+# --- Yavaş sorgu günlüğü (opsiyonel) ---
+SLOW_QUERY_ENABLED = _env_flag("SLOW_QUERY_LOG", "0")
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0"))
+SLOW_QUERY_MAX_STATEMENTS = int(os.getenv("SLOW_QUERY_MAX_STATEMENTS", "500"))
+
+_QUERY_STATS: dict[str, dict[str, object]] = {}
+_QUERY_STATS_LOCK = threading.Lock()
+_QUERY_STATS_STARTED = now_local()
+_EXPLAIN_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="explain")
+_EXPLAIN_PENDING = threading.Event()
+
+_SQL_PARAM_RE = re.compile(r"%\([^)]*\)s|\$\d+")
+_SQL_NUMBERED_PARAM_RE = re.compile(r"\$(\d+)")
+_SQL_NUMBER_RE = re.compile(r"\b\d+\b")
+_SQL_PARAM_LIST_RE = re.compile(r"\?(\s*,\s*\?)+")
+_SQL_VALUES_LIST_RE = re.compile(r"\(\?\.\.\.\)(\s*,\s*\(\?\.\.\.\))+|\(\?\)(\s*,\s*\(\?\))+")
+_SQL_SPACE_RE = re.compile(r"\s+")
+_SENSITIVE_PARAM_KEYS = ("password", "content", "email", "token")
+
+def _normalize_sql(statement: str) -> str:
+    """Parametreleri ve sayıları '?' ile değiştirir; IN listeleri ve çok satırlı VALUES tek kalıba iner."""
+    sql = _SQL_SPACE_RE.sub(" ", statement).strip()
+    sql = _SQL_PARAM_RE.sub("?", sql)
+    sql = _SQL_NUMBER_RE.sub("?", sql)
+    sql = _SQL_PARAM_LIST_RE.sub("?...", sql)
+    return _SQL_VALUES_LIST_RE.sub("(?...), ...", sql)
+
+def _redact_params(parameters) -> object:
+    if isinstance(parameters, (list, tuple)):
+        return [_redact_params(p) for p in parameters[:3]]
+    if not isinstance(parameters, Mapping):
+        return None
+    redacted: dict[str, object] = {}
+    for key, value in parameters.items():
+        if any(marker in str(key).lower() for marker in _SENSITIVE_PARAM_KEYS):
+            redacted[key] = "***"
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            redacted[key] = f"<{len(value)} bytes>"
+        elif isinstance(value, str):
+            redacted[key] = f"<str:{len(value)}>"
+        elif value is None or isinstance(value, (int, float, Decimal, date, datetime)):
+            redacted[key] = str(value) if value is not None else None
+        else:
+            redacted[key] = f"<{type(value).__name__}>"
+    return redacted
+
+def _explainable(statement: str) -> bool:
+    # EXPLAIN ANALYZE ifadeyi gerçekten çalıştırır; yalnızca veri değiştirmeyen sorgular örneklenir
+    if _statement_operation(statement) not in {"SELECT", "WITH"}:
+        return False
+    upper = statement.upper()
+    return not any(word in upper for word in ("INSERT ", "UPDATE ", "DELETE ", "FOR UPDATE"))
+
+def _capture_explain(normalized: str, statement: str, parameters):
+    if isinstance(parameters, (list, tuple)) and _SQL_NUMBERED_PARAM_RE.search(statement):
+        # asyncpg ($1) ifadeleri EXPLAIN için psycopg2 (%s) biçimine çevrilir
+        parameters = [parameters[int(n) - 1] for n in _SQL_NUMBERED_PARAM_RE.findall(statement)]
+        statement = _SQL_NUMBERED_PARAM_RE.sub("%s", statement.replace("%", "%%"))
+    try:
+        raw = engine.raw_connection()
+        try:
+            cursor = raw.cursor()
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+            raw.rollback()
+        finally:
+            raw.close()
+        with _QUERY_STATS_LOCK:
+            entry = _QUERY_STATS.get(normalized)
+            if entry is not None:
+                entry["last_plan"] = plan
+        print(f"[slow-query] plan for {normalized[:120]}\n{plan}")
+    except Exception as exc:
+        print(f"[slow-query] EXPLAIN alınamadı: {exc}")
+    finally:
+        _EXPLAIN_PENDING.clear()
+
+def _record_query(statement: str, parameters, elapsed: float, executemany: bool):
+    elapsed_ms = elapsed * 1000
+    normalized = _normalize_sql(statement)
+    slow = elapsed_ms >= SLOW_QUERY_THRESHOLD_MS
+    with _QUERY_STATS_LOCK:
+        entry = _QUERY_STATS.get(normalized)
+        if entry is None:
+            if len(_QUERY_STATS) >= SLOW_QUERY_MAX_STATEMENTS:
+                normalized = "<diğer>"
+                entry = _QUERY_STATS.get(normalized)
+            if entry is None:
+                entry = {"sql": normalized, "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "slow_calls": 0}
+                _QUERY_STATS[normalized] = entry
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        if slow:
+            entry["slow_calls"] += 1
+            entry["last_slow_params"] = _redact_params(parameters)
+            entry["last_slow_at"] = now_local().isoformat()
+    if not slow:
+        return
+    print(f"[slow-query] {elapsed_ms:.1f} ms: {normalized} params={_redact_params(parameters)}")
+    if (
+        SLOW_QUERY_EXPLAIN_RATE > 0
+        and not executemany
+        and random.random() < SLOW_QUERY_EXPLAIN_RATE
+        and _explainable(statement)
+        and not _EXPLAIN_PENDING.is_set()
+    ):
+        # Aynı anda en fazla bir EXPLAIN; istek yolunu bekletmemek için arka planda
+        _EXPLAIN_PENDING.set()
+        _EXPLAIN_EXECUTOR.submit(_capture_explain, normalized, statement, parameters)
+
+def slow_query_report(admin_password: str, limit: int = 20, order_by: str = "total") -> dict:
+    if admin_password != VEHICLE_ADMIN_PASSWORD:
+        raise HTTPException(status_code=403, detail="Şifre hatalı")
+    sort_key = {"total": "total_ms", "max": "max_ms", "calls": "calls", "slow": "slow_calls"}.get(order_by)
+    if sort_key is None:
+        raise HTTPException(status_code=400, detail="Sıralama yalnızca total, max, calls veya slow olabilir")
+    with _QUERY_STATS_LOCK:
+        entries = [dict(e) for e in _QUERY_STATS.values()]
+    entries.sort(key=lambda e: e[sort_key], reverse=True)
+    for e in entries:
+        e["total_ms"] = round(e["total_ms"], 2)
+        e["max_ms"] = round(e["max_ms"], 2)
+        e["mean_ms"] = round(e["total_ms"] / e["calls"], 2) if e["calls"] else None
+    return {
+        "enabled": SLOW_QUERY_ENABLED,
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "explain_rate": SLOW_QUERY_EXPLAIN_RATE,
+        "since": _QUERY_STATS_STARTED.isoformat(),
+        "statements": len(entries),
+        "top": entries[:limit],
+    }
+
+# --- OpenTelemetry izleme (opsiyonel) ---
+TRACING_ENABLED = _env_flag("OTEL_TRACING", "0")
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "otlp").strip().lower()  # otlp | file
+TRACING_FILE = os.getenv("TRACING_FILE", "traces.jsonl")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+
+def _setup_tracing():
+    # SDK yalnızca izleme açıkken yüklenir
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "hys-fleet-api")}),
+        sampler=ParentBased(TraceIdRatioBased(TRACING_SAMPLE_RATE)),
+    )
+    if TRACING_EXPORTER == "file":
+        out = open(TRACING_FILE, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        # Uç nokta OTEL_EXPORTER_OTLP_ENDPOINT ile ayarlanır (varsayılan http://localhost:4318)
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+
+class TracingMiddleware:
+    """Her HTTP isteği için kök span; gelen traceparent başlığı varsa ona bağlanır."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        carrier = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with _tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=extract_trace_context(carrier),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        ) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{scope['method']} {route}")
+                    span.set_attribute("http.route", route)
+                span.set_attribute("http.status_code", status_code)
+
+def _install_db_tracing(target_engine):
+    @event.listens_for(target_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = _tracer.start_span(
+            f"db {_statement_operation(statement)}",
+            kind=trace.SpanKind.CLIENT,
+            attributes={"db.system": "postgresql", "db.statement": _normalize_sql(statement)},
+        )
+        conn.info.setdefault("query_spans", []).append(span)
+
+    @event.listens_for(target_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_spans"].pop().end()
+
+    @event.listens_for(target_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_spans"):
+            span = conn.info["query_spans"].pop()
+            span.record_exception(exception_context.original_exception)
+            span.set_status(trace.Status(trace.StatusCode.ERROR))
+            span.end()
+
+if TRACING_ENABLED:
+    _setup_tracing()
+    app.add_middleware(TracingMiddleware)
+    for _, observed in _OBSERVED_ENGINES:
+        _install_db_tracing(observed)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    for engine_name, observed in _OBSERVED_ENGINES:
+        _install_pool_metrics(observed, engine_name)
+if METRICS_ENABLED or SLOW_QUERY_ENABLED:
+    for _, observed in _OBSERVED_ENGINES:
+        _install_statement_timing(observed)
+
+# --- İstek bazlı örnekleyici profilleyici ---
+# X-Profile başlığı veya __profile sorgu parametresi VEHICLE_ADMIN_PASSWORD ile eşleşirse yalnızca o
+# istek örneklenir; diğer isteklerde tek maliyet bu kontrolün kendisidir. Örnekler iş parçacığı ve
+# isteğe göre ayrılır: olay döngüsünde yalnızca isteğin (ve ondan türeyen) görevleri çalışırken alınan
+# örnekler, iş parçacığı havuzunda ise isteğin işini yürüten iş parçacıkları sayılır.
+PROFILER_ENABLED = _env_flag("PROFILER_ENABLED", "1")
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "2"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "30"))
+PROFILER_RING_SIZE = int(os.getenv("PROFILER_RING_SIZE", "20"))
+
+_PROFILES: deque = deque(maxlen=PROFILER_RING_SIZE)
+_PROFILES_LOCK = threading.Lock()
+
+class _StackSampler(threading.Thread):
+    """Olay döngüsünü ve isteğe ait iş parçacıklarını sys._current_frames() ile örnekler."""
+
+    def __init__(self, scope, loop: asyncio.AbstractEventLoop):
+        super().__init__(name="request-profiler", daemon=True)
+        self.samples: list[tuple[float, int, tuple]] = []
+        self.scope = scope
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        # İsteğin görevleri (görev fabrikası alt görevleri ekler) ve şu an isteğin işini yapan havuz iş parçacıkları
+        self.tasks: set[asyncio.Task] = {asyncio.current_task()}
+        self.threads: set[int] = set()
+        self._stop_event = threading.Event()
+
+    def _belongs_to_request(self, thread_id: int, codes: list) -> bool:
+        if thread_id == self.loop_thread:
+            # Greenlet (run_sync) ve async kod da isteğin görev adımı içinde çalışır
+            return asyncio.current_task(self.loop) in self.tasks
+        if thread_id in self.threads:
+            return True
+        # Senkron uç noktalar havuzda, uç nokta fonksiyonu yığının içindeyken çalışır
+        endpoint_code = getattr(self.scope.get("endpoint"), "__code__", None)
+        return endpoint_code is not None and endpoint_code in codes
+
+    def run(self):
+        interval = PROFILER_INTERVAL_MS / 1000
+        deadline = time.perf_counter() + PROFILER_MAX_SECONDS
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(interval):
+            now = time.perf_counter()
+            if now > deadline:
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                if self._belongs_to_request(thread_id, codes):
+                    self.samples.append((now, thread_id, tuple(reversed(codes))))
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+_active_sampler: ContextVar[_StackSampler | None] = ContextVar("active_sampler", default=None)
+
+def _profiling_task_factory(loop, coro, context=None):
+    """Profillenen istek içinde oluşturulan görevleri (gather, görev grupları) örnekleyiciye ekler."""
+    task = asyncio.Task(coro, loop=loop, context=context)
+    sampler = context.get(_active_sampler) if context is not None else _active_sampler.get()
+    if sampler is not None:
+        sampler.tasks.add(task)
+    return task
+
+async def _run_in_worker(func, *args):
+    """run_in_threadpool; istek profilleniyorsa işi yürüten iş parçacığı süresince örnekleyiciye kaydedilir."""
+    sampler = _active_sampler.get()
+    if sampler is None:
+        return await run_in_threadpool(func, *args)
+
+    def call():
+        thread_id = threading.get_ident()
+        sampler.threads.add(thread_id)
+        try:
+            return func(*args)
+        finally:
+            sampler.threads.discard(thread_id)
+
+    return await run_in_threadpool(call)
+
+def _speedscope_profile(name: str, samples: list[tuple[float, int, tuple]]) -> dict:
+    frames: list[dict[str, object]] = []
+    frame_index: dict[object, int] = {}
+    stacks: list[list[int]] = []
+    for _, _, codes in samples:
+        stack = []
+        for code in codes:
+            idx = frame_index.get(code)
+            if idx is None:
+                idx = len(frames)
+                frame_index[code] = idx
+                frames.append({"name": code.co_name, "file": code.co_filename, "line": code.co_firstlineno})
+            stack.append(idx)
+        stacks.append(stack)
+    interval = PROFILER_INTERVAL_MS / 1000
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "hys-fleet-api",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(len(stacks) * interval, 6),
+                "samples": stacks,
+                "weights": [interval] * len(stacks),
+            }
+        ],
+    }
+
+def _profile_requested(scope) -> bool:
+    for key, value in scope.get("headers", []):
+        if key == b"x-profile":
+            return hmac.compare_digest(value.decode("latin-1"), VEHICLE_ADMIN_PASSWORD)
+    query = scope.get("query_string", b"")
+    if b"__profile=" in query:
+        token = parse_qs(query.decode("latin-1")).get("__profile", [""])[0]
+        return hmac.compare_digest(token, VEHICLE_ADMIN_PASSWORD)
+    return False
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode("ascii"))]
+            await send(message)
+
+        loop = asyncio.get_running_loop()
+        if loop.get_task_factory() is None:
+            loop.set_task_factory(_profiling_task_factory)
+        sampler = _StackSampler(scope, loop)
+        token = _active_sampler.set(sampler)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            _active_sampler.reset(token)
+            duration_ms = (time.perf_counter() - started) * 1000
+            route = getattr(scope.get("route"), "path", scope["path"])
+            name = f"{scope['method']} {route}"
+            profile = await run_in_threadpool(_speedscope_profile, name, sampler.samples)
+            with _PROFILES_LOCK:
+                _PROFILES.append(
+                    {
+                        "id": profile_id,
+                        "name": name,
+                        "path": scope["path"],
+                        "captured_at": now_local().isoformat(),
+                        "duration_ms": round(duration_ms, 2),
+                        "samples": len(profile["profiles"][0]["samples"]),
+                        "speedscope": profile,
+                    }
+                )
+
+def list_profiles(admin_password: str):
+    if admin_password != VEHICLE_ADMIN_PASSWORD:
+        raise HTTPException(status_code=403, detail="Şifre hatalı")
+    with _PROFILES_LOCK:
+        return [{k: v for k, v in p.items() if k != "speedscope"} for p in reversed(_PROFILES)]
+
+def get_profile(profile_id: str, admin_password: str):
+    if admin_password != VEHICLE_ADMIN_PASSWORD:
+        raise HTTPException(status_code=403, detail="Şifre hatalı")
+    with _PROFILES_LOCK:
+        profile = next((p for p in _PROFILES if p["id"] == profile_id), None)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profil bulunamadı")
+    return JSONResponse(
+        profile["speedscope"],
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'},
+    )
+
+if PROFILER_ENABLED:
+    app.add_middleware(ProfilerMiddleware)
+
+@app.get("/metrics")
+def metrics():
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrikler kapalı")
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# --- Yanıt sıkıştırma & hızlı JSON ---
+RESPONSE_COMPRESSION_ENABLED = _env_flag("RESPONSE_COMPRESSION", "1")
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+# Dinamik yanıtlar için hızlı brotli seviyesi; statik dosyalar derlemede en yüksek seviyeyle sıkıştırılır
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))
+# Bu boyutun üzerindeki gövdeler olay döngüsünü bekletmemek için iş parçacığı havuzunda sıkıştırılır
+RESPONSE_COMPRESSION_OFFLOAD_BYTES = int(os.getenv("RESPONSE_COMPRESSION_OFFLOAD_BYTES", "65536"))
+# Yalnızca metin tabanlı türler sıkıştırılır; görsel, font, arşiv gibi zaten sıkıştırılmış türler olduğu gibi geçer
+_COMPRESSIBLE_MEDIA_TYPES = {
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/x-ndjson",
+    "image/svg+xml",
+}
+
+def _is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in _COMPRESSIBLE_MEDIA_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+def _compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+
+def _orjson_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} JSON'a çevrilemiyor")
+
+class FastJSONResponse(JSONResponse):
+    """orjson ile serileştirir; tarih/datetime yerel, Decimal float olarak yazılır."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+class CompressionMiddleware:
+    """Tek parça metin yanıtlarını eşik üzerindeyse br/gzip ile sıkıştırır; akış yanıtları, zaten kodlanmış
+    ve sıkıştırılamayan türler olduğu gibi geçer. Sıkıştırılabilir her yanıt Vary: Accept-Encoding taşır."""
+
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            encoding = None
+
+        pending_start = None
+
+        async def send_wrapper(message):
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                pending_start = message
+                return
+            if message["type"] != "http.response.body" or pending_start is None:
+                await send(message)
+                return
+            start, pending_start = pending_start, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start)
+            if (
+                message.get("more_body")
+                or "content-encoding" in headers
+                or not _is_compressible(headers.get("content-type", ""))
+            ):
+                await send(start)
+                await send(message)
+                return
+            # İstemciye veya boyuta göre sıkıştırılmasa da paylaşılan önbellekler varyantları ayırmalı
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            if len(body) > RESPONSE_COMPRESSION_OFFLOAD_BYTES:
+                body = await _run_in_worker(_compress_body, body, encoding)
+            else:
+                body = _compress_body(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+
+if RESPONSE_COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 # ---- Core functions (no direct non-/api routes) ----
 
-def list_vehicles(q: str | None = None):
+def _with_id_filter(statement, ids: list[int] | None):
+    """?ids= ile gelen kimlik listesini tek bir IN (...) parametresine genişletir."""
+    return statement.bindparams(bindparam("ids", expanding=True)) if ids is not None else statement
+
+def _vehicle_list_rows(con, q: str | None = None, ids: list[int] | None = None):
     base_sql = """
         SELECT
           v.id,
@@ -708,45 +2185,49 @@ def list_vehicles(q: str | None = None):
     if q:
         conditions.append("(v.plate ILIKE :q OR v.make ILIKE :q OR v.model ILIKE :q)")
         params["q"] = f"%{q}%"
+    if ids is not None:
+        conditions.append("v.id IN :ids")
+        params["ids"] = ids
     sql = base_sql
     if conditions:
         sql += " WHERE " + " AND ".join(conditions)
     sql += " ORDER BY v.plate"
 
-    with engine.begin() as con:
-        vehicle_rows = con.execute(text(sql), params).mappings().all()
-        document_rows = con.execute(
-            text(
-                """
-                SELECT
-                  id,
-                  vehicle_id,
-                  doc_type,
-                  valid_from,
-                  valid_to,
-                  note,
-                  (valid_to - CURRENT_DATE) AS days_left
-                FROM documents
-                ORDER BY doc_type, valid_to
-                """
-            )
-        ).mappings().all()
+    vehicle_rows = con.execute(_with_id_filter(text(sql), ids), params).mappings().all()
+    document_sql = """
+        SELECT
+          id,
+          vehicle_id,
+          doc_type,
+          valid_from,
+          valid_to,
+          note,
+          (valid_to - CURRENT_DATE) AS days_left
+        FROM documents
+    """
+    if ids is not None:
+        document_sql += " WHERE vehicle_id IN :ids"
+    document_sql += " ORDER BY doc_type, valid_to"
+    document_rows = con.execute(_with_id_filter(text(document_sql), ids), {"ids": ids}).mappings().all()
+    return vehicle_rows, document_rows
+
+def _vehicle_document_entry(doc: Mapping[str, object]) -> dict[str, object]:
+    return {
+        "id": doc["id"],
+        "doc_type": doc["doc_type"],
+        "doc_label": tr_doc_label(doc["doc_type"]),
+        "valid_from": doc["valid_from"],
+        "valid_to": doc["valid_to"],
+        "note": doc["note"],
+        "days_left": int(doc["days_left"]) if doc["days_left"] is not None else None,
+        "status": _document_status(doc["valid_to"]),
+    }
 
+def _assemble_vehicle_list(vehicle_rows, document_rows) -> list[dict[str, object]]:
+    """Araç ve belge satırlarını liste yanıtına dönüştürür (veritabanından bağımsız, benchmark edilir)."""
     docs_by_vehicle: dict[int, list[dict[str, object]]] = {}
     for doc in document_rows:
-        vehicle_id = doc["vehicle_id"]
-        docs_by_vehicle.setdefault(vehicle_id, []).append(
-            {
-                "id": doc["id"],
-                "doc_type": doc["doc_type"],
-                "doc_label": tr_doc_label(doc["doc_type"]),
-                "valid_from": doc["valid_from"].isoformat() if doc["valid_from"] else None,
-                "valid_to": doc["valid_to"].isoformat() if doc["valid_to"] else None,
-                "note": doc["note"],
-                "days_left": int(doc["days_left"]) if doc["days_left"] is not None else None,
-                "status": _document_status(doc["valid_to"]),
-            }
-        )
+        docs_by_vehicle.setdefault(doc["vehicle_id"], []).append(_vehicle_document_entry(doc))
 
     result = []
     for row in vehicle_rows:
@@ -762,7 +2243,7 @@ def list_vehicles(q: str | None = None):
                 "year": row["year"],
                 "responsible_email": row["responsible_email"],
                 "responsible_person": row.get("responsible_person"),
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                "created_at": row["created_at"],
                 "documents": docs,
                 "document_count": len(docs),
                 "next_valid_to": next_doc.get("valid_to") if next_doc else None,
@@ -773,6 +2254,14 @@ def list_vehicles(q: str | None = None):
 
     return result
 
+_query_vehicle_list = _read_query(_vehicle_list_rows, lambda raw: _assemble_vehicle_list(*raw))
+
+def _fetch_vehicle(con, vehicle_id: int):
+    rows = _query_vehicle_list(con, ids=[vehicle_id])
+    if not rows:
+        raise HTTPException(status_code=404, detail="Araç bulunamadı")
+    return rows[0]
+
 def create_vehicle(v: VehicleCreateRequest):
     if v.admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
@@ -798,6 +2287,7 @@ def create_vehicle(v: VehicleCreateRequest):
             )
         except IntegrityError as exc:
             raise HTTPException(status_code=409, detail="Aynı plakadan zaten var") from exc
+    _invalidate_tco()
 
     vehicle_data = {
         "id": row["id"],
@@ -887,6 +2377,7 @@ def update_vehicle(vehicle_id: int, body: VehicleUpdateRequest):
 
         if row is None:
             raise HTTPException(status_code=404, detail="Araç bulunamadı")
+    _invalidate_tco()
 
     return {
         "id": row["id"],
@@ -912,6 +2403,9 @@ def delete_vehicle(vehicle_id: int, admin_password: str = Query(..., description
         ).mappings().first()
         if deleted is None:
             raise HTTPException(status_code=404, detail="Araç bulunamadı")
+    # Araçla birlikte belgeleri de silinir (ON DELETE CASCADE)
+    _invalidate_expiry_calendar()
+    _invalidate_tco()
 
     summary = f"{deleted['plate']}" if deleted else str(vehicle_id)
     mail_body = render_email(
@@ -940,6 +2434,21 @@ def _make_document_response(row: Mapping[str, object]) -> dict[str, object]:
         "status": _document_status(valid_to if isinstance(valid_to, date) else datetime.fromisoformat(valid_to).date()),
     }
 
+def _fetch_document(con, document_id: int):
+    row = con.execute(
+        text(
+            """
+            SELECT id, vehicle_id, doc_type, valid_from, valid_to, note, (valid_to - CURRENT_DATE) AS days_left
+            FROM documents
+            WHERE id = :id
+            """
+        ),
+        {"id": document_id},
+    ).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Belge bulunamadı")
+    return {**_make_document_response(row), "vehicle_id": row["vehicle_id"], "doc_label": tr_doc_label(row["doc_type"])}
+
 def create_document(vehicle_id: int, payload: DocumentCreateRequest):
     if payload.admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
@@ -970,6 +2479,7 @@ def create_document(vehicle_id: int, payload: DocumentCreateRequest):
             ),
             doc_data,
         ).mappings().first()
+    _invalidate_expiry_calendar()
 
     doc_response = _make_document_response(row)
 
@@ -1087,6 +2597,7 @@ def update_document(document_id: int, body: DocumentUpdateRequest):
                     text("DELETE FROM notifications_log WHERE document_id = :id"),
                     {"id": document_id},
                 )
+    _invalidate_expiry_calendar()
 
     return _make_document_response(row)
 
@@ -1130,6 +2641,7 @@ def delete_document(document_id: int, admin_password: str = Query(..., descripti
         vehicle = con.execute(
             text("SELECT plate FROM vehicles WHERE id = :id"), {"id": row["vehicle_id"]}
         ).mappings().first()
+    _invalidate_expiry_calendar()
 
     plate = vehicle["plate"] if vehicle else "Bilinmiyor"
     mail_html = (
@@ -1144,7 +2656,7 @@ def delete_document(document_id: int, admin_password: str = Query(..., descripti
 
     return Response(status_code=204)
 
-def expiring(days: int = Query(30, ge=1, le=365)):
+def _expiring_rows(con, days: int = 30):
     today = today_local()
     until = today + timedelta(days=days)
     sql = """
@@ -1155,8 +2667,9 @@ def expiring(days: int = Query(30, ge=1, le=365)):
       where d.valid_to between :t and :u
       order by d.valid_to asc
     """
-    with engine.begin() as con:
-        rows = con.execute(text(sql), {"t": today, "u": until}).mappings().all()
+    return con.execute(text(sql), {"t": today, "u": until}).mappings().all()
+
+def _serialize_expiring(rows) -> list[dict[str, object]]:
     result = []
     for row in rows:
         result.append(
@@ -1177,6 +2690,20 @@ def expiring(days: int = Query(30, ge=1, le=365)):
         )
     return result
 
+_query_expiring = _read_query(_expiring_rows, _serialize_expiring)
+
+def _serialize_attachments(attachments: list[Mapping[str, object]]) -> list[dict[str, object]]:
+    return [
+        {
+            "id": att["id"],
+            "file_name": att["file_name"],
+            "mime_type": att.get("mime_type"),
+            "size_bytes": int(att["size_bytes"]) if att.get("size_bytes") is not None else None,
+            "content_base64": _encode_base64_content(att.get("content")),
+        }
+        for att in attachments
+    ]
+
 def _serialize_damage_row(row: Mapping[str, object], attachments: list[Mapping[str, object]]):
     return {
         "id": row["id"],
@@ -1185,18 +2712,9 @@ def _serialize_damage_row(row: Mapping[str, object], attachments: list[Mapping[s
         "title": row["title"],
         "description": row.get("description"),
         "severity": row["severity"],
-        "occurred_at": row["occurred_at"].isoformat() if row.get("occurred_at") else None,
-        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
-        "attachments": [
-            {
-                "id": att["id"],
-                "file_name": att["file_name"],
-                "mime_type": att.get("mime_type"),
-                "size_bytes": int(att["size_bytes"]) if att.get("size_bytes") is not None else None,
-                "content_base64": _encode_base64_content(att.get("content")),
-            }
-            for att in attachments
-        ],
+        "occurred_at": row.get("occurred_at"),
+        "created_at": row.get("created_at"),
+        "attachments": _serialize_attachments(attachments),
     }
 
 def _serialize_assignment_row(row: Mapping[str, object], attachments: list[Mapping[str, object]]):
@@ -1209,143 +2727,170 @@ def _serialize_assignment_row(row: Mapping[str, object], attachments: list[Mappi
         "vehicle_make": row.get("vehicle_make"),
         "vehicle_model": row.get("vehicle_model"),
         "vehicle_km": row.get("vehicle_km"),
-        "assignment_date": row["assignment_date"].isoformat() if row.get("assignment_date") else None,
-        "expected_return_date": row["expected_return_date"].isoformat() if row.get("expected_return_date") else None,
+        "assignment_date": row.get("assignment_date"),
+        "expected_return_date": row.get("expected_return_date"),
         "description": row.get("description"),
-        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
-        "attachments": [
-            {
-                "id": att["id"],
-                "file_name": att["file_name"],
-                "mime_type": att.get("mime_type"),
-                "size_bytes": int(att["size_bytes"]) if att.get("size_bytes") is not None else None,
-                "content_base64": _encode_base64_content(att.get("content")),
-            }
-            for att in attachments
-        ],
+        "created_at": row.get("created_at"),
+        "attachments": _serialize_attachments(attachments),
     }
 
 def _serialize_expense_row(row: Mapping[str, object], attachments: list[Mapping[str, object]]):
     amount = row.get("amount")
-    try:
-        amount_value = float(amount) if amount is not None else 0.0
-    except TypeError:
-        amount_value = 0.0
     return {
         "id": row["id"],
         "vehicle_id": row.get("vehicle_id"),
         "plate": row["plate"],
         "category": row["category"],
-        "amount": amount_value,
+        "amount": amount if amount is not None else 0.0,
         "description": row.get("description"),
-        "expense_date": row["expense_date"].isoformat() if row.get("expense_date") else None,
-        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
-        "attachments": [
-            {
-                "id": att["id"],
-                "file_name": att["file_name"],
-                "mime_type": att.get("mime_type"),
-                "size_bytes": int(att["size_bytes"]) if att.get("size_bytes") is not None else None,
-                "content_base64": _encode_base64_content(att.get("content")),
-            }
-            for att in attachments
-        ],
+        "expense_date": row.get("expense_date"),
+        "created_at": row.get("created_at"),
+        "attachments": _serialize_attachments(attachments),
     }
 
 def _serialize_fuel_entry(row: Mapping[str, object]):
     amount = row.get("amount")
     liters = row.get("liters")
-    try:
-        amount_value = float(amount) if amount is not None else 0.0
-    except TypeError:
-        amount_value = 0.0
-    try:
-        liters_value = float(liters) if liters is not None else 0.0
-    except TypeError:
-        liters_value = 0.0
-    odometer_raw = row.get("odometer")
-    try:
-        odometer_value = int(odometer_raw) if odometer_raw is not None else None
-    except (TypeError, ValueError):
-        odometer_value = None
-    unit_price = amount_value / liters_value if liters_value else None
+    amount = amount if amount is not None else 0.0
+    liters = liters if liters is not None else 0.0
     return {
         "id": row["id"],
         "vehicle_id": row.get("vehicle_id"),
         "plate": row["plate"],
-        "liters": liters_value,
-        "amount": amount_value,
-        "refuel_date": row["refuel_date"].isoformat() if row.get("refuel_date") else None,
-        "odometer": odometer_value,
+        "liters": liters,
+        "amount": amount,
+        "refuel_date": row.get("refuel_date"),
+        "odometer": row.get("odometer"),
         "note": row.get("note"),
-        "unit_price": unit_price,
-        "created_at": row["created_at"].isoformat() if row.get("created_at") else None,
+        "unit_price": float(amount) / float(liters) if liters else None,
+        "created_at": row.get("created_at"),
     }
 
-def _resolve_vehicle_id(con, plate: str | None) -> int | None:
-    if not plate:
-        return None
-    row = con.execute(text("SELECT id FROM vehicles WHERE plate = :plate"), {"plate": plate}).mappings().first()
-    return row["id"] if row else None
+# Araç kimliği INSERT/UPDATE içinde alt sorguyla çözülür; ayrı bir SELECT turu gerekmez.
+_VEHICLE_ID_BY_PLATE_SQL = "(SELECT id FROM vehicles WHERE plate = :plate)"
 
-def list_damages():
-    with engine.begin() as con:
-        rows = con.execute(
-            text(
-                """
-                SELECT d.id, d.vehicle_id, d.plate, d.title, d.description, d.severity,
-                       d.occurred_at, d.created_at
-                FROM damages d
-                ORDER BY d.created_at DESC
-                """
-            )
-        ).mappings().all()
-        if not rows:
-            return []
-        damage_ids = [row["id"] for row in rows]
-        attachments_map: dict[int, list[Mapping[str, object]]] = {row["id"]: [] for row in rows}
-        att_stmt = (
-            text(
-                """
-                SELECT id, damage_id, file_name, mime_type, octet_length(content) as size_bytes, content
-                FROM damage_attachments
-                WHERE damage_id IN :ids
-                ORDER BY id
-                """
-            ).bindparams(bindparam("ids", expanding=True))
-            if damage_ids
-            else None
-        )
-        if att_stmt is not None:
-            for att in con.execute(att_stmt, {"ids": damage_ids}).mappings().all():
-                attachments_map.setdefault(att["damage_id"], []).append(att)
-        return [_serialize_damage_row(row, attachments_map.get(row["id"], [])) for row in rows]
+def _update_set_clause(fields: Mapping[str, object]) -> str:
+    clauses = [f"{key} = :{key}" for key in fields.keys()]
+    if "plate" in fields:
+        clauses.append(f"vehicle_id = {_VEHICLE_ID_BY_PLATE_SQL}")
+    return ", ".join(clauses)
 
-def _fetch_damage(con, damage_id: int):
-    row = con.execute(
-        text(
-            """
-            SELECT d.id, d.vehicle_id, d.plate, d.title, d.description, d.severity,
-                   d.occurred_at, d.created_at
-            FROM damages d
-            WHERE d.id = :id
-            """
-        ),
-        {"id": damage_id},
-    ).mappings().first()
-    if row is None:
-        raise HTTPException(status_code=404, detail="Hasar kaydı bulunamadı")
-    attachments = con.execute(
+def _prepare_attachments(attachments: list, default_name: str) -> list[dict[str, object]]:
+    prepared = []
+    for att in attachments:
+        if not att.content_base64:
+            continue
+        content = _decode_base64_content(att.content_base64)
+        if not content:
+            continue
+        prepared.append(
+            {
+                "file_name": os.path.basename(att.file_name) if att.file_name else default_name,
+                "mime_type": att.mime_type or "application/octet-stream",
+                "content": content,
+            }
+        )
+    return prepared
+
+def _insert_attachments(con, table: str, owner_column: str, owner_id: int, attachments: list[dict[str, object]]):
+    """Tüm ekleri tek bir çok satırlı INSERT ile yazar; yanıttaki içerik bellekteki veriden gelir."""
+    if not attachments:
+        return []
+    params: dict[str, object] = {"owner_id": owner_id}
+    values_sql = []
+    for idx, att in enumerate(attachments):
+        values_sql.append(f"(:owner_id, :file_name_{idx}, :mime_type_{idx}, :content_{idx})")
+        params[f"file_name_{idx}"] = att["file_name"]
+        params[f"mime_type_{idx}"] = att["mime_type"]
+        params[f"content_{idx}"] = att["content"]
+    rows = con.execute(
         text(
+            f"""
+            INSERT INTO {table} ({owner_column}, file_name, mime_type, content)
+            VALUES {", ".join(values_sql)}
+            RETURNING id, file_name, mime_type
             """
-            SELECT id, damage_id, file_name, mime_type, octet_length(content) as size_bytes, content
-            FROM damage_attachments
-            WHERE damage_id = :id
+        ),
+        params,
+    ).mappings().all()
+    return [
+        {
+            "id": row["id"],
+            "file_name": row["file_name"],
+            "mime_type": row["mime_type"],
+            "size_bytes": len(att["content"]),
+            "content": att["content"],
+        }
+        for row, att in zip(sorted(rows, key=lambda r: r["id"]), attachments)
+    ]
+
+def _serialize_owned_rows(serializer, rows, attachments_map) -> list[dict[str, object]]:
+    return [serializer(row, attachments_map.get(row["id"], [])) for row in rows]
+
+def _attachments_by_owner(
+    con, table: str, owner_column: str, owner_ids: list[int], with_content: bool = True
+) -> dict[int, list[Mapping[str, object]]]:
+    """Birden çok kaydın eklerini tek sorguda getirir; with_content=False ise içerik baytları hiç okunmaz."""
+    if not owner_ids:
+        return {}
+    content_column = ", content" if with_content else ""
+    attachments: dict[int, list[Mapping[str, object]]] = {}
+    for att in con.execute(
+        text(
+            f"""
+            SELECT id, {owner_column}, file_name, mime_type, octet_length(content) as size_bytes{content_column}
+            FROM {table}
+            WHERE {owner_column} IN :ids
+            ORDER BY id
+            """
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": owner_ids},
+    ).mappings():
+        attachments.setdefault(att[owner_column], []).append(att)
+    return attachments
+
+def _select_attachments(con, table: str, owner_column: str, owner_id: int):
+    return con.execute(
+        text(
+            f"""
+            SELECT id, {owner_column}, file_name, mime_type, octet_length(content) as size_bytes, content
+            FROM {table}
+            WHERE {owner_column} = :id
             ORDER BY id
             """
         ),
-        {"id": damage_id},
+        {"id": owner_id},
     ).mappings().all()
+
+def _damage_list_rows(con, attachment_content: bool = True, ids: list[int] | None = None):
+    sql = """
+        SELECT d.id, d.vehicle_id, d.plate, d.title, d.description, d.severity,
+               d.occurred_at, d.created_at
+        FROM damages d
+    """
+    if ids is not None:
+        sql += " WHERE d.id IN :ids"
+    sql += " ORDER BY d.created_at DESC"
+    rows = con.execute(_with_id_filter(text(sql), ids), {"ids": ids}).mappings().all()
+    return rows, _attachments_by_owner(con, "damage_attachments", "damage_id", [row["id"] for row in rows], attachment_content)
+
+_query_damages = _read_query(_damage_list_rows, lambda raw: _serialize_owned_rows(_serialize_damage_row, *raw))
+
+def _fetch_damage(con, damage_id: int):
+    row = con.execute(
+        text(
+            """
+            SELECT d.id, d.vehicle_id, d.plate, d.title, d.description, d.severity,
+                   d.occurred_at, d.created_at
+            FROM damages d
+            WHERE d.id = :id
+            """
+        ),
+        {"id": damage_id},
+    ).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Hasar kaydı bulunamadı")
+    attachments = _select_attachments(con, "damage_attachments", "damage_id", damage_id)
     return _serialize_damage_row(row, attachments)
 
 def create_damage(body: DamageCreateRequest):
@@ -1356,32 +2901,17 @@ def create_damage(body: DamageCreateRequest):
         raise HTTPException(status_code=400, detail="Şiddet yalnızca Hafif, Orta veya Ağır olabilir")
     severity_label = DAMAGE_SEVERITY_DISPLAY[severity_key]
     plate = body.plate.strip().upper()
-    attachments_payload = []
-    for att in body.attachments:
-        if not att.content_base64:
-            continue
-        content = _decode_base64_content(att.content_base64)
-        if not content:
-            continue
-        attachments_payload.append(
-            {
-                "file_name": os.path.basename(att.file_name) if att.file_name else "dosya",
-                "mime_type": att.mime_type or "application/octet-stream",
-                "content": content,
-            }
-        )
+    attachments_payload = _prepare_attachments(body.attachments, "dosya")
     with engine.begin() as con:
-        vehicle_id = _resolve_vehicle_id(con, plate)
         row = con.execute(
             text(
-                """
+                f"""
                 INSERT INTO damages (vehicle_id, plate, title, description, severity, occurred_at)
-                VALUES (:vehicle_id, :plate, :title, :description, :severity, :occurred_at)
+                VALUES ({_VEHICLE_ID_BY_PLATE_SQL}, :plate, :title, :description, :severity, :occurred_at)
                 RETURNING id, vehicle_id, plate, title, description, severity, occurred_at, created_at
                 """
             ),
             {
-                "vehicle_id": vehicle_id,
                 "plate": plate,
                 "title": body.title.strip(),
                 "description": body.description.strip() if body.description else None,
@@ -1389,22 +2919,9 @@ def create_damage(body: DamageCreateRequest):
                 "occurred_at": body.occurred_at,
             },
         ).mappings().first()
-        for att in attachments_payload:
-            con.execute(
-                text(
-                    """
-                    INSERT INTO damage_attachments (damage_id, file_name, mime_type, content)
-                    VALUES (:damage_id, :file_name, :mime_type, :content)
-                    """
-                ),
-                {
-                    "damage_id": row["id"],
-                    "file_name": att["file_name"],
-                    "mime_type": att["mime_type"],
-                    "content": att["content"],
-                },
-            )
-        return _fetch_damage(con, row["id"])
+        attachments = _insert_attachments(con, "damage_attachments", "damage_id", row["id"], attachments_payload)
+    _invalidate_tco()
+    return _serialize_damage_row(row, attachments)
 
 def update_damage(damage_id: int, body: DamageUpdateRequest):
     if body.admin_password != VEHICLE_ADMIN_PASSWORD:
@@ -1416,154 +2933,113 @@ def update_damage(damage_id: int, body: DamageUpdateRequest):
             raise HTTPException(status_code=400, detail="Şiddet yalnızca Hafif, Orta veya Ağır olabilir")
         severity_label = DAMAGE_SEVERITY_DISPLAY[severity_key]
 
-    attachments_payload = []
-    for att in body.attachments:
-        if not att.content_base64:
-            continue
-        content = _decode_base64_content(att.content_base64)
-        if not content:
-            continue
-        attachments_payload.append(
-            {
-                "file_name": os.path.basename(att.file_name) if att.file_name else "dosya",
-                "mime_type": att.mime_type or "application/octet-stream",
-                "content": content,
-            }
-        )
+    attachments_payload = _prepare_attachments(body.attachments, "dosya")
 
-    with engine.begin() as con:
-        existing = con.execute(
-            text(
-                """
-                SELECT id, plate FROM damages WHERE id = :id
-                """
-            ),
-            {"id": damage_id},
-        ).mappings().first()
-        if existing is None:
-            raise HTTPException(status_code=404, detail="Hasar kaydı bulunamadı")
-
-        update_fields: dict[str, object] = {}
-        if body.plate is not None:
-            plate = body.plate.strip().upper()
-            update_fields["plate"] = plate
-            update_fields["vehicle_id"] = _resolve_vehicle_id(con, plate)
-        if body.title is not None:
-            title = body.title.strip()
-            update_fields["title"] = title
-        if body.description is not None:
-            desc = body.description.strip()
-            update_fields["description"] = desc if desc else None
-        if severity_label is not None:
-            update_fields["severity"] = severity_label
-        if body.occurred_at is not None:
-            update_fields["occurred_at"] = body.occurred_at
+    update_fields: dict[str, object] = {}
+    if body.plate is not None:
+        update_fields["plate"] = body.plate.strip().upper()
+    if body.title is not None:
+        title = body.title.strip()
+        update_fields["title"] = title
+    if body.description is not None:
+        desc = body.description.strip()
+        update_fields["description"] = desc if desc else None
+    if severity_label is not None:
+        update_fields["severity"] = severity_label
+    if body.occurred_at is not None:
+        update_fields["occurred_at"] = body.occurred_at
 
+    with engine.begin() as con:
         if update_fields:
             params = {"id": damage_id}
             params.update(update_fields)
-            set_clause = ", ".join(f"{key} = :{key}" for key in update_fields.keys())
-            con.execute(
+            row = con.execute(
                 text(
                     f"""
                     UPDATE damages
-                    SET {set_clause}
+                    SET {_update_set_clause(update_fields)}
                     WHERE id = :id
+                    RETURNING id, vehicle_id, plate, title, description, severity, occurred_at, created_at
                     """
                 ),
                 params,
-            )
-
-        for att in attachments_payload:
-            con.execute(
+            ).mappings().first()
+        else:
+            row = con.execute(
                 text(
                     """
-                    INSERT INTO damage_attachments (damage_id, file_name, mime_type, content)
-                    VALUES (:damage_id, :file_name, :mime_type, :content)
+                    SELECT id, vehicle_id, plate, title, description, severity, occurred_at, created_at
+                    FROM damages
+                    WHERE id = :id
                     """
                 ),
-                {
-                    "damage_id": damage_id,
-                    "file_name": att["file_name"],
-                    "mime_type": att["mime_type"],
-                    "content": att["content"],
-                },
-            )
-        return _fetch_damage(con, damage_id)
+                {"id": damage_id},
+            ).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Hasar kaydı bulunamadı")
+
+        attachments = list(_select_attachments(con, "damage_attachments", "damage_id", damage_id))
+        attachments += _insert_attachments(con, "damage_attachments", "damage_id", damage_id, attachments_payload)
+    _invalidate_tco()
+    return _serialize_damage_row(row, attachments)
 
 def update_expense(expense_id: int, body: ExpenseUpdateRequest):
     if body.admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
 
-    attachments_payload = []
-    for att in body.attachments:
-        if not att.content_base64:
-            continue
-        content = _decode_base64_content(att.content_base64)
-        if not content:
-            continue
-        attachments_payload.append(
-            {
-                "file_name": os.path.basename(att.file_name) if att.file_name else "belge",
-                "mime_type": att.mime_type or "application/octet-stream",
-                "content": content,
-            }
-        )
-
-    with engine.begin() as con:
-        existing = con.execute(
-            text("SELECT id, plate FROM expenses WHERE id = :id"),
-            {"id": expense_id},
-        ).mappings().first()
-        if existing is None:
-            raise HTTPException(status_code=404, detail="Masraf kaydı bulunamadı")
+    attachments_payload = _prepare_attachments(body.attachments, "belge")
 
-        update_fields: dict[str, object] = {}
-        if body.plate is not None:
-            plate = body.plate.strip().upper()
-            update_fields["plate"] = plate
-            update_fields["vehicle_id"] = _resolve_vehicle_id(con, plate)
-        if body.category is not None:
-            update_fields["category"] = body.category.strip()
-        if body.amount is not None:
-            update_fields["amount"] = body.amount
-        if body.description is not None:
-            desc = body.description.strip()
-            update_fields["description"] = desc if desc else None
-        if body.expense_date is not None:
-            update_fields["expense_date"] = body.expense_date
+    update_fields: dict[str, object] = {}
+    if body.plate is not None:
+        update_fields["plate"] = body.plate.strip().upper()
+    if body.category is not None:
+        update_fields["category"] = body.category.strip()
+    if body.amount is not None:
+        update_fields["amount"] = body.amount
+    if body.description is not None:
+        desc = body.description.strip()
+        update_fields["description"] = desc if desc else None
+    if body.expense_date is not None:
+        update_fields["expense_date"] = body.expense_date
 
+    with engine.begin() as con:
         if update_fields:
             params = {"id": expense_id}
             params.update(update_fields)
-            set_clause = ", ".join(f"{key} = :{key}" for key in update_fields.keys())
-            con.execute(
+            touches_rollup = bool(update_fields.keys() & {"plate", "category", "amount", "expense_date"})
+            if touches_rollup:
+                _rollup_expense(con, expense_id, -1)
+            row = con.execute(
                 text(
                     f"""
                     UPDATE expenses
-                    SET {set_clause}
+                    SET {_update_set_clause(update_fields)}
                     WHERE id = :id
+                    RETURNING id, vehicle_id, plate, category, amount, description, expense_date, created_at
                     """
                 ),
                 params,
-            )
-
-        for att in attachments_payload:
-            con.execute(
+            ).mappings().first()
+            if row is not None and touches_rollup:
+                _rollup_expense(con, expense_id, 1)
+        else:
+            row = con.execute(
                 text(
                     """
-                    INSERT INTO expense_attachments (expense_id, file_name, mime_type, content)
-                    VALUES (:expense_id, :file_name, :mime_type, :content)
+                    SELECT id, vehicle_id, plate, category, amount, description, expense_date, created_at
+                    FROM expenses
+                    WHERE id = :id
                     """
                 ),
-                {
-                    "expense_id": expense_id,
-                    "file_name": att["file_name"],
-                    "mime_type": att["mime_type"],
-                    "content": att["content"],
-                },
-            )
-        return _fetch_expense(con, expense_id)
+                {"id": expense_id},
+            ).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Masraf kaydı bulunamadı")
+
+        attachments = list(_select_attachments(con, "expense_attachments", "expense_id", expense_id))
+        attachments += _insert_attachments(con, "expense_attachments", "expense_id", expense_id, attachments_payload)
+    _invalidate_tco()
+    return _serialize_expense_row(row, attachments)
 
 def delete_damage(damage_id: int, admin_password: str):
     if admin_password != VEHICLE_ADMIN_PASSWORD:
@@ -1575,55 +3051,32 @@ def delete_damage(damage_id: int, admin_password: str):
         ).mappings().first()
     if deleted is None:
         raise HTTPException(status_code=404, detail="Hasar kaydı bulunamadı")
+    _invalidate_tco()
     return Response(status_code=204)
 
-def list_assignments():
-    with engine.begin() as con:
-        rows = con.execute(
-            text(
-                """
-                SELECT a.id,
-                       a.vehicle_id,
-                       a.plate,
-                       a.person_name,
-                       a.person_title,
-                       a.vehicle_make,
-                       a.vehicle_model,
-                       a.vehicle_km,
-                       a.assignment_date,
-                       a.expected_return_date,
-                       a.description,
-                       a.created_at
-                FROM assignments a
-                ORDER BY a.assignment_date DESC, a.created_at DESC
-                """
-            )
-        ).mappings().all()
-        if not rows:
-            return []
-        assignment_ids = [row["id"] for row in rows]
-        attachments_map: dict[int, list[Mapping[str, object]]] = {row["id"]: [] for row in rows}
-        att_stmt = (
-            text(
-                """
-                SELECT id,
-                       assignment_id,
-                       file_name,
-                       mime_type,
-                       octet_length(content) as size_bytes,
-                       content
-                FROM assignment_attachments
-                WHERE assignment_id IN :ids
-                ORDER BY id
-                """
-            ).bindparams(bindparam("ids", expanding=True))
-            if assignment_ids
-            else None
-        )
-        if att_stmt is not None:
-            for att in con.execute(att_stmt, {"ids": assignment_ids}).mappings().all():
-                attachments_map.setdefault(att["assignment_id"], []).append(att)
-        return [_serialize_assignment_row(row, attachments_map.get(row["id"], [])) for row in rows]
+def _assignment_list_rows(con, attachment_content: bool = True, ids: list[int] | None = None):
+    sql = """
+        SELECT a.id,
+               a.vehicle_id,
+               a.plate,
+               a.person_name,
+               a.person_title,
+               a.vehicle_make,
+               a.vehicle_model,
+               a.vehicle_km,
+               a.assignment_date,
+               a.expected_return_date,
+               a.description,
+               a.created_at
+        FROM assignments a
+    """
+    if ids is not None:
+        sql += " WHERE a.id IN :ids"
+    sql += " ORDER BY a.assignment_date DESC, a.created_at DESC"
+    rows = con.execute(_with_id_filter(text(sql), ids), {"ids": ids}).mappings().all()
+    return rows, _attachments_by_owner(con, "assignment_attachments", "assignment_id", [row["id"] for row in rows], attachment_content)
+
+_query_assignments = _read_query(_assignment_list_rows, lambda raw: _serialize_owned_rows(_serialize_assignment_row, *raw))
 
 def _fetch_assignment(con, assignment_id: int):
     row = con.execute(
@@ -1649,22 +3102,7 @@ def _fetch_assignment(con, assignment_id: int):
     ).mappings().first()
     if row is None:
         raise HTTPException(status_code=404, detail="Zimmet kaydı bulunamadı")
-    attachments = con.execute(
-        text(
-            """
-            SELECT id,
-                   assignment_id,
-                   file_name,
-                   mime_type,
-                   octet_length(content) as size_bytes,
-                   content
-            FROM assignment_attachments
-            WHERE assignment_id = :id
-            ORDER BY id
-            """
-        ),
-        {"id": assignment_id},
-    ).mappings().all()
+    attachments = _select_attachments(con, "assignment_attachments", "assignment_id", assignment_id)
     return _serialize_assignment_row(row, attachments)
 
 def create_assignment(body: AssignmentCreateRequest):
@@ -1677,26 +3115,12 @@ def create_assignment(body: AssignmentCreateRequest):
     if not person_name:
         raise HTTPException(status_code=400, detail="Personel adı zorunludur")
 
-    attachments_payload = []
-    for att in body.attachments:
-        if not att.content_base64:
-            continue
-        content = _decode_base64_content(att.content_base64)
-        if not content:
-            continue
-        attachments_payload.append(
-            {
-                "file_name": os.path.basename(att.file_name) if att.file_name else "dosya",
-                "mime_type": att.mime_type or "application/octet-stream",
-                "content": content,
-            }
-        )
+    attachments_payload = _prepare_attachments(body.attachments, "dosya")
 
     with engine.begin() as con:
-        vehicle_id = _resolve_vehicle_id(con, plate)
         row = con.execute(
             text(
-                """
+                f"""
                 INSERT INTO assignments (
                     vehicle_id,
                     plate,
@@ -1710,7 +3134,7 @@ def create_assignment(body: AssignmentCreateRequest):
                     description
                 )
                 VALUES (
-                    :vehicle_id,
+                    {_VEHICLE_ID_BY_PLATE_SQL},
                     :plate,
                     :person_name,
                     :person_title,
@@ -1721,11 +3145,21 @@ def create_assignment(body: AssignmentCreateRequest):
                     :expected_return_date,
                     :description
                 )
-                RETURNING id
+                RETURNING id,
+                          vehicle_id,
+                          plate,
+                          person_name,
+                          person_title,
+                          vehicle_make,
+                          vehicle_model,
+                          vehicle_km,
+                          assignment_date,
+                          expected_return_date,
+                          description,
+                          created_at
                 """
             ),
             {
-                "vehicle_id": vehicle_id,
                 "plate": plate,
                 "person_name": person_name,
                 "person_title": body.person_title.strip() if body.person_title else None,
@@ -1737,134 +3171,86 @@ def create_assignment(body: AssignmentCreateRequest):
                 "description": body.description.strip() if body.description else None,
             },
         ).mappings().first()
-        assignment_id = row["id"]
-        for att in attachments_payload:
-            con.execute(
-                text(
-                    """
-                    INSERT INTO assignment_attachments (
-                        assignment_id,
-                        file_name,
-                        mime_type,
-                        content
-                    )
-                    VALUES (
-                        :assignment_id,
-                        :file_name,
-                        :mime_type,
-                        :content
-                    )
-                    """
-                ),
-                {
-                    "assignment_id": assignment_id,
-                    "file_name": att["file_name"],
-                    "mime_type": att["mime_type"],
-                    "content": att["content"],
-                },
-            )
-        return _fetch_assignment(con, assignment_id)
+        attachments = _insert_attachments(con, "assignment_attachments", "assignment_id", row["id"], attachments_payload)
+    return _serialize_assignment_row(row, attachments)
 
 def update_assignment(assignment_id: int, body: AssignmentUpdateRequest):
     if body.admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
 
-    attachments_payload = []
-    for att in body.attachments:
-        if not att.content_base64:
-            continue
-        content = _decode_base64_content(att.content_base64)
-        if not content:
-            continue
-        attachments_payload.append(
-            {
-                "file_name": os.path.basename(att.file_name) if att.file_name else "dosya",
-                "mime_type": att.mime_type or "application/octet-stream",
-                "content": content,
-            }
-        )
+    attachments_payload = _prepare_attachments(body.attachments, "dosya")
 
+    update_fields: dict[str, object] = {}
+    if body.plate is not None:
+        plate = body.plate.strip().upper()
+        if not plate:
+            raise HTTPException(status_code=400, detail="Plaka boş olamaz")
+        update_fields["plate"] = plate
+    if body.person_name is not None:
+        person_name = body.person_name.strip()
+        if not person_name:
+            raise HTTPException(status_code=400, detail="Personel adı boş olamaz")
+        update_fields["person_name"] = person_name
+    if body.person_title is not None:
+        title = body.person_title.strip()
+        update_fields["person_title"] = title if title else None
+    if body.vehicle_make is not None:
+        make = body.vehicle_make.strip()
+        update_fields["vehicle_make"] = make if make else None
+    if body.vehicle_model is not None:
+        mdl = body.vehicle_model.strip()
+        update_fields["vehicle_model"] = mdl if mdl else None
+    if body.vehicle_km is not None:
+        km = body.vehicle_km.strip()
+        update_fields["vehicle_km"] = km if km else None
+    if body.assignment_date is not None:
+        update_fields["assignment_date"] = body.assignment_date
+    if body.expected_return_date is not None:
+        update_fields["expected_return_date"] = body.expected_return_date
+    if body.description is not None:
+        desc = body.description.strip()
+        update_fields["description"] = desc if desc else None
+
+    returning_sql = """
+        id,
+        vehicle_id,
+        plate,
+        person_name,
+        person_title,
+        vehicle_make,
+        vehicle_model,
+        vehicle_km,
+        assignment_date,
+        expected_return_date,
+        description,
+        created_at
+    """
     with engine.begin() as con:
-        existing = con.execute(
-            text("SELECT id FROM assignments WHERE id = :id"),
-            {"id": assignment_id},
-        ).mappings().first()
-        if existing is None:
-            raise HTTPException(status_code=404, detail="Zimmet kaydı bulunamadı")
-
-        update_fields: dict[str, object] = {}
-        if body.plate is not None:
-            plate = body.plate.strip().upper()
-            if not plate:
-                raise HTTPException(status_code=400, detail="Plaka boş olamaz")
-            update_fields["plate"] = plate
-            update_fields["vehicle_id"] = _resolve_vehicle_id(con, plate)
-        if body.person_name is not None:
-            person_name = body.person_name.strip()
-            if not person_name:
-                raise HTTPException(status_code=400, detail="Personel adı boş olamaz")
-            update_fields["person_name"] = person_name
-        if body.person_title is not None:
-            title = body.person_title.strip()
-            update_fields["person_title"] = title if title else None
-        if body.vehicle_make is not None:
-            make = body.vehicle_make.strip()
-            update_fields["vehicle_make"] = make if make else None
-        if body.vehicle_model is not None:
-            mdl = body.vehicle_model.strip()
-            update_fields["vehicle_model"] = mdl if mdl else None
-        if body.vehicle_km is not None:
-            km = body.vehicle_km.strip()
-            update_fields["vehicle_km"] = km if km else None
-        if body.assignment_date is not None:
-            update_fields["assignment_date"] = body.assignment_date
-        if body.expected_return_date is not None:
-            update_fields["expected_return_date"] = body.expected_return_date
-        if body.description is not None:
-            desc = body.description.strip()
-            update_fields["description"] = desc if desc else None
-
         if update_fields:
             params = {"id": assignment_id}
             params.update(update_fields)
-            set_clause = ", ".join(f"{key} = :{key}" for key in update_fields.keys())
-            con.execute(
+            row = con.execute(
                 text(
                     f"""
                     UPDATE assignments
-                    SET {set_clause}
+                    SET {_update_set_clause(update_fields)}
                     WHERE id = :id
+                    RETURNING {returning_sql}
                     """
                 ),
                 params,
-            )
+            ).mappings().first()
+        else:
+            row = con.execute(
+                text(f"SELECT {returning_sql} FROM assignments WHERE id = :id"),
+                {"id": assignment_id},
+            ).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Zimmet kaydı bulunamadı")
 
-        for att in attachments_payload:
-            con.execute(
-                text(
-                    """
-                    INSERT INTO assignment_attachments (
-                        assignment_id,
-                        file_name,
-                        mime_type,
-                        content
-                    )
-                    VALUES (
-                        :assignment_id,
-                        :file_name,
-                        :mime_type,
-                        :content
-                    )
-                    """
-                ),
-                {
-                    "assignment_id": assignment_id,
-                    "file_name": att["file_name"],
-                    "mime_type": att["mime_type"],
-                    "content": att["content"],
-                },
-            )
-        return _fetch_assignment(con, assignment_id)
+        attachments = list(_select_attachments(con, "assignment_attachments", "assignment_id", assignment_id))
+        attachments += _insert_attachments(con, "assignment_attachments", "assignment_id", assignment_id, attachments_payload)
+    return _serialize_assignment_row(row, attachments)
 
 def delete_assignment(assignment_id: int, admin_password: str):
     if admin_password != VEHICLE_ADMIN_PASSWORD:
@@ -1882,27 +3268,28 @@ def delete_expense(expense_id: int, admin_password: str):
     if admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
     with engine.begin() as con:
+        _rollup_expense(con, expense_id, -1)
         deleted = con.execute(
             text("DELETE FROM expenses WHERE id = :id RETURNING id"),
             {"id": expense_id},
         ).mappings().first()
     if deleted is None:
         raise HTTPException(status_code=404, detail="Masraf kaydı bulunamadı")
+    _invalidate_tco()
     return Response(status_code=204)
 
-def list_fuel_entries():
-    with engine.begin() as con:
-        rows = con.execute(
-            text(
-                """
-                SELECT f.id, f.vehicle_id, f.plate, f.liters, f.amount, f.refuel_date,
-                       f.odometer, f.note, f.created_at
-                FROM fuel_entries f
-                ORDER BY f.refuel_date DESC, f.created_at DESC
-                """
-            )
-        ).mappings().all()
-    return [_serialize_fuel_entry(row) for row in rows]
+def _fuel_entry_rows(con, ids: list[int] | None = None):
+    sql = """
+        SELECT f.id, f.vehicle_id, f.plate, f.liters, f.amount, f.refuel_date,
+               f.odometer, f.note, f.created_at
+        FROM fuel_entries f
+    """
+    if ids is not None:
+        sql += " WHERE f.id IN :ids"
+    sql += " ORDER BY f.refuel_date DESC, f.created_at DESC"
+    return con.execute(_with_id_filter(text(sql), ids), {"ids": ids}).mappings().all()
+
+_query_fuel_entries = _read_query(_fuel_entry_rows, lambda rows: [_serialize_fuel_entry(row) for row in rows])
 
 def _fetch_fuel_entry(con, fuel_id: int):
     row = con.execute(
@@ -1926,17 +3313,15 @@ def create_fuel_entry(body: FuelCreateRequest):
     plate = body.plate.strip().upper()
     note = body.note.strip() if body.note else None
     with engine.begin() as con:
-        vehicle_id = _resolve_vehicle_id(con, plate)
         row = con.execute(
             text(
-                """
+                f"""
                 INSERT INTO fuel_entries (vehicle_id, plate, liters, amount, refuel_date, odometer, note)
-                VALUES (:vehicle_id, :plate, :liters, :amount, :refuel_date, :odometer, :note)
+                VALUES ({_VEHICLE_ID_BY_PLATE_SQL}, :plate, :liters, :amount, :refuel_date, :odometer, :note)
                 RETURNING id, vehicle_id, plate, liters, amount, refuel_date, odometer, note, created_at
                 """
             ),
             {
-                "vehicle_id": vehicle_id,
                 "plate": plate,
                 "liters": body.liters,
                 "amount": body.amount,
@@ -1945,177 +3330,1326 @@ def create_fuel_entry(body: FuelCreateRequest):
                 "note": note if note else None,
             },
         ).mappings().first()
-        return _serialize_fuel_entry(row)
+        _rollup_fuel_entry(con, row["id"], 1)
+    _invalidate_fuel_analytics(plate)
+    _invalidate_tco()
+    return _serialize_fuel_entry(row)
 
 def update_fuel_entry(fuel_id: int, body: FuelUpdateRequest):
     if body.admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
+
+    update_fields: dict[str, object] = {}
+    if body.plate is not None:
+        update_fields["plate"] = body.plate.strip().upper()
+    if body.liters is not None:
+        update_fields["liters"] = body.liters
+    if body.amount is not None:
+        update_fields["amount"] = body.amount
+    if body.refuel_date is not None:
+        update_fields["refuel_date"] = body.refuel_date
+    if body.odometer is not None:
+        update_fields["odometer"] = body.odometer
+    if body.note is not None:
+        note = body.note.strip()
+        update_fields["note"] = note if note else None
+
     with engine.begin() as con:
-        existing = con.execute(
-            text("SELECT id, plate FROM fuel_entries WHERE id = :id"),
-            {"id": fuel_id},
+        if not update_fields:
+            return _fetch_fuel_entry(con, fuel_id)
+
+        params = {"id": fuel_id}
+        params.update(update_fields)
+        touches_rollup = bool(update_fields.keys() & {"plate", "liters", "amount", "refuel_date"})
+        if touches_rollup:
+            _rollup_fuel_entry(con, fuel_id, -1)
+        # Eski plaka, analitik önbelleğini geçersiz kılmak için aynı turda döndürülür
+        row = con.execute(
+            text(
+                f"""
+                UPDATE fuel_entries
+                SET {_update_set_clause(update_fields)}
+                FROM (SELECT id AS old_id, plate AS old_plate FROM fuel_entries WHERE id = :id) old
+                WHERE fuel_entries.id = old.old_id
+                RETURNING fuel_entries.id, fuel_entries.vehicle_id, fuel_entries.plate, fuel_entries.liters,
+                          fuel_entries.amount, fuel_entries.refuel_date, fuel_entries.odometer, fuel_entries.note,
+                          fuel_entries.created_at, old.old_plate
+                """
+            ),
+            params,
         ).mappings().first()
-        if existing is None:
+        if row is None:
             raise HTTPException(status_code=404, detail="Yakıt kaydı bulunamadı")
+        if touches_rollup:
+            _rollup_fuel_entry(con, fuel_id, 1)
+    _invalidate_fuel_analytics(row["old_plate"], row["plate"])
+    _invalidate_tco()
+    return _serialize_fuel_entry(row)
 
-        update_fields: dict[str, object] = {}
-        if body.plate is not None:
-            plate = body.plate.strip().upper()
-            update_fields["plate"] = plate
-            update_fields["vehicle_id"] = _resolve_vehicle_id(con, plate)
-        if body.liters is not None:
-            update_fields["liters"] = body.liters
-        if body.amount is not None:
-            update_fields["amount"] = body.amount
-        if body.refuel_date is not None:
-            update_fields["refuel_date"] = body.refuel_date
-        if body.odometer is not None:
-            update_fields["odometer"] = body.odometer
-        if body.note is not None:
-            note = body.note.strip()
-            update_fields["note"] = note if note else None
+def delete_fuel_entry(fuel_id: int, admin_password: str):
+    if admin_password != VEHICLE_ADMIN_PASSWORD:
+        raise HTTPException(status_code=403, detail="Şifre hatalı")
+    with engine.begin() as con:
+        _rollup_fuel_entry(con, fuel_id, -1)
+        deleted = con.execute(
+            text("DELETE FROM fuel_entries WHERE id = :id RETURNING id, plate"),
+            {"id": fuel_id},
+        ).mappings().first()
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="Yakıt kaydı bulunamadı")
+    _invalidate_fuel_analytics(deleted["plate"])
+    _invalidate_tco()
+    return Response(status_code=204)
 
-        if update_fields:
-            params = {"id": fuel_id}
-            params.update(update_fields)
-            set_clause = ", ".join(f"{key} = :{key}" for key in update_fields.keys())
+# --- Toplu yakıt kartı ekstresi aktarımı ---
+def _parse_fuel_batch_csv(content: str) -> tuple[list[FuelBatchItem], list[dict[str, object]]]:
+    items: list[FuelBatchItem] = []
+    invalid: list[dict[str, object]] = []
+    reader = csv.DictReader(io.StringIO(content.lstrip("\ufeff")))
+    for line_no, raw in enumerate(reader, start=2):
+        record = {(k or "").strip().lower(): (v or "").strip() for k, v in raw.items()}
+        record = {k: v for k, v in record.items() if v != ""}
+        for key in ("liters", "amount"):
+            if key in record:
+                record[key] = record[key].replace(",", ".")
+        try:
+            items.append(FuelBatchItem(**record))
+        except ValidationError as exc:
+            invalid.append({"line": line_no, "error": exc.errors()[0].get("msg")})
+    return items, invalid
+
+def _fuel_dedupe_key(plate: str, refuel_date: date, liters, amount) -> tuple:
+    # NUMERIC(…,2) kolonlarıyla aynı yuvarlama (PostgreSQL yarımları sıfırdan uzağa yuvarlar)
+    cent = Decimal("0.01")
+    return (
+        plate,
+        refuel_date,
+        Decimal(str(liters)).quantize(cent, rounding=ROUND_HALF_UP),
+        Decimal(str(amount)).quantize(cent, rounding=ROUND_HALF_UP),
+    )
+
+def ingest_fuel_batch(body: FuelBatchRequest) -> dict:
+    if body.admin_password != VEHICLE_ADMIN_PASSWORD:
+        raise HTTPException(status_code=403, detail="Şifre hatalı")
+    items = list(body.entries)
+    invalid: list[dict[str, object]] = []
+    if body.csv_content:
+        csv_items, invalid = _parse_fuel_batch_csv(body.csv_content)
+        items.extend(csv_items)
+    if not items and not invalid:
+        raise HTTPException(status_code=400, detail="Aktarılacak yakıt kaydı yok")
+    if not items:
+        raise HTTPException(status_code=400, detail={"message": "CSV satırlarının hiçbiri geçerli değil", "invalid_rows": invalid})
+
+    plates = sorted({item.plate.strip().upper() for item in items if item.plate.strip()})
+    min_date = min(item.refuel_date for item in items)
+    max_date = max(item.refuel_date for item in items)
+
+    with engine.begin() as con:
+        vehicle_ids = {
+            r["plate"]: r["id"]
+            for r in con.execute(
+                text("SELECT id, plate FROM vehicles WHERE plate = ANY(:plates)"), {"plates": plates}
+            ).mappings()
+        }
+        seen = {
+            _fuel_dedupe_key(r["plate"], r["refuel_date"], r["liters"], r["amount"])
+            for r in con.execute(
+                text(
+                    """
+                    SELECT plate, refuel_date, liters, amount
+                    FROM fuel_entries
+                    WHERE plate = ANY(:plates) AND refuel_date BETWEEN :min_date AND :max_date
+                    """
+                ),
+                {"plates": list(vehicle_ids.keys()), "min_date": min_date, "max_date": max_date},
+            ).mappings()
+        }
+
+        to_insert: list[dict[str, object]] = []
+        duplicates = 0
+        unknown_plates: set[str] = set()
+        unknown_count = 0
+        for item in items:
+            plate = item.plate.strip().upper()
+            if plate not in vehicle_ids:
+                unknown_plates.add(plate)
+                unknown_count += 1
+                continue
+            key = _fuel_dedupe_key(plate, item.refuel_date, item.liters, item.amount)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            note = item.note.strip() if item.note else None
+            to_insert.append(
+                {
+                    "vehicle_id": vehicle_ids[plate],
+                    "plate": plate,
+                    "liters": item.liters,
+                    "amount": item.amount,
+                    "refuel_date": item.refuel_date,
+                    "odometer": item.odometer,
+                    "note": note or None,
+                }
+            )
+
+        for start in range(0, len(to_insert), FUEL_BATCH_CHUNK_SIZE):
+            chunk = to_insert[start:start + FUEL_BATCH_CHUNK_SIZE]
+            params: dict[str, object] = {}
+            values_sql = []
+            for idx, entry in enumerate(chunk):
+                values_sql.append(
+                    f"(:vehicle_id_{idx}, :plate_{idx}, :liters_{idx}, :amount_{idx}, :refuel_date_{idx}, :odometer_{idx}, :note_{idx})"
+                )
+                params.update({f"{key}_{idx}": value for key, value in entry.items()})
+            # Kayıtlar ve aylık özet tek ifadede yazılır
             con.execute(
                 text(
                     f"""
-                    UPDATE fuel_entries
-                    SET {set_clause}
-                    WHERE id = :id
+                    WITH ins AS (
+                      INSERT INTO fuel_entries (vehicle_id, plate, liters, amount, refuel_date, odometer, note)
+                      VALUES {", ".join(values_sql)}
+                      RETURNING plate, liters, amount, refuel_date
+                    )
+                    INSERT INTO fuel_monthly_rollup (plate, month, total_liters, total_amount, entry_count)
+                    SELECT plate, date_trunc('month', refuel_date)::date, SUM(liters), SUM(amount), COUNT(*)
+                    FROM ins
+                    GROUP BY 1, 2
+                    ON CONFLICT (plate, month) DO UPDATE
+                    SET total_liters = fuel_monthly_rollup.total_liters + EXCLUDED.total_liters,
+                        total_amount = fuel_monthly_rollup.total_amount + EXCLUDED.total_amount,
+                        entry_count = fuel_monthly_rollup.entry_count + EXCLUDED.entry_count
                     """
                 ),
                 params,
             )
-        return _fetch_fuel_entry(con, fuel_id)
 
-def delete_fuel_entry(fuel_id: int, admin_password: str):
-    if admin_password != VEHICLE_ADMIN_PASSWORD:
+    _invalidate_fuel_analytics(*{entry["plate"] for entry in to_insert})
+    _invalidate_tco()
+    return {
+        "received": len(items) + len(invalid),
+        "inserted": len(to_insert),
+        "duplicates": duplicates,
+        "unknown_plates": unknown_count,
+        "unknown_plate_list": sorted(unknown_plates),
+        "invalid": len(invalid),
+        "invalid_rows": invalid,
+    }
+
+# --- Yakıt tüketim analizi (L/100 km, maliyet/km) ---
+# Sonuçlar plaka bazında süreç içi önbellekte tutulur; yakıt yazma yolları ilgili plakayı geçersiz kılar.
+# Hesaplama kilit dışında yapıldığından her plakanın bir nesil sayacı vardır: hesap sürerken
+# geçersiz kılınan plakanın sonucu önbelleğe yazılmaz.
+_FUEL_ANALYTICS_CACHE: dict[str, dict] = {}
+_FUEL_ANALYTICS_GENERATIONS: dict[str, int] = {}
+_FUEL_ANALYTICS_LOCK = threading.Lock()
+
+# Tam depo yöntemi: ardışık iki geçerli kilometre okuması arasındaki mesafe, aradaki dolumların
+# (kapanış dolumu dahil) litresiyle tüketilmiş kabul edilir. Boş veya önceki en yüksek değerin
+# altına düşen okumalar segment sınırı sayılmaz; o dolumların litresi bir sonraki segmente eklenir.
+_FUEL_SEGMENT_CTES = """
+      ordered AS (
+      SELECT f.id, f.plate, f.refuel_date, f.liters, f.amount, f.odometer,
+             MAX(f.odometer) OVER (
+               PARTITION BY f.plate ORDER BY f.refuel_date, f.id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+             ) AS prev_max_odometer
+      FROM fuel_entries f
+      {where}
+    ), flagged AS (
+      SELECT *,
+             (odometer IS NOT NULL AND (prev_max_odometer IS NULL OR odometer > prev_max_odometer)) AS valid_reading
+      FROM ordered
+    ), grouped AS (
+      SELECT *,
+             COUNT(*) FILTER (WHERE valid_reading) OVER (
+               PARTITION BY plate ORDER BY refuel_date, id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+             ) AS segment
+      FROM flagged
+    ), segments AS (
+      SELECT plate,
+             segment,
+             MAX(odometer) FILTER (WHERE valid_reading) AS end_odometer,
+             MAX(refuel_date) FILTER (WHERE valid_reading) AS end_date,
+             MIN(refuel_date) AS start_date,
+             SUM(liters) AS liters,
+             SUM(amount) AS amount,
+             COUNT(*) AS fill_count,
+             COUNT(*) FILTER (WHERE odometer IS NULL) AS missing_odometer,
+             COUNT(*) FILTER (WHERE odometer IS NOT NULL AND NOT valid_reading) AS regressed_odometer
+      FROM grouped
+      GROUP BY plate, segment
+    ), measured AS (
+      SELECT *,
+             LAG(end_odometer) OVER (PARTITION BY plate ORDER BY segment) AS start_odometer
+      FROM segments
+    )
+"""
+_FUEL_SEGMENTS_SQL = "WITH" + _FUEL_SEGMENT_CTES.format(where="WHERE f.plate = ANY(:plates)") + """
+    SELECT plate, segment, start_date, end_date, start_odometer, end_odometer,
+           (end_odometer - start_odometer) AS distance_km,
+           liters, amount, fill_count, missing_odometer, regressed_odometer
+    FROM measured
+    ORDER BY plate, segment
+"""
+
+def _ratio(numerator: float, denominator: float, scale: float = 1.0, digits: int = 3) -> float | None:
+    if not denominator:
+        return None
+    return round(numerator * scale / denominator, digits)
+
+def _compute_fuel_analytics(plates: list[str]) -> dict[str, dict]:
+    # Bilerek birincilden okunur: önbellek yazmada geçersiz kılınır, replika gecikmesi eski veriyi yeniden önbelleğe alabilir
+    with engine.begin() as con:
+        rows = con.execute(text(_FUEL_SEGMENTS_SQL), {"plates": plates}).mappings().all()
+
+    results: dict[str, dict] = {}
+    for row in rows:
+        plate = row["plate"]
+        entry = results.setdefault(
+            plate,
+            {
+                "plate": plate,
+                "fill_count": 0,
+                "total_liters": 0.0,
+                "total_amount": 0.0,
+                "missing_odometer": 0,
+                "regressed_odometer": 0,
+                "segments": [],
+                "_months": {},
+            },
+        )
+        liters = float(row["liters"] or 0)
+        amount = float(row["amount"] or 0)
+        entry["fill_count"] += int(row["fill_count"])
+        entry["total_liters"] += liters
+        entry["total_amount"] += amount
+        entry["missing_odometer"] += int(row["missing_odometer"])
+        entry["regressed_odometer"] += int(row["regressed_odometer"])
+
+        distance = row["distance_km"]
+        if row["start_odometer"] is None or row["end_odometer"] is None or not distance or distance <= 0:
+            continue
+        distance = int(distance)
+        entry["segments"].append(
+            {
+                "start_date": row["start_date"].isoformat() if row["start_date"] else None,
+                "end_date": row["end_date"].isoformat() if row["end_date"] else None,
+                "start_odometer": int(row["start_odometer"]),
+                "end_odometer": int(row["end_odometer"]),
+                "distance_km": distance,
+                "liters": round(liters, 2),
+                "amount": round(amount, 2),
+                "l_per_100km": _ratio(liters, distance, 100),
+                "cost_per_km": _ratio(amount, distance),
+            }
+        )
+        month_key = row["end_date"].strftime("%Y-%m")
+        month = entry["_months"].setdefault(month_key, {"month": month_key, "distance_km": 0, "liters": 0.0, "amount": 0.0})
+        month["distance_km"] += distance
+        month["liters"] += liters
+        month["amount"] += amount
+
+    for entry in results.values():
+        segments = entry["segments"]
+        measured_km = sum(seg["distance_km"] for seg in segments)
+        measured_liters = sum(seg["liters"] for seg in segments)
+        measured_amount = sum(seg["amount"] for seg in segments)
+        entry["total_liters"] = round(entry["total_liters"], 2)
+        entry["total_amount"] = round(entry["total_amount"], 2)
+        entry["measured_km"] = measured_km
+        entry["l_per_100km"] = _ratio(measured_liters, measured_km, 100)
+        entry["cost_per_km"] = _ratio(measured_amount, measured_km)
+        entry["monthly"] = [
+            {
+                "month": m["month"],
+                "distance_km": m["distance_km"],
+                "liters": round(m["liters"], 2),
+                "amount": round(m["amount"], 2),
+                "l_per_100km": _ratio(m["liters"], m["distance_km"], 100),
+                "cost_per_km": _ratio(m["amount"], m["distance_km"]),
+            }
+            for _, m in sorted(entry.pop("_months").items())
+        ]
+    return results
+
+def _fuel_analytics_for(plates: list[str]) -> dict[str, dict]:
+    with _FUEL_ANALYTICS_LOCK:
+        cached = {p: _FUEL_ANALYTICS_CACHE[p] for p in plates if p in _FUEL_ANALYTICS_CACHE}
+        generations = {p: _FUEL_ANALYTICS_GENERATIONS.get(p, 0) for p in plates if p not in cached}
+    if generations:
+        computed = _compute_fuel_analytics(list(generations))
+        with _FUEL_ANALYTICS_LOCK:
+            for plate, result in computed.items():
+                if _FUEL_ANALYTICS_GENERATIONS.get(plate, 0) == generations.get(plate):
+                    _FUEL_ANALYTICS_CACHE[plate] = result
+        cached.update(computed)
+    return cached
+
+def _invalidate_fuel_analytics(*plates: str | None):
+    with _FUEL_ANALYTICS_LOCK:
+        for plate in plates:
+            if plate:
+                _FUEL_ANALYTICS_CACHE.pop(plate, None)
+                _FUEL_ANALYTICS_GENERATIONS[plate] = _FUEL_ANALYTICS_GENERATIONS.get(plate, 0) + 1
+
+def fuel_analytics_summary():
+    with engine.begin() as con:
+        plates = con.execute(text("SELECT DISTINCT plate FROM fuel_entries ORDER BY plate")).scalars().all()
+    if not plates:
+        return []
+    analytics = _fuel_analytics_for(list(plates))
+    return [
+        {key: value for key, value in analytics[p].items() if key not in {"segments", "monthly"}}
+        for p in plates
+        if p in analytics
+    ]
+
+def fuel_analytics_for_plate(plate: str):
+    plate_norm = plate.strip().upper()
+    analytics = _fuel_analytics_for([plate_norm]).get(plate_norm)
+    if analytics is None:
+        raise HTTPException(status_code=404, detail="Bu plaka için yakıt kaydı bulunamadı")
+    return analytics
+
+def _expense_list_rows(con, attachment_content: bool = True, ids: list[int] | None = None):
+    sql = """
+        SELECT e.id, e.vehicle_id, e.plate, e.category, e.amount, e.description,
+               e.expense_date, e.created_at
+        FROM expenses e
+    """
+    if ids is not None:
+        sql += " WHERE e.id IN :ids"
+    sql += " ORDER BY e.expense_date DESC, e.created_at DESC"
+    rows = con.execute(_with_id_filter(text(sql), ids), {"ids": ids}).mappings().all()
+    return rows, _attachments_by_owner(con, "expense_attachments", "expense_id", [row["id"] for row in rows], attachment_content)
+
+_query_expenses = _read_query(_expense_list_rows, lambda raw: _serialize_owned_rows(_serialize_expense_row, *raw))
+
+def _fetch_expense(con, expense_id: int):
+    row = con.execute(
+        text(
+            """
+            SELECT e.id, e.vehicle_id, e.plate, e.category, e.amount, e.description,
+                   e.expense_date, e.created_at
+            FROM expenses e
+            WHERE e.id = :id
+            """
+        ),
+        {"id": expense_id},
+    ).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Masraf kaydı bulunamadı")
+    attachments = _select_attachments(con, "expense_attachments", "expense_id", expense_id)
+    return _serialize_expense_row(row, attachments)
+
+def create_expense(body: ExpenseCreateRequest):
+    if body.admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
+    plate = body.plate.strip().upper()
+    attachments_payload = _prepare_attachments(body.attachments, "belge")
     with engine.begin() as con:
-        deleted = con.execute(
-            text("DELETE FROM fuel_entries WHERE id = :id RETURNING id"),
-            {"id": fuel_id},
+        row = con.execute(
+            text(
+                f"""
+                INSERT INTO expenses (vehicle_id, plate, category, amount, description, expense_date)
+                VALUES ({_VEHICLE_ID_BY_PLATE_SQL}, :plate, :category, :amount, :description, :expense_date)
+                RETURNING id, vehicle_id, plate, category, amount, description, expense_date, created_at
+                """
+            ),
+            {
+                "plate": plate,
+                "category": body.category.strip(),
+                "amount": body.amount,
+                "description": body.description.strip() if body.description else None,
+                "expense_date": body.expense_date,
+            },
         ).mappings().first()
-    if deleted is None:
-        raise HTTPException(status_code=404, detail="Yakıt kaydı bulunamadı")
-    return Response(status_code=204)
+        _rollup_expense(con, row["id"], 1)
+        attachments = _insert_attachments(con, "expense_attachments", "expense_id", row["id"], attachments_payload)
+    _invalidate_tco()
+    return _serialize_expense_row(row, attachments)
+
+# --- Liste uçlarında seyrek alan seçimi (fields= / include=) ---
+def _prefixed_columns(alias: str, names: tuple[str, ...]) -> dict[str, str]:
+    return {name: f"{alias}.{name}" for name in names}
+
+def _optional_float(value):
+    return float(value) if value is not None else None
+
+# En yakın (bugün veya sonrası) belge; yalnızca next_* / days_left alanları istendiğinde eklenir
+_NEXT_DOCUMENT_JOIN = """
+    LEFT JOIN LATERAL (
+        SELECT nd.valid_to FROM documents nd
+        WHERE nd.vehicle_id = v.id AND nd.valid_to >= CURRENT_DATE
+        ORDER BY nd.valid_to
+        LIMIT 1
+    ) nd ON true
+"""
+_SPARSE_LISTS: dict[str, dict[str, object]] = {
+    "vehicles": {
+        "from": "vehicles v",
+        "columns": {
+            **_prefixed_columns(
+                "v", ("id", "plate", "make", "model", "year", "responsible_email", "responsible_person", "created_at")
+            ),
+            "document_count": "(SELECT count(*) FROM documents dc WHERE dc.vehicle_id = v.id)",
+            "next_valid_to": "nd.valid_to",
+            "days_left": "(nd.valid_to - CURRENT_DATE)",
+            "next_status": "nd.valid_to",
+        },
+        "joins": {"next_valid_to": _NEXT_DOCUMENT_JOIN, "days_left": _NEXT_DOCUMENT_JOIN, "next_status": _NEXT_DOCUMENT_JOIN},
+        "formatters": {"next_status": lambda valid_to: _document_status(valid_to) if valid_to else None},
+        "search": "(v.plate ILIKE :q OR v.make ILIKE :q OR v.model ILIKE :q)",
+        "order_by": "v.plate",
+        "includes": ("documents",),
+    },
+    "damages": {
+        "from": "damages d",
+        "columns": _prefixed_columns(
+            "d", ("id", "vehicle_id", "plate", "title", "description", "severity", "occurred_at", "created_at")
+        ),
+        "order_by": "d.created_at DESC",
+        "attachments": ("damage_attachments", "damage_id"),
+        "includes": ("attachments", "attachment_content"),
+    },
+    "assignments": {
+        "from": "assignments a",
+        "columns": _prefixed_columns(
+            "a",
+            (
+                "id", "vehicle_id", "plate", "person_name", "person_title", "vehicle_make", "vehicle_model",
+                "vehicle_km", "assignment_date", "expected_return_date", "description", "created_at",
+            ),
+        ),
+        "order_by": "a.assignment_date DESC, a.created_at DESC",
+        "attachments": ("assignment_attachments", "assignment_id"),
+        "includes": ("attachments", "attachment_content"),
+    },
+    "expenses": {
+        "from": "expenses e",
+        "columns": {
+            **_prefixed_columns("e", ("id", "vehicle_id", "plate", "category", "description", "expense_date", "created_at")),
+            "amount": "COALESCE(e.amount, 0)",
+        },
+        "order_by": "e.expense_date DESC, e.created_at DESC",
+        "attachments": ("expense_attachments", "expense_id"),
+        "includes": ("attachments", "attachment_content"),
+    },
+    "fuels": {
+        "from": "fuel_entries f",
+        "columns": {
+            **_prefixed_columns("f", ("id", "vehicle_id", "plate", "refuel_date", "odometer", "note", "created_at")),
+            "liters": "COALESCE(f.liters, 0)",
+            "amount": "COALESCE(f.amount, 0)",
+            "unit_price": "(f.amount / NULLIF(f.liters, 0))",
+        },
+        "formatters": {"unit_price": _optional_float},
+        "order_by": "f.refuel_date DESC, f.created_at DESC",
+        "includes": (),
+    },
+}
+
+def _split_csv_param(value: str | None) -> list[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+BATCH_IDS_MAX = 500
+
+def _parse_id_list(ids: str | None) -> list[int] | None:
+    if ids is None:
+        return None
+    try:
+        values = list(dict.fromkeys(int(part) for part in _split_csv_param(ids)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz kimlik listesi")
+    if len(values) > BATCH_IDS_MAX:
+        raise HTTPException(status_code=400, detail=f"Tek istekte en fazla {BATCH_IDS_MAX} kimlik istenebilir")
+    return values
+
+def _parse_sparse_params(entity: str, fields: str | None, include: str | None) -> tuple[list[str], set[str]] | None:
+    """fields/include parametrelerini doğrular; ikisi de boşsa None döner (tam, geriye uyumlu yanıt)."""
+    if fields is None and include is None:
+        return None
+    spec = _SPARSE_LISTS[entity]
+    columns = spec["columns"]
+    requested = _split_csv_param(fields) or list(columns)
+    unknown = [name for name in requested if name not in columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Geçersiz alan: {', '.join(unknown)}")
+    includes = set(_split_csv_param(include))
+    invalid = sorted(includes - set(spec["includes"]))
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Geçersiz include değeri: {', '.join(invalid)}")
+    # id her zaman döner; ekler ve belgeler bu anahtarla eşlenir
+    selected = ["id", *dict.fromkeys(name for name in requested if name != "id")]
+    return selected, includes
+
+def _sparse_list_rows(
+    con, entity: str, fields: list[str], includes: set[str], q: str | None = None, ids: list[int] | None = None
+):
+    """Yalnızca istenen kolonları seçer; ilişkili belge/ekler yalnızca include ile istenirse okunur."""
+    spec = _SPARSE_LISTS[entity]
+    columns = spec["columns"]
+    joins = spec.get("joins", {})
+    sql = "SELECT " + ", ".join(f"{columns[name]} AS {name}" for name in fields)
+    sql += f" FROM {spec['from']}"
+    sql += "".join(dict.fromkeys(joins[name] for name in fields if name in joins))
+    conditions: list[str] = []
+    params: dict[str, object] = {"ids": ids}
+    if q and spec.get("search"):
+        conditions.append(str(spec["search"]))
+        params["q"] = f"%{q}%"
+    if ids is not None:
+        conditions.append(f"{columns['id']} IN :ids")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {spec['order_by']}"
+    rows = con.execute(_with_id_filter(text(sql), ids), params).mappings().all()
 
-def list_expenses():
-    with engine.begin() as con:
-        rows = con.execute(
+    ids = [row["id"] for row in rows]
+    documents = attachments = None
+    if "documents" in includes and ids:
+        documents = con.execute(
             text(
                 """
-                SELECT e.id, e.vehicle_id, e.plate, e.category, e.amount, e.description,
-                       e.expense_date, e.created_at
-                FROM expenses e
-                ORDER BY e.expense_date DESC, e.created_at DESC
+                SELECT id, vehicle_id, doc_type, valid_from, valid_to, note, (valid_to - CURRENT_DATE) AS days_left
+                FROM documents
+                WHERE vehicle_id IN :ids
+                ORDER BY doc_type, valid_to
                 """
-            )
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": ids},
         ).mappings().all()
-        if not rows:
-            return []
-        expense_ids = [row["id"] for row in rows]
-        attachments_map: dict[int, list[Mapping[str, object]]] = {row["id"]: [] for row in rows}
-        att_stmt = (
-            text(
-                """
-                SELECT id, expense_id, file_name, mime_type, octet_length(content) as size_bytes, content
-                FROM expense_attachments
-                WHERE expense_id IN :ids
-                ORDER BY id
-                """
-            ).bindparams(bindparam("ids", expanding=True))
-            if expense_ids
-            else None
+    if includes & {"attachments", "attachment_content"}:
+        table, owner_column = spec["attachments"]
+        attachments = _attachments_by_owner(con, table, owner_column, ids, "attachment_content" in includes)
+    return entity, fields, includes, rows, documents, attachments
+
+def _build_sparse_list(raw) -> list[dict[str, object]]:
+    entity, fields, includes, rows, documents, attachments = raw
+    formatters = _SPARSE_LISTS[entity].get("formatters", {})
+    result = [
+        {name: formatters[name](row[name]) if name in formatters else row[name] for name in fields}
+        for row in rows
+    ]
+    if "documents" in includes:
+        docs_by_vehicle: dict[int, list[dict[str, object]]] = {}
+        for doc in documents or []:
+            docs_by_vehicle.setdefault(doc["vehicle_id"], []).append(_vehicle_document_entry(doc))
+        for item in result:
+            item["documents"] = docs_by_vehicle.get(item["id"], [])
+    if attachments is not None:
+        for item in result:
+            item["attachments"] = _serialize_attachments(attachments.get(item["id"], []))
+    return result
+
+_query_sparse_list = _read_query(_sparse_list_rows, _build_sparse_list)
+
+async def _list_response(
+    entity: str, query_func, fields: str | None, include: str | None, ids: str | None, **filters
+) -> FastJSONResponse:
+    sparse = _parse_sparse_params(entity, fields, include)
+    id_list = _parse_id_list(ids)
+    if sparse is None:
+        return FastJSONResponse(await _run_read(query_func, ids=id_list, **filters))
+    selected, includes = sparse
+    return FastJSONResponse(await _run_read(_query_sparse_list, entity, selected, includes, ids=id_list, **filters))
+
+# --- Araç zaman çizelgesi (tek UNION ALL, keyset sayfalama) ---
+# Belgeler vehicle_id ile, diğer kayıtlar istemcinin bugüne kadar filtrelediği plaka ile eşlenir.
+# Sıralama (event_date, kind, id) azalan; her dal kendi bileşik indeksinden en fazla limit+1 satır okur.
+_TIMELINE_SOURCES: dict[str, dict[str, str]] = {
+    "document": {
+        "table": "documents",
+        "owner_column": "vehicle_id",
+        "owner_param": "vehicle_id",
+        "date_column": "valid_to",
+        "data": "jsonb_build_object('doc_type', doc_type, 'valid_from', valid_from, 'valid_to', valid_to, 'note', note)",
+    },
+    "damage": {
+        "table": "damages",
+        "owner_column": "plate",
+        "owner_param": "plate",
+        "date_column": "occurred_at",
+        "data": "jsonb_build_object('title', title, 'description', description, 'severity', severity)",
+    },
+    "assignment": {
+        "table": "assignments",
+        "owner_column": "plate",
+        "owner_param": "plate",
+        "date_column": "assignment_date",
+        "data": (
+            "jsonb_build_object('person_name', person_name, 'person_title', person_title, "
+            "'vehicle_km', vehicle_km, 'expected_return_date', expected_return_date, 'description', description)"
+        ),
+    },
+    "expense": {
+        "table": "expenses",
+        "owner_column": "plate",
+        "owner_param": "plate",
+        "date_column": "expense_date",
+        "data": "jsonb_build_object('category', category, 'amount', amount, 'description', description)",
+    },
+    "fuel": {
+        "table": "fuel_entries",
+        "owner_column": "plate",
+        "owner_param": "plate",
+        "date_column": "refuel_date",
+        "data": (
+            "jsonb_build_object('liters', liters, 'amount', amount, 'odometer', odometer, 'note', note, "
+            "'unit_price', round(amount / NULLIF(liters, 0), 3))"
+        ),
+    },
+}
+
+def _encode_timeline_cursor(event_date: date, kind: str, row_id: int) -> str:
+    raw = f"{event_date.isoformat()}|{kind}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_timeline_cursor(cursor: str) -> tuple[date, str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        day, kind, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        value = (date.fromisoformat(day), kind, int(row_id))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    if kind not in _TIMELINE_SOURCES:
+        raise HTTPException(status_code=400, detail="Geçersiz sayfa imleci")
+    return value
+
+def _timeline_branch(kind: str, cursor: tuple[date, str, int] | None) -> str:
+    source = _TIMELINE_SOURCES[kind]
+    date_column = source["date_column"]
+    condition = f"{source['owner_column']} = :{source['owner_param']}"
+    if cursor is not None:
+        # kind her dalda sabit olduğu için üçlü karşılaştırma indekse uygun bir koşula indirgenir
+        cursor_kind = cursor[1]
+        if kind > cursor_kind:
+            condition += f" AND {date_column} < :cursor_date"
+        elif kind < cursor_kind:
+            condition += f" AND {date_column} <= :cursor_date"
+        else:
+            condition += f" AND ({date_column}, id) < (:cursor_date, :cursor_id)"
+    return f"""
+        (SELECT '{kind}'::text AS kind, id, {date_column} AS event_date, created_at, {source['data']} AS data
+         FROM {source['table']}
+         WHERE {condition}
+         ORDER BY {date_column} DESC, id DESC
+         LIMIT :fetch)
+    """
+
+def _query_vehicle_timeline(con, vehicle_id: int, limit: int, cursor: tuple[date, str, int] | None):
+    vehicle = con.execute(
+        text("SELECT id, plate FROM vehicles WHERE id = :id"), {"id": vehicle_id}
+    ).mappings().first()
+    if vehicle is None:
+        raise HTTPException(status_code=404, detail="Araç bulunamadı")
+    # UNION üzerindeki ORDER BY ifade (COLLATE) kabul etmediği için birleşim alt sorguya alınır
+    sql = "SELECT * FROM (" + " UNION ALL ".join(_timeline_branch(kind, cursor) for kind in _TIMELINE_SOURCES) + ") t"
+    sql += " ORDER BY event_date DESC, kind COLLATE \"C\" DESC, id DESC LIMIT :fetch"
+    params: dict[str, object] = {"vehicle_id": vehicle_id, "plate": vehicle["plate"], "fetch": limit + 1}
+    if cursor is not None:
+        params["cursor_date"], params["cursor_id"] = cursor[0], cursor[2]
+    rows = con.execute(text(sql), params).mappings().all()
+
+    page = rows[:limit]
+    items = []
+    for row in page:
+        data = row["data"]
+        if isinstance(data, str):
+            data = json.loads(data)
+        if row["kind"] == "document":
+            data = {**data, "doc_label": tr_doc_label(data["doc_type"]), "status": _document_status(row["event_date"])}
+        items.append(
+            {
+                "kind": row["kind"],
+                "id": row["id"],
+                "date": row["event_date"],
+                "created_at": row["created_at"],
+                **data,
+            }
         )
-        if att_stmt is not None:
-            for att in con.execute(att_stmt, {"ids": expense_ids}).mappings().all():
-                attachments_map.setdefault(att["expense_id"], []).append(att)
-        return [_serialize_expense_row(row, attachments_map.get(row["id"], [])) for row in rows]
+    next_cursor = None
+    if len(rows) > limit and page:
+        last = page[-1]
+        next_cursor = _encode_timeline_cursor(last["event_date"], last["kind"], last["id"])
+    return {"vehicle_id": vehicle_id, "plate": vehicle["plate"], "items": items, "next_cursor": next_cursor}
+
+# --- Dışa aktarma (CSV / NDJSON akışı) ---
+_EXPORT_SOURCES: dict[str, dict[str, object]] = {
+    "fuels": {
+        "sql": """
+            SELECT f.id, f.plate, f.liters, f.amount, f.refuel_date, f.odometer, f.note, f.created_at
+            FROM fuel_entries f
+        """,
+        "columns": ["id", "plate", "liters", "amount", "refuel_date", "odometer", "note", "created_at"],
+        "plate_column": "f.plate",
+        "date_column": "f.refuel_date",
+        "order_by": "f.refuel_date, f.id",
+    },
+    "expenses": {
+        "sql": """
+            SELECT e.id, e.plate, e.category, e.amount, e.description, e.expense_date, e.created_at
+            FROM expenses e
+        """,
+        "columns": ["id", "plate", "category", "amount", "description", "expense_date", "created_at"],
+        "plate_column": "e.plate",
+        "date_column": "e.expense_date",
+        "order_by": "e.expense_date, e.id",
+    },
+    "documents": {
+        "sql": """
+            SELECT d.id, v.plate, d.doc_type, d.valid_from, d.valid_to, d.note, d.created_at
+            FROM documents d
+            JOIN vehicles v ON v.id = d.vehicle_id
+        """,
+        "columns": ["id", "plate", "doc_type", "valid_from", "valid_to", "note", "created_at"],
+        "plate_column": "v.plate",
+        "date_column": "d.valid_to",
+        "order_by": "d.valid_to, d.id",
+    },
+    "damages": {
+        "sql": """
+            SELECT d.id, d.plate, d.title, d.description, d.severity, d.occurred_at, d.created_at
+            FROM damages d
+        """,
+        "columns": ["id", "plate", "title", "description", "severity", "occurred_at", "created_at"],
+        "plate_column": "d.plate",
+        "date_column": "d.occurred_at",
+        "order_by": "d.occurred_at, d.id",
+    },
+}
+_EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def _iter_export_rows(entity: str, date_from: date | None, date_to: date | None, plate: str | None):
+    """Satırları sunucu tarafı imleçle (yield_per) okur; tüm sonuç belleğe alınmaz."""
+    source = _EXPORT_SOURCES[entity]
+    conditions: list[str] = []
+    params: dict[str, object] = {}
+    if plate:
+        conditions.append(f"{source['plate_column']} = :plate")
+        params["plate"] = plate
+    if date_from is not None:
+        conditions.append(f"{source['date_column']} >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        conditions.append(f"{source['date_column']} <= :date_to")
+        params["date_to"] = date_to
+    sql = str(source["sql"])
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {source['order_by']}"
+
+    # Uzun akış boyunca tek bir tutarlı görüntü; sunucu tarafı imleç bu işlem içinde açılır
+    with _read_connection("REPEATABLE READ") as con:
+        result = con.execution_options(yield_per=EXPORT_FETCH_SIZE).execute(text(sql), params)
+        for row in result.mappings():
+            yield row
+
+def _iter_export_chunks(entity: str, fmt: str, rows, compress: bool):
+    columns = _EXPORT_SOURCES[entity]["columns"]
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(columns)
+
+    def _drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return compressor.compress(data) if compressor is not None else data
+
+    pending = 0
+    for row in rows:
+        values = [_export_value(row[col]) for col in columns]
+        if writer is not None:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+            buffer.write("\n")
+        pending += 1
+        if pending >= EXPORT_FETCH_SIZE:
+            pending = 0
+            chunk = _drain()
+            if chunk:
+                yield chunk
+    chunk = _drain()
+    if compressor is not None:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def export_entries(
+    entity: str,
+    fmt: str = "csv",
+    date_from: date | None = None,
+    date_to: date | None = None,
+    plate: str | None = None,
+    compress: bool = False,
+):
+    if entity not in _EXPORT_SOURCES:
+        raise HTTPException(status_code=400, detail="Dışa aktarma türü yalnızca fuels, expenses, documents veya damages olabilir")
+    fmt = (fmt or "csv").strip().lower()
+    if fmt not in _EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Biçim yalnızca csv veya ndjson olabilir")
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(status_code=400, detail="Başlangıç tarihi bitiş tarihinden sonra olamaz")
+    plate_norm = plate.strip().upper() if plate and plate.strip() else None
+
+    file_name = f"{entity}_{today_local().isoformat()}.{fmt}"
+    media_type = _EXPORT_FORMATS[fmt]
+    if compress:
+        file_name += ".gz"
+        media_type = "application/gzip"
+    rows = _iter_export_rows(entity, date_from, date_to, plate_norm)
+    return StreamingResponse(
+        _iter_export_chunks(entity, fmt, rows, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
 
-def _fetch_expense(con, expense_id: int):
+# --- Aylık harcama özet tabloları (artımlı bakım) ---
+# Masraf ve yakıt yazma yolları, kendi işlemleri içinde ilgili (plaka, ay[, kategori]) satırına
+# +/- fark uygular. Güncellemede eski satır çıkarılıp yenisi eklenir; FOR UPDATE aynı kaydı
+# eşzamanlı değiştiren işlemlerin farkı iki kez uygulamasını engeller. Sayısı sıfıra inen özet satırı,
+# upsert'in RETURNING ile döndürdüğü anahtar üzerinden silinir; tablonun geri kalanı taranmaz.
+def _rollup_expense(con, expense_id: int, sign: int):
     row = con.execute(
         text(
             """
-            SELECT e.id, e.vehicle_id, e.plate, e.category, e.amount, e.description,
-                   e.expense_date, e.created_at
-            FROM expenses e
-            WHERE e.id = :id
+            INSERT INTO expense_monthly_rollup (plate, month, category, total_amount, entry_count)
+            SELECT plate, date_trunc('month', expense_date)::date, category, :sign * amount, :sign
+            FROM expenses
+            WHERE id = :id
+            FOR UPDATE
+            ON CONFLICT (plate, month, category) DO UPDATE
+            SET total_amount = expense_monthly_rollup.total_amount + EXCLUDED.total_amount,
+                entry_count = expense_monthly_rollup.entry_count + EXCLUDED.entry_count
+            RETURNING plate, month, category, entry_count
             """
         ),
-        {"id": expense_id},
+        {"id": expense_id, "sign": sign},
     ).mappings().first()
-    if row is None:
-        raise HTTPException(status_code=404, detail="Masraf kaydı bulunamadı")
-    attachments = con.execute(
+    if row is not None and row["entry_count"] <= 0:
+        con.execute(
+            text(
+                """
+                DELETE FROM expense_monthly_rollup
+                WHERE plate = :plate AND month = :month AND category = :category AND entry_count <= 0
+                """
+            ),
+            dict(row),
+        )
+
+def _rollup_fuel_entry(con, fuel_id: int, sign: int):
+    row = con.execute(
         text(
             """
-            SELECT id, expense_id, file_name, mime_type, octet_length(content) as size_bytes, content
-            FROM expense_attachments
-            WHERE expense_id = :id
-            ORDER BY id
+            INSERT INTO fuel_monthly_rollup (plate, month, total_liters, total_amount, entry_count)
+            SELECT plate, date_trunc('month', refuel_date)::date, :sign * liters, :sign * amount, :sign
+            FROM fuel_entries
+            WHERE id = :id
+            FOR UPDATE
+            ON CONFLICT (plate, month) DO UPDATE
+            SET total_liters = fuel_monthly_rollup.total_liters + EXCLUDED.total_liters,
+                total_amount = fuel_monthly_rollup.total_amount + EXCLUDED.total_amount,
+                entry_count = fuel_monthly_rollup.entry_count + EXCLUDED.entry_count
+            RETURNING plate, month, entry_count
             """
         ),
-        {"id": expense_id},
-    ).mappings().all()
-    return _serialize_expense_row(row, attachments)
-
-def create_expense(body: ExpenseCreateRequest):
-    if body.admin_password != VEHICLE_ADMIN_PASSWORD:
-        raise HTTPException(status_code=403, detail="Şifre hatalı")
-    plate = body.plate.strip().upper()
-    attachments_payload = []
-    for att in body.attachments:
-        if not att.content_base64:
-            continue
-        content = _decode_base64_content(att.content_base64)
-        if not content:
-            continue
-        attachments_payload.append(
-            {
-                "file_name": os.path.basename(att.file_name) if att.file_name else "belge",
-                "mime_type": att.mime_type or "application/octet-stream",
-                "content": content,
-            }
+        {"id": fuel_id, "sign": sign},
+    ).mappings().first()
+    if row is not None and row["entry_count"] <= 0:
+        con.execute(
+            text("DELETE FROM fuel_monthly_rollup WHERE plate = :plate AND month = :month AND entry_count <= 0"),
+            dict(row),
         )
+
+def rebuild_spend_rollups() -> dict:
+    """Özet tabloları kaynak tablolardan sıfırdan üretir (yazmalar işlem boyunca bekletilir)."""
     with engine.begin() as con:
-        vehicle_id = _resolve_vehicle_id(con, plate)
-        row = con.execute(
+        con.execute(text("LOCK TABLE expenses, fuel_entries IN SHARE MODE"))
+        con.execute(text("DELETE FROM expense_monthly_rollup"))
+        con.execute(text("DELETE FROM fuel_monthly_rollup"))
+        expense_rows = con.execute(
             text(
                 """
-                INSERT INTO expenses (vehicle_id, plate, category, amount, description, expense_date)
-                VALUES (:vehicle_id, :plate, :category, :amount, :description, :expense_date)
-                RETURNING id, vehicle_id, plate, category, amount, description, expense_date, created_at
+                INSERT INTO expense_monthly_rollup (plate, month, category, total_amount, entry_count)
+                SELECT plate, date_trunc('month', expense_date)::date, category, SUM(amount), COUNT(*)
+                FROM expenses
+                GROUP BY 1, 2, 3
+                """
+            )
+        ).rowcount
+        fuel_rows = con.execute(
+            text(
+                """
+                INSERT INTO fuel_monthly_rollup (plate, month, total_liters, total_amount, entry_count)
+                SELECT plate, date_trunc('month', refuel_date)::date, SUM(liters), SUM(amount), COUNT(*)
+                FROM fuel_entries
+                GROUP BY 1, 2
+                """
+            )
+        ).rowcount
+    return {"expense_rows": expense_rows, "fuel_rows": fuel_rows}
+
+def _bootstrap_spend_rollups():
+    # Tablolar yeni oluşturulduysa mevcut kayıtlardan bir kez doldur
+    with engine.begin() as con:
+        needs_rebuild = con.execute(
+            text(
+                """
+                SELECT (NOT EXISTS (SELECT 1 FROM expense_monthly_rollup) AND EXISTS (SELECT 1 FROM expenses))
+                    OR (NOT EXISTS (SELECT 1 FROM fuel_monthly_rollup) AND EXISTS (SELECT 1 FROM fuel_entries))
+                """
+            )
+        ).scalar_one()
+    if needs_rebuild:
+        rebuild_spend_rollups()
+
+_bootstrap_spend_rollups()
+
+def spend_stats(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    plate: str | None = None,
+    category: str | None = None,
+    include_fuel: bool = True,
+) -> dict:
+    conditions: list[str] = []
+    params: dict[str, object] = {}
+    if date_from is not None:
+        conditions.append("month >= date_trunc('month', CAST(:date_from AS date))::date")
+        params["date_from"] = date_from
+    if date_to is not None:
+        conditions.append("month <= date_trunc('month', CAST(:date_to AS date))::date")
+        params["date_to"] = date_to
+    if plate and plate.strip():
+        conditions.append("plate = :plate")
+        params["plate"] = plate.strip().upper()
+    where_sql = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+    expense_where = where_sql
+    if category and category.strip():
+        expense_where += (" AND " if expense_where else " WHERE ") + "category = :category"
+        params["category"] = category.strip()
+
+    with _read_connection() as con:
+        expense_rows = con.execute(
+            text(
+                f"""
+                SELECT plate, month, category, total_amount, entry_count
+                FROM expense_monthly_rollup
+                {expense_where}
+                ORDER BY month, plate, category
                 """
             ),
-            {
-                "vehicle_id": vehicle_id,
-                "plate": plate,
-                "category": body.category.strip(),
-                "amount": body.amount,
-                "description": body.description.strip() if body.description else None,
-                "expense_date": body.expense_date,
-            },
-        ).mappings().first()
-        for att in attachments_payload:
-            con.execute(
+            params,
+        ).mappings().all()
+        fuel_rows = []
+        if include_fuel:
+            fuel_rows = con.execute(
                 text(
-                    """
-                    INSERT INTO expense_attachments (expense_id, file_name, mime_type, content)
-                    VALUES (:expense_id, :file_name, :mime_type, :content)
+                    f"""
+                    SELECT plate, month, total_liters, total_amount, entry_count
+                    FROM fuel_monthly_rollup
+                    {where_sql}
+                    ORDER BY month, plate
                     """
                 ),
-                {
-                    "expense_id": row["id"],
-                    "file_name": att["file_name"],
-                    "mime_type": att["mime_type"],
-                    "content": att["content"],
-                },
-            )
-        return _fetch_expense(con, row["id"])
+                params,
+            ).mappings().all()
+
+    by_plate: dict[str, dict[str, float]] = {}
+    by_category: dict[str, float] = {}
+    expenses_out = []
+    for r in expense_rows:
+        amount = float(r["total_amount"] or 0)
+        expenses_out.append(
+            {
+                "plate": r["plate"],
+                "month": r["month"].strftime("%Y-%m"),
+                "category": r["category"],
+                "amount": amount,
+                "entry_count": int(r["entry_count"]),
+            }
+        )
+        totals = by_plate.setdefault(r["plate"], {"expenses": 0.0, "fuel": 0.0})
+        totals["expenses"] += amount
+        by_category[r["category"]] = by_category.get(r["category"], 0.0) + amount
+    fuel_out = []
+    for r in fuel_rows:
+        amount = float(r["total_amount"] or 0)
+        fuel_out.append(
+            {
+                "plate": r["plate"],
+                "month": r["month"].strftime("%Y-%m"),
+                "liters": float(r["total_liters"] or 0),
+                "amount": amount,
+                "entry_count": int(r["entry_count"]),
+            }
+        )
+        totals = by_plate.setdefault(r["plate"], {"expenses": 0.0, "fuel": 0.0})
+        totals["fuel"] += amount
+
+    expenses_total = sum(t["expenses"] for t in by_plate.values())
+    fuel_total = sum(t["fuel"] for t in by_plate.values())
+    return {
+        "date_from": date_from.isoformat() if date_from else None,
+        "date_to": date_to.isoformat() if date_to else None,
+        "totals": {
+            "expenses": round(expenses_total, 2),
+            "fuel": round(fuel_total, 2),
+            "overall": round(expenses_total + fuel_total, 2),
+        },
+        "by_plate": [
+            {
+                "plate": p,
+                "expenses": round(t["expenses"], 2),
+                "fuel": round(t["fuel"], 2),
+                "total": round(t["expenses"] + t["fuel"], 2),
+            }
+            for p, t in sorted(by_plate.items())
+        ],
+        "by_category": {k: round(v, 2) for k, v in sorted(by_category.items())},
+        "expenses": expenses_out,
+        "fuel": fuel_out,
+    }
+
+def rebuild_spend_rollups_admin(admin_password: str):
+    if admin_password != VEHICLE_ADMIN_PASSWORD:
+        raise HTTPException(status_code=403, detail="Şifre hatalı")
+    return {"ok": True, **rebuild_spend_rollups()}
+
+# --- Toplam sahip olma maliyeti (TCO) ---
+# Hasar kayıtlarında tutar alanı yok; hasarlar adet olarak raporlanır, onarım bedelleri masraf olarak girilir.
+# Kilometre, yakıt analiziyle aynı segmentlerden gelir: dönem içinde kapanan segmentlerin mesafeleri toplanır,
+# boş veya geriye giden okumalar mesafeye katılmaz. Bir okumanın geçerliliği yalnızca önceki satırlara
+# bağlı olduğundan dönem sonundan sonraki dolumlar taranmaz.
+_TCO_SQL = "WITH" + _FUEL_SEGMENT_CTES.format(where="WHERE f.refuel_date <= :date_to") + """,
+    km AS (
+      SELECT plate, SUM(end_odometer - start_odometer) AS km_driven
+      FROM measured
+      WHERE end_date BETWEEN :date_from AND :date_to
+      GROUP BY plate
+    ), fuel AS (
+      SELECT f.plate,
+             SUM(f.amount) AS fuel_cost,
+             SUM(f.liters) AS fuel_liters,
+             MAX(km.km_driven) AS km_driven
+      FROM fuel_entries f
+      LEFT JOIN km ON km.plate = f.plate
+      WHERE f.refuel_date BETWEEN :date_from AND :date_to
+      GROUP BY f.plate
+    ), exp AS (
+      SELECT plate, SUM(amount) AS expense_cost, COUNT(*) AS expense_count
+      FROM expenses
+      WHERE expense_date BETWEEN :date_from AND :date_to
+      GROUP BY plate
+    ), dmg AS (
+      SELECT plate, COUNT(*) AS damage_count
+      FROM damages
+      WHERE occurred_at BETWEEN :date_from AND :date_to
+      GROUP BY plate
+    )
+    SELECT v.id, v.plate, v.make, v.model, v.year,
+           COALESCE(fuel.fuel_cost, 0) AS fuel_cost,
+           COALESCE(fuel.fuel_liters, 0) AS fuel_liters,
+           fuel.km_driven,
+           COALESCE(exp.expense_cost, 0) AS expense_cost,
+           COALESCE(exp.expense_count, 0) AS expense_count,
+           COALESCE(dmg.damage_count, 0) AS damage_count
+    FROM vehicles v
+    LEFT JOIN fuel ON fuel.plate = v.plate
+    LEFT JOIN exp ON exp.plate = v.plate
+    LEFT JOIN dmg ON dmg.plate = v.plate
+    ORDER BY v.plate
+"""
+# TTL diğer süreçlerdeki yazmalar için üst sınırdır; bu süreçteki yazmalar önbelleği hemen geçersiz kılar
+_TCO_CACHE: dict[tuple[date, date], tuple[float, dict]] = {}
+_TCO_CACHE_LOCK = threading.Lock()
+_tco_generation = 0
+_tco_invalidated_at = float("-inf")
+
+def _invalidate_tco():
+    global _tco_generation, _tco_invalidated_at
+    with _TCO_CACHE_LOCK:
+        _tco_generation += 1
+        _tco_invalidated_at = time.monotonic()
+        _TCO_CACHE.clear()
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    """Doğrusal ara değerli yüzdelik (q: 0-100); sorted_values sıralı olmalı."""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    value = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+    return round(value, 3)
+
+def _compute_tco(date_from: date, date_to: date) -> dict:
+    with _read_connection() as con:
+        rows = con.execute(text(_TCO_SQL), {"date_from": date_from, "date_to": date_to}).mappings().all()
+
+    vehicles = []
+    for r in rows:
+        fuel_cost = float(r["fuel_cost"] or 0)
+        expense_cost = float(r["expense_cost"] or 0)
+        total_cost = fuel_cost + expense_cost
+        km = int(r["km_driven"]) if r["km_driven"] else 0
+        vehicles.append(
+            {
+                "vehicle_id": r["id"],
+                "plate": r["plate"],
+                "make": r["make"],
+                "model": r["model"],
+                "year": r["year"],
+                "fuel_cost": round(fuel_cost, 2),
+                "fuel_liters": round(float(r["fuel_liters"] or 0), 2),
+                "expense_cost": round(expense_cost, 2),
+                "expense_count": int(r["expense_count"]),
+                "damage_count": int(r["damage_count"]),
+                "total_cost": round(total_cost, 2),
+                "km_driven": km or None,
+                "cost_per_km": _ratio(total_cost, km),
+                "rank": None,
+            }
+        )
+
+    # En pahalı (km başı) araç 1. sırada; km bilgisi olmayanlar sıralanmaz
+    ranked = sorted((v for v in vehicles if v["cost_per_km"] is not None), key=lambda v: v["cost_per_km"], reverse=True)
+    for idx, v in enumerate(ranked, start=1):
+        v["rank"] = idx
+
+    cost_per_km_values = sorted(v["cost_per_km"] for v in ranked)
+    total_cost_values = sorted(v["total_cost"] for v in vehicles)
+    return {
+        "date_from": date_from.isoformat(),
+        "date_to": date_to.isoformat(),
+        "generated_at": now_local().isoformat(),
+        "fleet": {
+            "vehicles": len(vehicles),
+            "ranked_vehicles": len(ranked),
+            "total_cost": round(sum(total_cost_values), 2),
+            "cost_per_km": {f"p{q}": _percentile(cost_per_km_values, q) for q in (25, 50, 75, 90)},
+            "total_cost_percentiles": {f"p{q}": _percentile(total_cost_values, q) for q in (25, 50, 75, 90)},
+        },
+        "vehicles": sorted(vehicles, key=lambda v: (v["rank"] is None, v["rank"] or 0, v["plate"])),
+    }
+
+def tco_report(date_from: date | None = None, date_to: date | None = None) -> dict:
+    date_to = date_to or today_local()
+    date_from = date_from or date(date_to.year, 1, 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="Başlangıç tarihi bitiş tarihinden sonra olamaz")
+    key = (date_from, date_to)
+    now = time.monotonic()
+    with _TCO_CACHE_LOCK:
+        cached = _TCO_CACHE.get(key)
+        generation = _tco_generation
+    if cached is not None and now - cached[0] < TCO_CACHE_TTL_SECONDS:
+        return cached[1]
+    # Yazmadan hemen sonraki dolum replika gecikmesine takılmasın diye birincilden okunur
+    token = _prefer_primary.set(True) if now - _tco_invalidated_at < READ_YOUR_WRITES_SECONDS else None
+    try:
+        report = _compute_tco(date_from, date_to)
+    finally:
+        if token is not None:
+            _prefer_primary.reset(token)
+    with _TCO_CACHE_LOCK:
+        # Süresi geçmiş dönemleri temizle ki önbellek sınırsız büyümesin
+        for stale in [k for k, (ts, _) in _TCO_CACHE.items() if now - ts >= TCO_CACHE_TTL_SECONDS]:
+            _TCO_CACHE.pop(stale, None)
+        # Hesap sürerken gelen bir yazma sonucu eskitmiştir
+        if generation == _tco_generation:
+            _TCO_CACHE[key] = (now, report)
+    return report
+
+def _notify_profile_summary(
+    con,
+    *,
+    today: date,
+    vehicle_id: int | None,
+    details: dict,
+    timings: dict[str, list[float]],
+    matched: int,
+) -> dict:
+    """notify_job profil modunun zaman dökümü ve tüm filo için tahmini çalışma süresi."""
+    counts = con.execute(
+        text(
+            """
+            select count(*) as scanned_fleet,
+                   count(*) filter (where :vid is null or d.vehicle_id = :vid) as scanned,
+                   count(*) filter (where (d.valid_to - :today) = any(:thresholds)) as matched_fleet
+            from documents d
+            where d.valid_to >= :today
+            """
+        ),
+        {"today": today, "thresholds": THRESHOLDS, "vid": vehicle_id},
+    ).mappings().one()
+
+    def _stage(values: list[float]) -> dict[str, object]:
+        ordered = sorted(v * 1000 for v in values)
+        return {
+            "count": len(ordered),
+            "total_ms": round(sum(ordered), 3),
+            "avg_ms": round(sum(ordered) / len(ordered), 3) if ordered else None,
+            "p95_ms": _percentile(ordered, 95),
+        }
+
+    providers = {}
+    for provider, samples in _MAIL_LATENCY_SAMPLES.items():
+        stage = _stage(list(samples))
+        stage.pop("total_ms")
+        providers[provider] = stage
+    primary = MAIL_PROVIDER.lower()
+    observed_send = providers.get(primary, {}).get("avg_ms")
+    send_ms = observed_send if observed_send is not None else NOTIFY_PROFILE_SEND_ESTIMATE_MS
+
+    render = _stage(timings["render"])
+    log_insert = _stage(timings["log_insert"])
+    query_ms = sum(timings["query"]) * 1000
+    would_send = len(details["sent"])
+    if vehicle_id is None:
+        sends_fleet = would_send
+        query_fleet_ms = query_ms
+    else:
+        # Araç bazlı çalıştırmadan filoya ölçekle: gönderilecek oranı ve taranan satır oranı
+        ratio = would_send / matched if matched else 1.0
+        sends_fleet = round(counts["matched_fleet"] * ratio)
+        query_fleet_ms = query_ms * (counts["scanned_fleet"] / counts["scanned"] if counts["scanned"] else 1.0)
+    per_mail_ms = (render["avg_ms"] or 0.0) + send_ms + (log_insert["avg_ms"] or 0.0)
+    return {
+        "query": {"total_ms": round(query_ms, 3)},
+        "rows": {
+            "scanned": counts["scanned"],
+            "matched": matched,
+            "would_send": would_send,
+            "skipped": len(details["skipped"]),
+            "scanned_fleet": counts["scanned_fleet"],
+            "matched_fleet": counts["matched_fleet"],
+        },
+        "render": render,
+        "log_insert": log_insert,
+        "send_latency_by_provider": providers,
+        "estimate": {
+            "provider": primary,
+            "send_ms_source": "observed" if observed_send is not None else "default",
+            "per_mail_ms": round(per_mail_ms, 3),
+            "mails": sends_fleet,
+            "full_run_seconds": round((query_fleet_ms + sends_fleet * per_mail_ms) / 1000, 3),
+        },
+    }
 
 def notify_job(
     vehicle_id: int | None = None,
@@ -2123,8 +4657,17 @@ def notify_job(
     force: bool = False,
     return_details: bool = False,
     dry_run: bool = False,
+    profile: bool = False,
 ):
+    """Eşik günlerine gelen belgeler için uyarı e-postası gönderir.
+
+    profile=True kuru çalıştırma gibi davranır (e-posta gönderilmez, log kalıcı yazılmaz) ancak
+    e-postaları gerçekten oluşturur ve log eklemelerini geri alınan bir savepoint içinde ölçer.
+    """
+    started = time.perf_counter()
     today = today_local()
+    dry_run = dry_run or profile
+    timings: dict[str, list[float]] = {"query": [], "render": [], "log_insert": []}
     with engine.begin() as con:
         sql = """
           with due as (
@@ -2143,9 +4686,12 @@ def notify_job(
           where due.days_left = any(:thresholds)
           order by valid_to
         """
+        query_started = time.perf_counter()
         rows = con.execute(text(sql), {"today": today, "thresholds": THRESHOLDS, "vid": vehicle_id}).mappings().all()
+        timings["query"].append(time.perf_counter() - query_started)
 
         details = {"sent": [], "skipped": [], "errors": []}
+        profile_savepoint = con.begin_nested() if profile else None
 
         for r in rows:
             recipient = (r["responsible_email"] or MAIL_TO or "").strip()
@@ -2170,12 +4716,13 @@ def notify_job(
                 details["skipped"].append(detail)
                 continue
 
-            if dry_run:
+            if dry_run and not profile:
                 detail["status"] = "would_send"
                 details["sent"].append(detail)
                 continue
 
             try:
+                render_started = time.perf_counter()
                 html = render_email(
                     plate=r["plate"],
                     doc_type=r["doc_type"],
@@ -2183,11 +4730,14 @@ def notify_job(
                     days_left=r["days_left"],
                     panel_url=f"{PANEL_URL}/vehicles?plate={r['plate']}",
                 )
-                send_mail(
-                    recipient,
-                    f"Araç Belge Uyarısı: {r['plate']} - {tr_doc_label(r['doc_type'])} ({r['days_left']}g)",
-                    html,
-                )
+                timings["render"].append(time.perf_counter() - render_started)
+                if not profile:
+                    send_mail(
+                        recipient,
+                        f"Araç Belge Uyarısı: {r['plate']} - {tr_doc_label(r['doc_type'])} ({r['days_left']}g)",
+                        html,
+                    )
+                insert_started = time.perf_counter()
                 con.execute(
                     text(
                         """
@@ -2201,14 +4751,34 @@ def notify_job(
                         "sent_at": datetime.now(timezone.utc),
                     },
                 )
-                detail["status"] = "sent"
+                timings["log_insert"].append(time.perf_counter() - insert_started)
+                detail["status"] = "would_send" if profile else "sent"
                 details["sent"].append(detail)
             except Exception as e:
                 print(f"notify_job mail error for {r['plate']} - {r['doc_type']}: {e}")
                 detail["status"] = "error"
                 detail["reason"] = str(e)
                 details["errors"].append(detail)
+                if profile:
+                    # Savepoint hata sonrası kullanılamaz; kalan satırlar için yenisini aç
+                    profile_savepoint.rollback()
+                    profile_savepoint = con.begin_nested()
                 continue
+        if profile:
+            profile_savepoint.rollback()
+            details["profile"] = _notify_profile_summary(
+                con,
+                today=today,
+                vehicle_id=vehicle_id,
+                details=details,
+                timings=timings,
+                matched=len(rows),
+            )
+            details["profile"]["total_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        if not dry_run:
+            NOTIFY_JOB_SECONDS.observe(time.perf_counter() - started)
+            for result_key in ("sent", "skipped", "errors"):
+                NOTIFY_JOB_RESULTS.labels(result_key).inc(len(details[result_key]))
         if return_details or dry_run:
             return details
         return None
@@ -2227,9 +4797,6 @@ def debug_send_test(to: str = Query(..., description="Alıcı e-posta")):
     except Exception as e:
         return {"ok": False, "provider": MAIL_PROVIDER, "error": str(e)}
 
-def documents_upcoming(days: int = Query(60, ge=1, le=365)):
-    return expiring(days)
-
 def debug_run_notifications(
     admin_password: str = Query(..., description="Bildirim çalıştırma şifresi"),
     vehicle_id: int | None = Query(None, description="Sadece bu araç için tetikle (opsiyonel)"),
@@ -2247,82 +4814,79 @@ def debug_dry_run_notifications(
     admin_password: str = Query(..., description="Bildirim raporu şifresi"),
     vehicle_id: int | None = Query(None, description="Sadece bu araç için raporla (opsiyonel)"),
     force: bool = Query(False, description="Daha önce gönderilenleri de listeler"),
+    profile: bool = Query(False, description="Zaman dökümü ve tam çalışma süresi tahmini ekle"),
 ):
     if admin_password != VEHICLE_ADMIN_PASSWORD:
         raise HTTPException(status_code=403, detail="Şifre hatalı")
     try:
-        result = notify_job(vehicle_id, force=force, return_details=True, dry_run=True)
-        return {"ok": True, "dry_run": True, "force": force, "result": result}
+        result = notify_job(vehicle_id, force=force, return_details=True, dry_run=True, profile=profile)
+        return {"ok": True, "dry_run": True, "force": force, "profile": profile, "result": result}
     except Exception as e:
         return {"ok": False, "dry_run": True, "error": str(e)}
 
 if _scheduler_enabled():
     scheduler = BackgroundScheduler(timezone=os.getenv("TZ", "Europe/Istanbul"))
     scheduler.add_job(notify_job, "cron", hour=8, minute=0)
+    scheduler.add_job(prune_sync_tombstones, "cron", hour=3, minute=30)
     scheduler.start()
 
 # --- Explicit SPA routes for non-/api paths ---
 @app.get("/")
-def spa_root():
-    index_path = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
+def spa_root(request: Request):
+    if "index.html" in _STATIC_INDEX:
+        return _static_response("index.html", request)
     return JSONResponse({"detail": "Uygulama derlenmiş statik dosyayı bulamadı."}, status_code=404)
 
 @app.get("/vehicles")
 @app.get("/vehicles/{rest:path}")
-def spa_vehicles(rest: str = ""):
+def spa_vehicles(request: Request, rest: str = ""):
     # Prefer the actual /vehicles static page if it exists (so we don't always load the dashboard)
-    vehicles_index = os.path.join(STATIC_DIR, "vehicles", "index.html")
-    if os.path.exists(vehicles_index):
-        return FileResponse(vehicles_index)
     # Fallback to root index.html (SPA client-side routing can still handle it)
-    root_index = os.path.join(STATIC_DIR, "index.html")
-    if os.path.exists(root_index):
-        return FileResponse(root_index)
+    for rel in ("vehicles/index.html", "vehicles.html", "index.html"):
+        if rel in _STATIC_INDEX:
+            return _static_response(rel, request)
     return JSONResponse({"detail": "Uygulama derlenmiş statik dosyayı bulamadı."}, status_code=404)
 
 # --- Stats / Dashboard helpers ---
-def _stats_summary() -> dict:
+def _query_stats_summary(con) -> dict:
     """
     Dashboard için belge ve araç sayıları (toplam, tür bazında, durum bazında).
     """
-    with engine.begin() as con:
-        # Toplam araç ve toplam belge
-        vehicles_total = con.execute(text("SELECT COUNT(*) FROM vehicles")).scalar_one()
-        documents_total = con.execute(text("SELECT COUNT(*) FROM documents")).scalar_one()
-
-        # Tür bazında sayılar
-        rows_type = con.execute(
-            text("""
-                SELECT doc_type, COUNT(*) AS c
-                FROM documents
-                GROUP BY doc_type
-            """)
-        ).mappings().all()
-        by_doc_type: dict[str, int] = {}
-        for r in rows_type:
-            by_doc_type[str(r["doc_type"])] = int(r["c"])
-
-        # Durum bazında sayılar (expired/critical/warning/ok)
-        rows_status = con.execute(
-            text("""
-                SELECT
-                  CASE
-                    WHEN valid_to < CURRENT_DATE THEN 'expired'
-                    WHEN valid_to >= CURRENT_DATE AND valid_to < CURRENT_DATE + INTERVAL '8 day' THEN 'critical'
-                    WHEN valid_to < CURRENT_DATE + INTERVAL '31 day' THEN 'warning'
-                    ELSE 'ok'
-                  END AS status,
-                  COUNT(*) AS c
-                FROM documents
-                GROUP BY 1
-            """)
-        ).mappings().all()
-        by_status = {"expired": 0, "critical": 0, "warning": 0, "ok": 0}
-        for r in rows_status:
-            st = str(r["status"])
-            by_status[st] = int(r["c"])
+    # Toplam araç ve toplam belge
+    vehicles_total = con.execute(text("SELECT COUNT(*) FROM vehicles")).scalar_one()
+    documents_total = con.execute(text("SELECT COUNT(*) FROM documents")).scalar_one()
+
+    # Tür bazında sayılar
+    rows_type = con.execute(
+        text("""
+            SELECT doc_type, COUNT(*) AS c
+            FROM documents
+            GROUP BY doc_type
+        """)
+    ).mappings().all()
+    by_doc_type: dict[str, int] = {}
+    for r in rows_type:
+        by_doc_type[str(r["doc_type"])] = int(r["c"])
+
+    # Durum bazında sayılar (expired/critical/warning/ok)
+    rows_status = con.execute(
+        text("""
+            SELECT
+              CASE
+                WHEN valid_to < CURRENT_DATE THEN 'expired'
+                WHEN valid_to >= CURRENT_DATE AND valid_to < CURRENT_DATE + INTERVAL '8 day' THEN 'critical'
+                WHEN valid_to < CURRENT_DATE + INTERVAL '31 day' THEN 'warning'
+                ELSE 'ok'
+              END AS status,
+              COUNT(*) AS c
+            FROM documents
+            GROUP BY 1
+        """)
+    ).mappings().all()
+    by_status = {"expired": 0, "critical": 0, "warning": 0, "ok": 0}
+    for r in rows_status:
+        st = str(r["status"])
+        by_status[st] = int(r["c"])
 
     # Türkçe etiketleri de döndürelim (frontend'de kolay kullanım için)
     return {
@@ -2338,38 +4902,40 @@ def _stats_summary() -> dict:
 
 # Belge kapsama/eksik listesi
 
-def _coverage_by_doc_type(doc_type: str, current_only: bool = False) -> dict:
+def _coverage_rows(con, doc_type: str, current_only: bool = False):
     dt_norm = normalize_doc_type_input(doc_type)
     if not dt_norm or dt_norm not in ALLOWED_DOC_TYPES:
         raise HTTPException(status_code=400, detail="Geçersiz doc_type")
 
-    with engine.begin() as con:
-        # İlgili belge türü için her araçtaki en güncel kaydı çek
-        latest_docs = con.execute(
-            text(
-                """
-                SELECT DISTINCT ON (vehicle_id)
-                       vehicle_id,
-                       doc_type,
-                       valid_from,
-                       valid_to,
-                       note
-                FROM documents
-                WHERE doc_type = :dt
-                ORDER BY vehicle_id, valid_to DESC
-                """
-            ),
-            {"dt": dt_norm},
-        ).mappings().all()
+    # İlgili belge türü için her araçtaki en güncel kaydı çek
+    latest_docs = con.execute(
+        text(
+            """
+            SELECT DISTINCT ON (vehicle_id)
+                   vehicle_id,
+                   doc_type,
+                   valid_from,
+                   valid_to,
+                   note
+            FROM documents
+            WHERE doc_type = :dt
+            ORDER BY vehicle_id, valid_to DESC
+            """
+        ),
+        {"dt": dt_norm},
+    ).mappings().all()
 
-        # vehicle_id -> latest doc map
-        latest_by_vehicle: dict[int, dict] = {int(r["vehicle_id"]): dict(r) for r in latest_docs}
+    # vehicle_id -> latest doc map
+    latest_by_vehicle: dict[int, dict] = {int(r["vehicle_id"]): dict(r) for r in latest_docs}
 
-        # Tüm araçları al
-        vehicles = con.execute(
-            text("SELECT id, plate, make, model, year FROM vehicles ORDER BY plate")
-        ).mappings().all()
+    # Tüm araçları al
+    vehicles = con.execute(
+        text("SELECT id, plate, make, model, year FROM vehicles ORDER BY plate")
+    ).mappings().all()
+    return dt_norm, current_only, latest_by_vehicle, vehicles
 
+def _build_coverage(raw) -> dict:
+    dt_norm, current_only, latest_by_vehicle, vehicles = raw
     with_list = []
     without_list = []
     today = today_local()
@@ -2432,23 +4998,243 @@ def _coverage_by_doc_type(doc_type: str, current_only: bool = False) -> dict:
         "without": without_list,
     }
 
+_query_coverage = _read_query(_coverage_rows, _build_coverage)
+
+# --- Dashboard ilk yükleme ---
+# İlk boyama için gereken tüm veri tek çağrıda, paralel bağlantılarda ama tek snapshot üzerinden toplanır.
+# Önbellek ve ETag, verinin okunduğu snapshot'ın xmin değerine bağlıdır: o snapshot'ta görünmeyen her
+# yazma xid >= xmin taşır, dolayısıyla geç commit edilen bir işlem de sonraki kontrolde fark edilir.
+DASHBOARD_PARALLEL_QUERIES = int(os.getenv("DASHBOARD_PARALLEL_QUERIES", "3"))
+# Aynı anda en fazla bu kadar dashboard kurulur; bağlantı ihtiyacı bu değer × DASHBOARD_PARALLEL_QUERIES
+# olup async havuz boyutunun (ASYNC_DB_POOL_SIZE + ASYNC_DB_MAX_OVERFLOW) altında kalmalıdır
+DASHBOARD_MAX_CONCURRENT_BUILDS = int(os.getenv("DASHBOARD_MAX_CONCURRENT_BUILDS", "2"))
+_DASHBOARD_BUILDS = asyncio.Semaphore(max(1, DASHBOARD_MAX_CONCURRENT_BUILDS))
+# days -> (gün, snapshot xmin, etag, gövde)
+_DASHBOARD_CACHE: dict[int, tuple[date, int, str, bytes]] = {}
+
+def _coverage_overview_rows(con):
+    return con.execute(
+        text(
+            """
+            SELECT t.doc_type, v.plate, max(d.valid_to) AS latest_valid_to
+            FROM vehicles v
+            CROSS JOIN unnest(CAST(:doc_types AS text[])) AS t(doc_type)
+            LEFT JOIN documents d ON d.vehicle_id = v.id AND d.doc_type = t.doc_type
+            GROUP BY t.doc_type, v.plate
+            ORDER BY t.doc_type, v.plate
+            """
+        ),
+        {"doc_types": sorted(ALLOWED_DOC_TYPES)},
+    ).mappings().all()
+
+def _build_coverage_overview(rows) -> dict[str, dict[str, object]]:
+    """Her belge türü için geçerli / süresi dolmuş / hiç olmayan araç sayıları ve eksik plakalar."""
+    today = today_local()
+    overview = {
+        doc_type: {"label_tr": tr_doc_label(doc_type), "current": 0, "expired": 0, "without": 0, "missing_plates": []}
+        for doc_type in sorted(ALLOWED_DOC_TYPES)
+    }
+    for row in rows:
+        entry = overview[row["doc_type"]]
+        latest = row["latest_valid_to"]
+        if latest is None:
+            entry["without"] += 1
+        elif latest < today:
+            entry["expired"] += 1
+        else:
+            entry["current"] += 1
+            continue
+        entry["missing_plates"].append(row["plate"])
+    return overview
+
+_query_coverage_overview = _read_query(_coverage_overview_rows, _build_coverage_overview)
+
+def _query_dashboard_changed_since(con, xmin: int) -> bool:
+    """Dashboard'un okuduğu tablolarda xmin'den sonra commit edilmiş yazma veya silme var mı (updated_xid indeksleri)."""
+    return con.execute(
+        text(
+            """
+            SELECT EXISTS (SELECT 1 FROM vehicles WHERE updated_xid >= CAST(CAST(:xmin AS text) AS xid8))
+                OR EXISTS (SELECT 1 FROM documents WHERE updated_xid >= CAST(CAST(:xmin AS text) AS xid8))
+                OR EXISTS (SELECT 1 FROM damages WHERE updated_xid >= CAST(CAST(:xmin AS text) AS xid8))
+                OR EXISTS (SELECT 1 FROM expenses WHERE updated_xid >= CAST(CAST(:xmin AS text) AS xid8))
+                OR EXISTS (SELECT 1 FROM sync_tombstones WHERE deleted_xid >= CAST(CAST(:xmin AS text) AS xid8))
+            """
+        ),
+        {"xmin": str(xmin)},
+    ).scalar_one()
+
+async def _cached_dashboard(days: int, today: date) -> tuple[date, int, str, bytes] | None:
+    cached = _DASHBOARD_CACHE.get(days)
+    if cached is None or cached[0] != today:
+        return None
+    if await _run_read(_query_dashboard_changed_since, cached[1]):
+        return None
+    return cached
+
+async def dashboard(request: Request, days: int) -> Response:
+    today = today_local()
+    entry = await _cached_dashboard(days, today)
+    if entry is None:
+        async with _DASHBOARD_BUILDS:
+            # Beklerken başka bir istek yeniden kurmuş olabilir
+            entry = await _cached_dashboard(days, today)
+            if entry is None:
+                entry = await _build_dashboard(days, today)
+                _DASHBOARD_CACHE[days] = entry
+    _, _, etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+async def _build_dashboard(days: int, today: date) -> tuple[date, int, str, bytes]:
+    data, xmin = await _run_read_snapshot(
+        {
+            "vehicles": (_query_vehicle_list, (None,)),
+            "summary": (_query_stats_summary, ()),
+            "upcoming": (_query_expiring, (days,)),
+            "coverage": (_query_coverage_overview, ()),
+            "damages": (_query_damages, (False,)),
+            "expenses": (_query_expenses, (False,)),
+        },
+        DASHBOARD_PARALLEL_QUERIES,
+    )
+    data["generated_at"] = now_local()
+    body = await _run_in_worker(lambda: FastJSONResponse(data).body)
+    digest = hashlib.sha1(f"{today.isoformat()}|{days}|{xmin}".encode()).hexdigest()[:20]
+    return today, xmin, f'W/"{digest}"', body
+
+# --- Belge bitiş takvimi (ısı haritası) ---
+# Gün/hafta × belge türü × durum sayıları tek GROUP BY ile üretilir. Sonuç yerel gece yarısına kadar
+# önbellekte kalır (durumlar güne bağlı); belge yazan işlemler nesli artırarak önbelleği geçersiz kılar.
+# Nesil sorgu sürerken değişirse sonuç saklanmaz; geçersiz kılmadan sonraki dolum replikadan değil
+# birincilden okunur, böylece geride kalan bir replika eski veriyi yeniden önbelleğe koyamaz.
+_EXPIRY_CALENDAR_CACHE: dict[tuple[int, int, str], tuple[date, int, bytes]] = {}
+_EXPIRY_CALENDAR_BUCKETS = ("day", "week")
+_expiry_calendar_generation = 0
+_expiry_calendar_invalidated_at = float("-inf")
+
+def _invalidate_expiry_calendar():
+    global _expiry_calendar_generation, _expiry_calendar_invalidated_at
+    _expiry_calendar_generation += 1
+    _expiry_calendar_invalidated_at = time.monotonic()
+
+def _query_expiry_calendar(con, days: int, past_days: int, bucket: str) -> dict[str, object]:
+    today = today_local()
+    start = today - timedelta(days=past_days)
+    end = today + timedelta(days=days)
+    rows = con.execute(
+        text(
+            """
+            SELECT valid_to, doc_type, count(*) AS doc_count
+            FROM documents
+            WHERE valid_to BETWEEN :start AND :end
+            GROUP BY valid_to, doc_type
+            ORDER BY valid_to
+            """
+        ),
+        {"start": start, "end": end},
+    ).mappings().all()
+
+    buckets: dict[date, dict[str, object]] = {}
+    totals = {"total": 0, "by_type": {}, "by_status": {}}
+    for row in rows:
+        valid_to = row["valid_to"]
+        key = valid_to - timedelta(days=valid_to.weekday()) if bucket == "week" else valid_to
+        count = int(row["doc_count"])
+        status = _document_status(valid_to)
+        entry = buckets.setdefault(key, {"date": key, "total": 0, "by_type": {}, "by_status": {}})
+        for target in (entry, totals):
+            target["total"] += count
+            target["by_type"][row["doc_type"]] = target["by_type"].get(row["doc_type"], 0) + count
+            target["by_status"][status] = target["by_status"].get(status, 0) + count
+    return {
+        "from": start,
+        "to": end,
+        "bucket": bucket,
+        "buckets": list(buckets.values()),
+        "totals": totals,
+        "labels": {doc_type: tr_doc_label(doc_type) for doc_type in totals["by_type"]},
+    }
+
+async def expiry_calendar(days: int, past_days: int, bucket: str) -> Response:
+    if bucket not in _EXPIRY_CALENDAR_BUCKETS:
+        raise HTTPException(status_code=400, detail="bucket yalnızca day veya week olabilir")
+    today = today_local()
+    key = (days, past_days, bucket)
+    generation = _expiry_calendar_generation
+    cached = _EXPIRY_CALENDAR_CACHE.get(key)
+    if cached is not None and cached[0] == today and cached[1] == generation:
+        return Response(cached[2], media_type="application/json")
+
+    from_primary = (cached is not None and cached[1] != generation) or (
+        time.monotonic() - _expiry_calendar_invalidated_at < READ_YOUR_WRITES_SECONDS
+    )
+    token = _prefer_primary.set(True) if from_primary else None
+    try:
+        data = await _run_read(_query_expiry_calendar, days, past_days, bucket)
+    finally:
+        if token is not None:
+            _prefer_primary.reset(token)
+    data["generated_at"] = now_local()
+    body = FastJSONResponse(data).body
+    if generation == _expiry_calendar_generation:
+        _EXPIRY_CALENDAR_CACHE[key] = (today, generation, body)
+    return Response(body, media_type="application/json")
 
 @app.get("/api/stats/coverage")
-def stats_coverage_api(doc_type: str = Query(..., description="Belge türü (örn. muayene, trafik_sigortası, k_document, kasko, yağ, servis)"),
-                       current_only: bool = Query(False, description="Sadece geçerli (bugünden sonrası) belgeleri dikkate al")):
+async def stats_coverage_api(doc_type: str = Query(..., description="Belge türü (örn. muayene, trafik_sigortası, k_document, kasko, yağ, servis)"),
+                             current_only: bool = Query(False, description="Sadece geçerli (bugünden sonrası) belgeleri dikkate al")):
     """Belirli bir belge türü için hangi araçlarda belge VAR/YOK listesini döner."""
-    return _coverage_by_doc_type(doc_type, current_only)
+    return await _run_read(_query_coverage, doc_type, current_only)
 
 # --- Stats API ---
+@app.get("/api/dashboard")
+async def dashboard_api(request: Request, days: int = Query(60, ge=1, le=365, description="Yaklaşan belgeler için gün")):
+    """Dashboard'un ilk boyaması için araçlar, özet, yaklaşan belgeler, kapsama, hasar ve masraflar tek çağrıda."""
+    return await dashboard(request, days)
+
 @app.get("/api/stats/summary")
-def stats_summary_api():
+async def stats_summary_api():
     """
     Dashboard özet kutuları için:
     - toplam araç / toplam belge
     - belge türüne göre sayılar
     - durum (expired/critical/warning/ok) dağılımı
     """
-    return _stats_summary()
+    return await _run_read(_query_stats_summary)
+
+@app.get("/api/stats/expiry-calendar")
+async def stats_expiry_calendar_api(
+    days: int = Query(90, ge=1, le=730, description="Bugünden itibaren kaç gün ileriye bakılacağı"),
+    past_days: int = Query(0, ge=0, le=365, description="Süresi dolmuş belgeler için geriye bakılacak gün"),
+    bucket: str = Query("day", description="day veya week (hafta Pazartesi başlar)"),
+):
+    return await expiry_calendar(days, past_days, bucket)
+
+@app.get("/api/stats/spend")
+def stats_spend_api(
+    date_from: date | None = Query(None, description="Bu aydan itibaren (dahil)"),
+    date_to: date | None = Query(None, description="Bu aya kadar (dahil)"),
+    plate: str | None = Query(None, description="Sadece bu plaka"),
+    category: str | None = Query(None, description="Sadece bu masraf kategorisi"),
+    include_fuel: bool = Query(True, description="Yakıt harcamalarını da dahil et"),
+):
+    """Aylık özet tablolarından araç / kategori bazında harcama raporu."""
+    return spend_stats(date_from, date_to, plate, category, include_fuel)
+
+@app.get("/api/stats/tco")
+def stats_tco_api(
+    date_from: date | None = Query(None, description="Dönem başlangıcı (varsayılan: yıl başı)"),
+    date_to: date | None = Query(None, description="Dönem sonu (varsayılan: bugün)"),
+):
+    """Araç bazında yakıt + masraf toplamı, km başı maliyet sıralaması ve filo yüzdelikleri."""
+    return tco_report(date_from, date_to)
+
+@app.post("/api/stats/spend/rebuild")
+def stats_spend_rebuild_api(admin_password: str = Query(..., description="Yönetici şifresi")):
+    return rebuild_spend_rollups_admin(admin_password)
 
 # --- API aliases under /api (backward compatible) ---
 @app.get("/api/healthz")
@@ -2456,21 +5242,39 @@ def health_api():
     return _health_payload()
 
 @app.get("/api/debug/vehicles_probe")
-def debug_vehicles_probe(q: str | None = None):
+async def debug_vehicles_probe(q: str | None = None):
     try:
-        return list_vehicles(q)
+        return await _run_read(_query_vehicle_list, q)
     except Exception as e:
         import traceback
         return {"ok": False, "error": str(e), "trace": traceback.format_exc()}
 
-@app.get("/api/vehicles")
-def list_vehicles_api(q: str | None = None):
-    return list_vehicles(q)
+@app.get("/api/vehicles", response_class=FastJSONResponse)
+async def list_vehicles_api(
+    q: str | None = None,
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (örn. plate,make,model,next_valid_to)"),
+    include: str | None = Query(None, description="documents"),
+    ids: str | None = Query(None, description="Virgülle ayrılmış kimlikler (örn. 1,2,3); yalnızca bu kayıtlar döner"),
+):
+    return await _list_response("vehicles", _query_vehicle_list, fields, include, ids, q=q)
+
+@app.get("/api/vehicles/{vehicle_id}/timeline", response_class=FastJSONResponse)
+async def vehicle_timeline_api(
+    vehicle_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = Query(None, description="Önceki sayfanın next_cursor değeri"),
+):
+    cursor_key = _decode_timeline_cursor(cursor) if cursor else None
+    return FastJSONResponse(await _run_read(_query_vehicle_timeline, vehicle_id, limit, cursor_key))
 
 @app.post("/api/vehicles", status_code=201)
 def create_vehicle_api(v: VehicleCreateRequest):
     return create_vehicle(v)
 
+@app.get("/api/vehicles/{vehicle_id}", response_class=FastJSONResponse)
+async def get_vehicle_api(vehicle_id: int):
+    return FastJSONResponse(await _run_read(_fetch_vehicle, vehicle_id))
+
 # Yeni: Araç güncelle
 @app.put("/api/vehicles/{vehicle_id}")
 def update_vehicle_api(vehicle_id: int, body: VehicleUpdateRequest):
@@ -2498,21 +5302,34 @@ def delete_document_api(document_id: int, admin_password: str = Query(..., descr
     return delete_document(document_id, admin_password)
 
 @app.get("/api/expiring")
-def expiring_api(days: int = Query(30, ge=1, le=365)):
-    return expiring(days)
+async def expiring_api(days: int = Query(30, ge=1, le=365)):
+    return await _run_read(_query_expiring, days)
 
 @app.get("/api/documents/upcoming")
-def documents_upcoming_api(days: int = Query(60, ge=1, le=365)):
-    return documents_upcoming(days)
-
-@app.get("/api/damages")
-def damages_api():
-    return list_damages()
+async def documents_upcoming_api(days: int = Query(60, ge=1, le=365)):
+    return await _run_read(_query_expiring, days)
+
+# /api/documents/upcoming ile çakışmaması için ondan sonra tanımlanır
+@app.get("/api/documents/{document_id}", response_class=FastJSONResponse)
+async def get_document_api(document_id: int):
+    return FastJSONResponse(await _run_read(_fetch_document, document_id))
+
+@app.get("/api/damages", response_class=FastJSONResponse)
+async def damages_api(
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (id her zaman döner)"),
+    include: str | None = Query(None, description="attachments (yalnızca bilgi) veya attachment_content (içerikle)"),
+    ids: str | None = Query(None, description="Virgülle ayrılmış kimlikler (örn. 1,2,3); yalnızca bu kayıtlar döner"),
+):
+    return await _list_response("damages", _query_damages, fields, include, ids)
 
 @app.post("/api/damages", status_code=201)
 def create_damage_api(body: DamageCreateRequest):
     return create_damage(body)
 
+@app.get("/api/damages/{damage_id}", response_class=FastJSONResponse)
+async def get_damage_api(damage_id: int):
+    return FastJSONResponse(await _run_read(_fetch_damage, damage_id))
+
 @app.put("/api/damages/{damage_id}")
 def update_damage_api(damage_id: int, body: DamageUpdateRequest):
     return update_damage(damage_id, body)
@@ -2521,14 +5338,22 @@ def update_damage_api(damage_id: int, body: DamageUpdateRequest):
 def delete_damage_api(damage_id: int, admin_password: str = Query(..., description="Hasar silme şifresi")):
     return delete_damage(damage_id, admin_password)
 
-@app.get("/api/assignments")
-def assignments_api():
-    return list_assignments()
+@app.get("/api/assignments", response_class=FastJSONResponse)
+async def assignments_api(
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (id her zaman döner)"),
+    include: str | None = Query(None, description="attachments (yalnızca bilgi) veya attachment_content (içerikle)"),
+    ids: str | None = Query(None, description="Virgülle ayrılmış kimlikler (örn. 1,2,3); yalnızca bu kayıtlar döner"),
+):
+    return await _list_response("assignments", _query_assignments, fields, include, ids)
 
 @app.post("/api/assignments", status_code=201)
 def create_assignment_api(body: AssignmentCreateRequest):
     return create_assignment(body)
 
+@app.get("/api/assignments/{assignment_id}", response_class=FastJSONResponse)
+async def get_assignment_api(assignment_id: int):
+    return FastJSONResponse(await _run_read(_fetch_assignment, assignment_id))
+
 @app.put("/api/assignments/{assignment_id}")
 def update_assignment_api(assignment_id: int, body: AssignmentUpdateRequest):
     return update_assignment(assignment_id, body)
@@ -2537,14 +5362,22 @@ def update_assignment_api(assignment_id: int, body: AssignmentUpdateRequest):
 def delete_assignment_api(assignment_id: int, admin_password: str = Query(..., description="Zimmet silme şifresi")):
     return delete_assignment(assignment_id, admin_password)
 
-@app.get("/api/expenses")
-def expenses_api():
-    return list_expenses()
+@app.get("/api/expenses", response_class=FastJSONResponse)
+async def expenses_api(
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (id her zaman döner)"),
+    include: str | None = Query(None, description="attachments (yalnızca bilgi) veya attachment_content (içerikle)"),
+    ids: str | None = Query(None, description="Virgülle ayrılmış kimlikler (örn. 1,2,3); yalnızca bu kayıtlar döner"),
+):
+    return await _list_response("expenses", _query_expenses, fields, include, ids)
 
 @app.post("/api/expenses", status_code=201)
 def create_expense_api(body: ExpenseCreateRequest):
     return create_expense(body)
 
+@app.get("/api/expenses/{expense_id}", response_class=FastJSONResponse)
+async def get_expense_api(expense_id: int):
+    return FastJSONResponse(await _run_read(_fetch_expense, expense_id))
+
 @app.put("/api/expenses/{expense_id}")
 def update_expense_api(expense_id: int, body: ExpenseUpdateRequest):
     return update_expense(expense_id, body)
@@ -2553,14 +5386,36 @@ def update_expense_api(expense_id: int, body: ExpenseUpdateRequest):
 def delete_expense_api(expense_id: int, admin_password: str = Query(..., description="Masraf silme şifresi")):
     return delete_expense(expense_id, admin_password)
 
-@app.get("/api/fuels")
-def fuel_entries_api():
-    return list_fuel_entries()
+@app.get("/api/fuels", response_class=FastJSONResponse)
+async def fuel_entries_api(
+    fields: str | None = Query(None, description="Virgülle ayrılmış alanlar (örn. plate,liters,amount,unit_price)"),
+    ids: str | None = Query(None, description="Virgülle ayrılmış kimlikler (örn. 1,2,3); yalnızca bu kayıtlar döner"),
+):
+    return await _list_response("fuels", _query_fuel_entries, fields, None, ids)
+
+@app.get("/api/fuels/analytics")
+def fuel_analytics_api():
+    """Araç bazında ortalama tüketim (L/100 km) ve km başı maliyet özeti."""
+    return fuel_analytics_summary()
+
+@app.get("/api/fuels/analytics/{plate}")
+def fuel_analytics_plate_api(plate: str):
+    """Tek araç için dolumlar arası segmentler ve aylık tüketim eğilimi."""
+    return fuel_analytics_for_plate(plate)
 
 @app.post("/api/fuels", status_code=201)
 def create_fuel_entry_api(body: FuelCreateRequest):
     return create_fuel_entry(body)
 
+@app.post("/api/fuels/batch")
+def fuel_batch_api(body: FuelBatchRequest):
+    """Yakıt kartı ekstresini (JSON dizi veya CSV) tek seferde içe aktarır."""
+    return ingest_fuel_batch(body)
+
+@app.get("/api/fuels/{fuel_id}", response_class=FastJSONResponse)
+async def get_fuel_entry_api(fuel_id: int):
+    return FastJSONResponse(await _run_read(_fetch_fuel_entry, fuel_id))
+
 @app.put("/api/fuels/{fuel_id}")
 def update_fuel_entry_api(fuel_id: int, body: FuelUpdateRequest):
     return update_fuel_entry(fuel_id, body)
@@ -2569,6 +5424,32 @@ def update_fuel_entry_api(fuel_id: int, body: FuelUpdateRequest):
 def delete_fuel_entry_api(fuel_id: int, admin_password: str = Query(..., description="Yakıt kaydı silme şifresi")):
     return delete_fuel_entry(fuel_id, admin_password)
 
+@app.get("/api/export/{entity}")
+def export_api(
+    entity: str,
+    format: str = Query("csv", description="csv veya ndjson"),
+    date_from: date | None = Query(None, description="Bu tarihten itibaren (dahil)"),
+    date_to: date | None = Query(None, description="Bu tarihe kadar (dahil)"),
+    plate: str | None = Query(None, description="Sadece bu plaka"),
+    gzip: bool = Query(False, description="Çıktıyı gzip ile sıkıştır"),
+):
+    """fuels, expenses, documents ve damages kayıtlarını sabit bellekle akış halinde dışa aktarır."""
+    return export_entries(entity, format, date_from, date_to, plate, gzip)
+
+@app.get("/api/events", responses={200: {"content": {"text/event-stream": {}}}})
+async def change_events_api(
+    request: Request,
+    tables: str | None = Query(None, description="Virgülle ayrılmış tablo filtresi (örn. vehicles,documents)"),
+):
+    """Varlık tablolarındaki ekleme/güncelleme/silmeleri Server-Sent Events olarak yayınlar."""
+    return change_events(request, tables)
+
+@app.get("/api/sync", response_class=FastJSONResponse)
+async def sync_api(since: str | None = Query(None, description="Önceki yanıttaki token; boşsa tam senkronizasyon")):
+    """Token'dan sonra değişen tüm varlıkları ve silinen kimlikleri döner."""
+    since_token = _decode_sync_token(since) if since else None
+    return FastJSONResponse(await _run_read(_query_sync, since_token))
+
 @app.post("/api/debug/run_notifications")
 def debug_run_notifications_api(
     admin_password: str = Query(..., description="Bildirim çalıştırma şifresi"),
@@ -2582,13 +5463,42 @@ def debug_dry_run_notifications_api(
     admin_password: str = Query(..., description="Bildirim raporu şifresi"),
     vehicle_id: int | None = Query(None, description="Sadece bu araç için raporla (opsiyonel)"),
     force: bool = Query(False, description="Daha önce gönderilenleri de listeler"),
+    profile: bool = Query(False, description="Zaman dökümü ve tam çalışma süresi tahmini ekle"),
 ):
-    return debug_dry_run_notifications(admin_password, vehicle_id, force)
+    return debug_dry_run_notifications(admin_password, vehicle_id, force, profile)
+
+@app.get("/api/debug/slow_queries")
+def debug_slow_queries_api(
+    admin_password: str = Query(..., description="Yönetici şifresi"),
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query("total", description="total, max, calls veya slow"),
+):
+    """Açılıştan beri toplam süreye göre en pahalı SQL ifadeleri (SLOW_QUERY_LOG=1 gerekir)."""
+    return slow_query_report(admin_password, limit, order_by)
+
+@app.get("/api/debug/profiles")
+def debug_profiles_api(admin_password: str = Query(..., description="Yönetici şifresi")):
+    """Son profillenen isteklerin listesi (en yeni önce)."""
+    return list_profiles(admin_password)
+
+@app.get("/api/debug/profiles/{profile_id}")
+def debug_profile_api(profile_id: str, admin_password: str = Query(..., description="Yönetici şifresi")):
+    """speedscope.app ile açılabilen profil dosyası."""
+    return get_profile(profile_id, admin_password)
 
 @app.get("/api/debug/send_test")
 def debug_send_test_api(to: str = Query(..., description="Alıcı e-posta")):
     return debug_send_test(to)
 
 # --- Mount static after API routes (so /api/* takes precedence) ---
-if os.path.isdir(STATIC_DIR):
-    app.mount("/", StaticFiles(directory=STATIC_DIR, html=True), name="static")
+if _STATIC_INDEX:
+    app.mount("/", PrecompressedStaticFiles(), name="static")
+
+if __name__ == "__main__":
+    # Bakım komutları: python main.py rebuild-rollups
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "rebuild-rollups":
+        print(rebuild_spend_rollups())
+    else:
+        print("Kullanım: python main.py rebuild-rollups")
+        sys.exit(2)
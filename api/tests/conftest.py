@@ -0,0 +1,22 @@
+import warnings
+from pathlib import Path
+
+import pytest
+from pytest_benchmark.utils import get_machine_id
+
+BENCHMARK_STORAGE = Path(__file__).resolve().parent / ".benchmarks"
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Kayıtlı temel değerler, pytest hangi dizinden çalıştırılırsa çalıştırılsın tests/.benchmarks'tan okunur
+    if config.getoption("benchmark_storage", None) != "file://./.benchmarks":
+        return
+    config.option.benchmark_storage = BENCHMARK_STORAGE.as_uri()
+    if config.getoption("benchmark_compare", None) and not any((BENCHMARK_STORAGE / get_machine_id()).glob("*.json")):
+        # Bu makine/Python için temel değer yoksa karşılaştırma oturumu hataya düşürmesin; kaydedilmesi gerektiğini bildir
+        warnings.warn(
+            f"{get_machine_id()} için kayıtlı benchmark temel değeri yok; "
+            "karşılaştırma atlandı (kaydetmek için: --benchmark-save=baseline)"
+        )
+        config.option.benchmark_compare = None
+        config.option.benchmark_compare_fail = None
@@ -0,0 +1,93 @@
+"""Liste uçlarında her satır için çalışan yardımcıların pytest-benchmark ölçümleri.
+
+Temel değerler tests/.benchmarks altında kayıtlıdır; pytest.ini ortalamada %20'den fazla yavaşlamayı
+hata sayar. Makine veya Python sürümü değişince temel değeri o ortamda yeniden kaydedin:
+
+    python -m pytest tests/test_bench_helpers.py --benchmark-save=baseline
+
+Yardımcılar veritabanına dokunmaz. DATABASE_URL tanımlı değilse main.py, içe aktarılırken çalışan
+şema kontrolleri boş bir bağlantıya yönlendirilerek yüklenir.
+"""
+
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+API_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(API_DIR))
+sys.path.insert(0, str(API_DIR / "tools"))
+os.environ.setdefault("ENABLE_SCHEDULER", "0")
+
+from bench_inputs import make_inputs  # noqa: E402
+
+def _import_main():
+    if "main" in sys.modules or os.getenv("DATABASE_URL"):
+        import main
+        return main
+    # Motorlar oluşturulur ama bağlanmaz; içe aktarma sırasındaki DDL/bakım çağrıları sahte bağlantıya gider
+    os.environ["DATABASE_URL"] = "postgresql+psycopg2://benchmark@localhost/benchmark"
+    os.environ.setdefault("CHANGE_FEED_ENABLED", "0")
+    try:
+        with mock.patch("sqlalchemy.engine.Engine.connect"), mock.patch("sqlalchemy.engine.Engine.begin"):
+            import main
+    finally:
+        del os.environ["DATABASE_URL"]
+    return main
+
+main = _import_main()
+
+ROWS = 10_000
+EMAIL_ROWS = 2_000
+
+@pytest.fixture(scope="module")
+def inputs():
+    return make_inputs(ROWS, sorted(main.ALLOWED_DOC_TYPES), list(main._DOC_ALIASES))
+
+def test_serialize_damage_row(benchmark, inputs):
+    rows = inputs["damages"]
+    result = benchmark(lambda: [main._serialize_damage_row(r, []) for r in rows])
+    assert len(result) == ROWS
+
+def test_serialize_fuel_entry(benchmark, inputs):
+    rows = inputs["fuels"]
+    result = benchmark(lambda: [main._serialize_fuel_entry(r) for r in rows])
+    assert len(result) == ROWS
+
+def test_make_document_response(benchmark, inputs):
+    rows = inputs["documents"]
+    result = benchmark(lambda: [main._make_document_response(r) for r in rows])
+    assert len(result) == ROWS
+
+def test_document_status(benchmark, inputs):
+    valid_tos = inputs["valid_tos"]
+    result = benchmark(lambda: [main._document_status(d) for d in valid_tos])
+    assert set(result) <= {"expired", "critical", "warning", "ok"}
+
+def test_normalize_doc_type_input(benchmark, inputs):
+    aliases = inputs["aliases"]
+    result = benchmark(lambda: [main.normalize_doc_type_input(a) for a in aliases])
+    assert len(result) == ROWS
+
+def test_render_email(benchmark, inputs):
+    documents = inputs["documents"][:EMAIL_ROWS]
+    result = benchmark(
+        lambda: [
+            main.render_email(
+                plate=f"34LT{d['vehicle_id']:05d}",
+                doc_type=d["doc_type"],
+                valid_to=d["valid_to"],
+                days_left=d["days_left"],
+                panel_url="https://example.com/vehicles",
+                note=d["note"],
+            )
+            for d in documents
+        ]
+    )
+    assert len(result) == EMAIL_ROWS
+
+def test_assemble_vehicle_list(benchmark, inputs):
+    result = benchmark(lambda: main._assemble_vehicle_list(inputs["vehicles"], inputs["documents"]))
+    assert sum(v["document_count"] for v in result) == ROWS
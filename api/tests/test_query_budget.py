@@ -0,0 +1,115 @@
+"""Yazma uçlarının veritabanına kaç ifade gönderdiğini sayar.
+
+Gerçek bir PostgreSQL gerekir: DATABASE_URL (veya TEST_DATABASE_URL) tanımlı değilse ya da
+bağlanılamıyorsa testler atlanır. Oluşturulan kayıtlar test sonunda API üzerinden silinir.
+"""
+
+import base64
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+if os.getenv("TEST_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("DATABASE_URL tanımlı değil", allow_module_level=True)
+os.environ.setdefault("ENABLE_SCHEDULER", "0")
+os.environ.setdefault("MAIL_PROVIDER", "NONE")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import main  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+PASSWORD = main.VEHICLE_ADMIN_PASSWORD
+ATTACHMENTS = [
+    {"file_name": f"ek{idx}.txt", "mime_type": "text/plain", "content_base64": base64.b64encode(b"ek").decode()}
+    for idx in range(3)
+]
+
+@pytest.fixture(scope="module")
+def client():
+    try:
+        with main.engine.connect():
+            pass
+    except OperationalError as exc:
+        pytest.skip(f"Veritabanına bağlanılamadı: {exc}")
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="module")
+def plate(client):
+    plate = f"99QB{uuid.uuid4().hex[:4].upper()}"
+    response = client.post("/api/vehicles", json={"plate": plate, "admin_password": PASSWORD})
+    assert response.status_code == 201, response.text
+    yield plate
+    client.delete(f"/api/vehicles/{response.json()['id']}", params={"admin_password": PASSWORD})
+
+@pytest.fixture
+def statements():
+    executed: list[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(main.engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(main.engine, "before_cursor_execute", record)
+
+def _create_payloads(plate: str) -> dict[str, dict[str, object]]:
+    return {
+        "damages": {
+            "plate": plate,
+            "title": "Ön tampon",
+            "severity": "Hafif",
+            "occurred_at": "2026-01-05",
+            "attachments": ATTACHMENTS,
+        },
+        "expenses": {
+            "plate": plate,
+            "category": "diger",
+            "amount": 150,
+            "expense_date": "2026-01-05",
+            "attachments": ATTACHMENTS,
+        },
+        "assignments": {
+            "plate": plate,
+            "person_name": "Test Kişi",
+            "assignment_date": "2026-01-05",
+            "attachments": ATTACHMENTS,
+        },
+        "fuels": {"plate": plate, "liters": 40, "amount": 1600, "refuel_date": "2026-01-05", "odometer": 12000},
+    }
+
+UPDATE_PAYLOADS = {
+    "damages": {"title": "Arka tampon", "attachments": ATTACHMENTS},
+    "expenses": {"amount": 175, "attachments": ATTACHMENTS},
+    "assignments": {"person_name": "Başka Kişi", "attachments": ATTACHMENTS},
+    "fuels": {"amount": 1650},
+}
+
+# Ek sayısından bağımsız üst sınırlar: ana satır + tek çok satırlı ek INSERT'i (+ aylık özet upsert'i)
+CREATE_BUDGETS = {"damages": 2, "expenses": 3, "assignments": 2, "fuels": 2}
+# Güncelleme: UPDATE ... RETURNING + mevcut eklerin okunması + yeni ekler; özetli tablolarda eski/yeni ay upsert'leri
+# ve sayısı sıfıra inen özet satırının silinmesi (testin plakası yeni olduğundan bu durum hep oluşur)
+UPDATE_BUDGETS = {"damages": 3, "expenses": 6, "assignments": 3, "fuels": 4}
+
+@pytest.mark.parametrize("entity", sorted(CREATE_BUDGETS))
+def test_create_and_update_statement_budget(client, plate, statements, entity):
+    response = client.post(f"/api/{entity}", json={**_create_payloads(plate)[entity], "admin_password": PASSWORD})
+    assert response.status_code == 201, response.text
+    created_id = response.json()["id"]
+    try:
+        assert len(statements) <= CREATE_BUDGETS[entity], statements
+
+        statements.clear()
+        response = client.put(f"/api/{entity}/{created_id}", json={**UPDATE_PAYLOADS[entity], "admin_password": PASSWORD})
+        assert response.status_code == 200, response.text
+        assert len(statements) <= UPDATE_BUDGETS[entity], statements
+    finally:
+        client.delete(f"/api/{entity}/{created_id}", params={"admin_password": PASSWORD})
@@ -0,0 +1,80 @@
+"""
+Satır başı yardımcı benchmark'ları için sentetik girdiler.
+
+tests/test_bench_helpers.py (pytest-benchmark) ve tools/bench_responses.py tarafından kullanılır;
+main.py'yi içe aktarmaz, belge türleri ve takma adlar çağırandan gelir.
+"""
+import random
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+
+def make_inputs(rows: int, doc_types: list[str], doc_aliases: list[str], seed: int = 42) -> dict[str, object]:
+    """Liste uçlarının satır başı yardımcılarına verilecek sentetik satırlar (veritabanı gerekmez)."""
+    rnd = random.Random(seed)
+    today = date.today()
+    created = datetime.now(timezone.utc)
+    alias_inputs = list(doc_aliases) + list(doc_types) + ["Trafik Sigortası", "  Muayene ", "bilinmeyen"]
+
+    vehicles = [
+        {
+            "id": i,
+            "plate": f"34LT{i:05d}",
+            "make": "Ford",
+            "model": "Transit",
+            "year": 2019,
+            "responsible_email": "filo@example.com",
+            "responsible_person": "Ayşe Demir",
+            "created_at": created,
+        }
+        for i in range(max(1, rows // 20))
+    ]
+    documents = []
+    for i in range(rows):
+        valid_to = today + timedelta(days=rnd.randint(-365, 365))
+        documents.append(
+            {
+                "id": i,
+                "vehicle_id": rnd.randrange(len(vehicles)),
+                "doc_type": doc_types[i % len(doc_types)],
+                "valid_from": valid_to - timedelta(days=365),
+                "valid_to": valid_to,
+                "note": "sentetik" if i % 3 else None,
+                "days_left": (valid_to - today).days,
+            }
+        )
+    damages = [
+        {
+            "id": i,
+            "vehicle_id": i % len(vehicles),
+            "plate": f"34LT{i % len(vehicles):05d}",
+            "title": "Sentetik hasar",
+            "description": "Yük testi",
+            "severity": "Orta",
+            "occurred_at": today - timedelta(days=i % 900),
+            "created_at": created,
+        }
+        for i in range(rows)
+    ]
+    fuels = [
+        {
+            "id": i,
+            "vehicle_id": i % len(vehicles),
+            "plate": f"34LT{i % len(vehicles):05d}",
+            "liters": Decimal("42.50"),
+            "amount": Decimal("1829.75"),
+            "refuel_date": today - timedelta(days=i % 900),
+            "odometer": 100000 + i,
+            "note": None,
+            "created_at": created,
+        }
+        for i in range(rows)
+    ]
+    return {
+        "vehicles": vehicles,
+        "documents": documents,
+        "damages": damages,
+        "fuels": fuels,
+        "valid_tos": [d["valid_to"] for d in documents],
+        "aliases": [alias_inputs[i % len(alias_inputs)] for i in range(rows)],
+    }
@@ -0,0 +1,86 @@
+"""
+Liste yanıtları için serileştirme ve sıkıştırma karşılaştırması.
+
+main.py içe aktarıldığında şema kontrolü yapıldığı için DATABASE_URL gereklidir (zamanlayıcı kapatılır).
+
+Sentetik araç / hasar / masraf / yakıt listelerini FastAPI'nin varsayılan yolu (jsonable_encoder + json)
+ile FastJSONResponse (orjson) yolundan geçirip CPU süresini, ardından gzip ve brotli ile
+tel üzerindeki bayt sayısını ve sıkıştırma maliyetini raporlar.
+
+    python tools/bench_responses.py --rows 50000
+"""
+import argparse
+import gzip
+import os
+import sys
+import time
+
+os.environ.setdefault("ENABLE_SCHEDULER", "0")
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+import main  # noqa: E402
+from bench_inputs import make_inputs  # noqa: E402
+
+
+def _measure(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _payloads(inputs: dict[str, object]) -> dict[str, object]:
+    expense_rows = [
+        {**row, "category": "Bakım", "amount": row["amount"], "expense_date": row["refuel_date"]}
+        for row in inputs["fuels"]
+    ]
+    return {
+        "vehicles": main._assemble_vehicle_list(inputs["vehicles"], inputs["documents"]),
+        "damages": [main._serialize_damage_row(r, []) for r in inputs["damages"]],
+        "expenses": [main._serialize_expense_row(r, []) for r in expense_rows],
+        "fuels": [main._serialize_fuel_entry(r) for r in inputs["fuels"]],
+    }
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description="JSON serileştirme ve sıkıştırma karşılaştırması")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    payloads = _payloads(make_inputs(args.rows, sorted(main.ALLOWED_DOC_TYPES), list(main._DOC_ALIASES), args.seed))
+    default_response = JSONResponse(None)
+    fast_response = main.FastJSONResponse(None)
+
+    print(f"{'liste':10} {'varsayılan ms':>14} {'orjson ms':>10} {'ham KB':>9} {'gzip KB':>9} {'gzip ms':>8} {'br KB':>8} {'br ms':>7}")
+    for name, payload in payloads.items():
+        default_ms = _measure(lambda: default_response.render(jsonable_encoder(payload)), args.repeat) * 1000
+        fast_ms = _measure(lambda: fast_response.render(payload), args.repeat) * 1000
+        body = fast_response.render(payload)
+
+        started = time.perf_counter()
+        gz = gzip.compress(body, compresslevel=main.RESPONSE_GZIP_LEVEL)
+        gzip_ms = (time.perf_counter() - started) * 1000
+        if main.brotli is not None:
+            started = time.perf_counter()
+            br = main.brotli.compress(body, quality=main.RESPONSE_BROTLI_QUALITY)
+            br_ms = (time.perf_counter() - started) * 1000
+            br_cols = f"{len(br) / 1024:8.0f} {br_ms:7.1f}"
+        else:
+            br_cols = f"{'-':>8} {'-':>7}"
+        print(
+            f"{name:10} {default_ms:14.1f} {fast_ms:10.1f} {len(body) / 1024:9.0f} "
+            f"{len(gz) / 1024:9.0f} {gzip_ms:8.1f} {br_cols}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
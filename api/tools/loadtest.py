@@ -0,0 +1,198 @@
+"""
+API yük testi: /openapi.json üzerinden bulunan tüm GET /api/* rotalarını verilen eşzamanlılıkla çağırır,
+uç nokta başına p50/p95/p99 gecikme, saniyedeki istek ve yanıt boyutunu raporlar.
+
+Sonuçlar JSON olarak kaydedilir; --compare ile önceki bir çalıştırmayla karşılaştırılabilir.
+
+    python tools/loadtest.py --base-url http://localhost:8000 --concurrency 32 --requests 200 \\
+        --output results/2026-10-19.json --compare results/önceki.json
+
+Yazma uçları (POST/PUT/DELETE) veriyi değiştireceği için varsayılan olarak çalıştırılmaz.
+/api/debug/* uçları yalnızca --admin-password verilirse dahil edilir.
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+# Zorunlu parametreler için örnek değerler; {plate} / {vehicle_id} canlı veriden doldurulur
+SAMPLE_PARAMS: dict[str, list[str]] = {
+    "doc_type": ["inspection", "k_document", "traffic_insurance", "kasko", "service_oil", "service_general"],
+    "entity": ["fuels", "expenses", "documents", "damages"],
+}
+# /api/events bir SSE akışıdır, yanıt hiç bitmez; text/event-stream bildiren diğer rotalar da atlanır
+SKIPPED_PATHS = {"/api/debug/send_test", "/api/debug/vehicles_probe", "/api/events"}
+
+
+def _percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+async def _discover_targets(client: httpx.AsyncClient, admin_password: str | None) -> list[str]:
+    spec = (await client.get("/openapi.json")).json()
+    vehicles = (await client.get("/api/vehicles")).json()
+    samples = dict(SAMPLE_PARAMS)
+    if vehicles:
+        samples["plate"] = [vehicles[0]["plate"]]
+        samples["vehicle_id"] = [str(vehicles[0]["id"])]
+
+    targets: list[str] = []
+    for path, operations in sorted(spec.get("paths", {}).items()):
+        op = operations.get("get")
+        if op is None or not path.startswith("/api/") or path in SKIPPED_PATHS:
+            continue
+        if any("text/event-stream" in (r.get("content") or {}) for r in op.get("responses", {}).values()):
+            print(f"atlandı (olay akışı): {path}", file=sys.stderr)
+            continue
+        if path.startswith("/api/debug/") and not admin_password:
+            continue
+        expanded = [(path, {})]
+        missing = False
+        for param in op.get("parameters", []):
+            name = param["name"]
+            if param["in"] == "query" and name == "admin_password":
+                expanded = [(p, {**q, name: admin_password}) for p, q in expanded]
+                continue
+            if not param.get("required"):
+                continue
+            values = samples.get(name)
+            if not values:
+                missing = True
+                break
+            if param["in"] == "path":
+                expanded = [(p.replace("{" + name + "}", v), q) for p, q in expanded for v in values]
+            else:
+                expanded = [(p, {**q, name: v}) for p, q in expanded for v in values]
+        if missing or any(re.search(r"\{[^}]+\}", p) for p, _ in expanded):
+            print(f"atlandı (örnek parametre yok): {path}", file=sys.stderr)
+            continue
+        targets.extend(str(httpx.URL(p, params=q)) for p, q in expanded)
+    return targets
+
+
+async def _run_target(client: httpx.AsyncClient, target: str, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    sizes: list[int] = []
+    errors = 0
+    statuses: dict[str, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(target)
+                body = response.content
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            sizes.append(len(body))
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": _round(_percentile(latencies, 50)),
+            "p95": _round(_percentile(latencies, 95)),
+            "p99": _round(_percentile(latencies, 99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "payload_bytes": {
+            "mean": round(sum(sizes) / len(sizes)) if sizes else None,
+            "max": max(sizes) if sizes else None,
+        },
+    }
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 2) if value is not None else None
+
+
+def _print_report(results: dict, baseline: dict | None):
+    header = f"{'uç nokta':60} {'p50':>9} {'p95':>9} {'p99':>9} {'rps':>8} {'bayt':>10} {'hata':>5}"
+    print(header)
+    print("-" * len(header))
+    for target, r in results["endpoints"].items():
+        lat = r["latency_ms"]
+        line = (
+            f"{target[:60]:60} {lat['p50'] or 0:9.1f} {lat['p95'] or 0:9.1f} {lat['p99'] or 0:9.1f} "
+            f"{r['throughput_rps'] or 0:8.1f} {r['payload_bytes']['mean'] or 0:10} {r['errors']:5}"
+        )
+        base = (baseline or {}).get("endpoints", {}).get(target)
+        if base and base["latency_ms"]["p95"] and lat["p95"]:
+            change = (lat["p95"] - base["latency_ms"]["p95"]) / base["latency_ms"]["p95"] * 100
+            line += f"  p95 {change:+.0f}%"
+        print(line)
+
+
+async def _main(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        targets = await _discover_targets(client, args.admin_password)
+        if args.only:
+            targets = [t for t in targets if re.search(args.only, t)]
+        results = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "label": args.label,
+            "endpoints": {},
+        }
+        for target in targets:
+            if args.warmup:
+                await client.get(target)
+            results["endpoints"][target] = await _run_target(client, target, args.requests, args.concurrency)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    _print_report(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+        print(f"Sonuçlar kaydedildi: {args.output}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HYS Fleet API yük testi")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="Uç nokta başına istek sayısı")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--only", help="Yalnızca bu regex ile eşleşen hedefler")
+    parser.add_argument("--admin-password", help="/api/debug/* uçlarını da dahil et")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--label", help="Çalıştırma etiketi (ör. commit kısaltması)")
+    parser.add_argument("--output", help="Sonuç JSON dosyası")
+    parser.add_argument("--compare", help="Karşılaştırılacak önceki sonuç JSON dosyası")
+    return asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+Next.js dışa aktarımı için ön sıkıştırılmış varyantlar üretir.
+
+Her metin tabanlı dosyanın yanına .gz (ve brotli kuruluysa .br) yazar; API açılışta bu kardeş
+dosyaları indeksler ve Accept-Encoding'e göre sunar. Docker imajı derlenirken bir kez çalışır.
+
+    python tools/precompress_static.py /app/webout
+"""
+import argparse
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # .br isteğe bağlı; yoksa yalnızca gzip üretilir
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = (".html", ".js", ".css", ".json", ".svg", ".txt", ".xml", ".map", ".ico", ".webmanifest")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Statik dosyalar için .gz/.br varyantları üret")
+    parser.add_argument("directory")
+    parser.add_argument("--min-bytes", type=int, default=512, help="Bu boyuttan küçük dosyalar atlanır")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directory):
+        print(f"Dizin bulunamadı: {args.directory}")
+        return 1
+    if brotli is None:
+        print("brotli kurulu değil; yalnızca .gz üretilecek")
+
+    written = 0
+    original_total = compressed_total = 0
+    for dirpath, _, filenames in os.walk(args.directory):
+        for name in filenames:
+            if not name.endswith(COMPRESSIBLE_SUFFIXES):
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, "rb") as fh:
+                data = fh.read()
+            if len(data) < args.min_bytes:
+                continue
+            variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants[".br"] = brotli.compress(data, quality=11)
+            for suffix, payload in variants.items():
+                # Sıkıştırma kazanç sağlamıyorsa varyant yazılmaz; sunucu orijinali döner
+                if len(payload) >= len(data):
+                    continue
+                with open(path + suffix, "wb") as fh:
+                    fh.write(payload)
+                written += 1
+                original_total += len(data)
+                compressed_total += len(payload)
+    print(f"{written} varyant yazıldı ({original_total} -> {compressed_total} bayt)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
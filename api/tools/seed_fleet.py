@@ -0,0 +1,217 @@
+"""
+Yük testi için sentetik filo üretici.
+
+Yerel bir Postgres'i gerçekçi verilerle doldurur: araçlar, tüm belge türlerinde belgeler,
+ekli hasarlar, masraflar, kilometre serili yakıt kayıtları ve zimmetler. Veri tamamen
+veritabanı tarafında generate_series ile üretilir; 5k araç / 100k belge birkaç saniye sürer.
+
+Şema API ilk açıldığında oluşturulur (main._ensure_tables), bu yüzden önce API'yi bir kez çalıştırın.
+
+    DATABASE_URL=postgresql+psycopg2://... python tools/seed_fleet.py --vehicles 5000 --documents-per-vehicle 20
+    python tools/seed_fleet.py --reset          # yalnızca sentetik (önekli) kayıtları siler
+"""
+import argparse
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, text
+
+DOC_TYPES = ["inspection", "k_document", "traffic_insurance", "kasko", "service_oil", "service_general"]
+MAKES = ["Ford", "Fiat", "Renault", "Toyota", "Volkswagen", "Hyundai", "Peugeot", "Mercedes"]
+MODELS = ["Transit", "Doblo", "Clio", "Corolla", "Caddy", "i20", "Partner", "Sprinter"]
+EXPENSE_CATEGORIES = ["Bakım", "Lastik", "Sigorta", "Otopark", "Yıkama", "Onarım", "Köprü/Otoyol"]
+PEOPLE = ["Ahmet Yılmaz", "Ayşe Demir", "Mehmet Kaya", "Zeynep Çelik", "Can Şahin", "Elif Arslan"]
+SEVERITIES = ["Hafif", "Orta", "Ağır"]
+
+
+def _pg_array(values: list[str]) -> str:
+    return "ARRAY[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def _pick(values: list[str]) -> str:
+    return f"({_pg_array(values)})[1 + floor(random() * {len(values)})::int]"
+
+
+def reset(con, prefix: str):
+    like = {"prefix": f"{prefix}%"}
+    for table in ("fuel_entries", "expenses", "damages", "assignments"):
+        con.execute(text(f"DELETE FROM {table} WHERE plate LIKE :prefix"), like)
+    con.execute(text("DELETE FROM vehicles WHERE plate LIKE :prefix"), like)
+
+
+def seed(con, args):
+    con.execute(text("SELECT setseed(:seed)"), {"seed": args.seed})
+    params = {"prefix": args.prefix, "n": args.vehicles}
+
+    con.execute(
+        text(
+            f"""
+            INSERT INTO vehicles (plate, make, model, year, responsible_email, responsible_person)
+            SELECT :prefix || lpad(g::text, 6, '0'),
+                   {_pick(MAKES)},
+                   {_pick(MODELS)},
+                   2012 + floor(random() * 13)::int,
+                   'filo@example.com',
+                   {_pick(PEOPLE)}
+            FROM generate_series(1, :n) AS g
+            ON CONFLICT (plate) DO NOTHING
+            """
+        ),
+        params,
+    )
+    synthetic = "SELECT id, plate FROM vehicles WHERE plate LIKE :prefix || '%'"
+
+    # Belgeler: her araç için türlere dağıtılmış, geçmiş ve gelecek bitiş tarihleri.
+    # random() içeren alt sorgular düzleştirilmez; valid_from ile valid_to aynı değerden türetilir.
+    con.execute(
+        text(
+            f"""
+            INSERT INTO documents (vehicle_id, doc_type, valid_from, valid_to, note)
+            SELECT d.vehicle_id, d.doc_type, d.valid_to - 365, d.valid_to, 'sentetik'
+            FROM (
+              SELECT v.id AS vehicle_id,
+                     ({_pg_array(DOC_TYPES)})[1 + ((g - 1) % {len(DOC_TYPES)})] AS doc_type,
+                     CURRENT_DATE + (floor(random() * 730) - 365)::int AS valid_to
+              FROM ({synthetic}) v
+              CROSS JOIN generate_series(1, :per_vehicle) AS g
+            ) d
+            """
+        ),
+        {**params, "per_vehicle": args.documents_per_vehicle},
+    )
+
+    con.execute(
+        text(
+            f"""
+            INSERT INTO damages (vehicle_id, plate, title, description, severity, occurred_at)
+            SELECT v.id, v.plate, 'Sentetik hasar ' || g, 'Yük testi kaydı', {_pick(SEVERITIES)},
+                   CURRENT_DATE - floor(random() * 1095)::int
+            FROM ({synthetic}) v
+            CROSS JOIN generate_series(1, :per_vehicle) AS g
+            """
+        ),
+        {**params, "per_vehicle": args.damages_per_vehicle},
+    )
+    # Eklerin bir kısmı: md5 tekrarından rastgele görünümlü bayt içeriği
+    con.execute(
+        text(
+            """
+            INSERT INTO damage_attachments (damage_id, file_name, mime_type, content)
+            SELECT d.id, 'foto_' || d.id || '.jpg', 'image/jpeg',
+                   decode(lpad('', :size * 2, md5(random()::text)), 'hex')
+            FROM damages d
+            WHERE d.plate LIKE :prefix || '%' AND random() < :ratio
+            """
+        ),
+        {**params, "size": args.attachment_bytes, "ratio": args.attachment_ratio},
+    )
+
+    con.execute(
+        text(
+            f"""
+            INSERT INTO expenses (vehicle_id, plate, category, amount, description, expense_date)
+            SELECT v.id, v.plate, {_pick(EXPENSE_CATEGORIES)},
+                   round((100 + random() * 9900)::numeric, 2), 'Yük testi kaydı',
+                   CURRENT_DATE - floor(random() * 1095)::int
+            FROM ({synthetic}) v
+            CROSS JOIN generate_series(1, :per_vehicle) AS g
+            """
+        ),
+        {**params, "per_vehicle": args.expenses_per_vehicle},
+    )
+    con.execute(
+        text(
+            """
+            INSERT INTO expense_attachments (expense_id, file_name, mime_type, content)
+            SELECT e.id, 'fatura_' || e.id || '.pdf', 'application/pdf',
+                   decode(lpad('', :size * 2, md5(random()::text)), 'hex')
+            FROM expenses e
+            WHERE e.plate LIKE :prefix || '%' AND random() < :ratio
+            """
+        ),
+        {**params, "size": args.attachment_bytes, "ratio": args.attachment_ratio},
+    )
+
+    # Yakıt serisi: haftalık dolumlar, artan kilometre; %5 boş, %1 geriye giden okuma
+    con.execute(
+        text(
+            """
+            INSERT INTO fuel_entries (vehicle_id, plate, liters, amount, refuel_date, odometer, note)
+            SELECT f.vehicle_id, f.plate, f.liters, round(f.liters * f.unit_price, 2), f.refuel_date,
+                   CASE
+                     WHEN f.roll < 0.05 THEN NULL
+                     WHEN f.roll < 0.06 THEN GREATEST(0, f.odometer - 5000)
+                     ELSE f.odometer
+                   END,
+                   NULL
+            FROM (
+              SELECT v.id AS vehicle_id,
+                     v.plate,
+                     round((25 + random() * 35)::numeric, 2) AS liters,
+                     (38 + random() * 8)::numeric AS unit_price,
+                     CURRENT_DATE - (:per_vehicle - g) * 7 AS refuel_date,
+                     v.base_km + g * 550 + floor(random() * 100)::int AS odometer,
+                     random() AS roll
+              FROM (SELECT id, plate, floor(random() * 150000)::int AS base_km
+                    FROM vehicles WHERE plate LIKE :prefix || '%') v
+              CROSS JOIN generate_series(1, :per_vehicle) AS g
+            ) f
+            """
+        ),
+        {**params, "per_vehicle": args.fuel_per_vehicle},
+    )
+
+    con.execute(
+        text(
+            f"""
+            INSERT INTO assignments (vehicle_id, plate, person_name, person_title, assignment_date,
+                                     expected_return_date, description)
+            SELECT v.id, v.plate, {_pick(PEOPLE)}, 'Saha Personeli',
+                   CURRENT_DATE - floor(random() * 720)::int, NULL, 'Yük testi kaydı'
+            FROM ({synthetic}) v
+            CROSS JOIN generate_series(1, :per_vehicle) AS g
+            """
+        ),
+        {**params, "per_vehicle": args.assignments_per_vehicle},
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Sentetik filo verisi üretir.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--vehicles", type=int, default=5000)
+    parser.add_argument("--documents-per-vehicle", type=int, default=20)
+    parser.add_argument("--damages-per-vehicle", type=int, default=3)
+    parser.add_argument("--expenses-per-vehicle", type=int, default=24)
+    parser.add_argument("--fuel-per-vehicle", type=int, default=104)
+    parser.add_argument("--assignments-per-vehicle", type=int, default=2)
+    parser.add_argument("--attachment-bytes", type=int, default=32 * 1024)
+    parser.add_argument("--attachment-ratio", type=float, default=0.3, help="Ek eklenecek kayıt oranı (0-1)")
+    parser.add_argument("--prefix", default="LT", help="Sentetik plakaların öneki")
+    parser.add_argument("--seed", type=float, default=0.42, help="Postgres setseed değeri (-1..1)")
+    parser.add_argument("--reset", action="store_true", help="Önekli sentetik kayıtları sil ve çık")
+    args = parser.parse_args()
+    if not args.database_url:
+        print("DATABASE_URL tanımlı değil", file=sys.stderr)
+        return 2
+
+    engine = create_engine(args.database_url, future=True)
+    started = time.perf_counter()
+    with engine.begin() as con:
+        reset(con, args.prefix)
+        if not args.reset:
+            seed(con, args)
+        counts = {
+            table: con.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar_one()
+            for table in ("vehicles", "documents", "damages", "damage_attachments", "expenses",
+                          "expense_attachments", "fuel_entries", "assignments")
+        }
+    print(f"Tamamlandı ({time.perf_counter() - started:.1f} sn): {counts}")
+    if not args.reset:
+        print("Harcama özetleri için: python main.py rebuild-rollups")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())